@@ -0,0 +1,428 @@
+import argparse
+import json
+import math
+import os
+import shutil
+import sys
+import threading
+import time
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    # No advisory locks on this platform; a single writer is up to the caller
+    fcntl = None
+
+from answer_log import AnswerLog, iter_jsonl
+from metrics import metrics
+
+MANIFEST_FILE = "manifest.json"
+TAIL_FILE = "tail.jsonl"
+CHUNKS_DIR = "chunks"
+DAILY_FILE = "daily.json"
+LOCK_FILE = "lock"
+DAY = 86400
+# Rubric parts of AnswerAnalysis.total_score, stored as their own columns
+COMPONENTS = ("semantic_points", "sentiment_points", "keyword_points", "length_points")
+COLUMNS = {
+    "seq": np.int64,
+    "question": np.int32,
+    "timestamp": np.float64,
+    "total": np.int16,
+    "semantic_score": np.float32,
+    "semantic_points": np.int8,
+    "sentiment_points": np.int8,
+    "keyword_points": np.int8,
+    "length_points": np.int8,
+    "rating": np.float32
+}
+# Total score histogram: 0-9, 10-19, ..., 90-99 and 100
+HISTOGRAM_BINS = 11
+
+
+def new_aggregate():
+    return {"count": 0, "sum": 0.0, "sum_sq": 0.0, "histogram": [0] * HISTOGRAM_BINS,
+            "components": {name: 0.0 for name in COMPONENTS}}
+
+def add_row(aggregate, total, components):
+    aggregate["count"] += 1
+    aggregate["sum"] += total
+    aggregate["sum_sq"] += total * total
+    aggregate["histogram"][min(int(total) // 10, HISTOGRAM_BINS - 1)] += 1
+    for name in COMPONENTS:
+        aggregate["components"][name] += components[name]
+
+def add_columns(aggregate, columns, rows):
+    # add_row() for a selection of rows of column arrays at once
+    totals = columns["total"][rows].astype(np.float64)
+    aggregate["count"] += len(totals)
+    aggregate["sum"] += float(totals.sum())
+    aggregate["sum_sq"] += float((totals * totals).sum())
+    bins = np.minimum(totals.astype(np.int64) // 10, HISTOGRAM_BINS - 1)
+    for i, count in enumerate(np.bincount(bins, minlength=HISTOGRAM_BINS)):
+        aggregate["histogram"][i] += int(count)
+    for name in COMPONENTS:
+        aggregate["components"][name] += float(columns[name][rows].sum())
+
+def merge_aggregate(aggregate, other):
+    aggregate["count"] += other["count"]
+    aggregate["sum"] += other["sum"]
+    aggregate["sum_sq"] += other["sum_sq"]
+    aggregate["histogram"] = [a + b for a, b in zip(aggregate["histogram"], other["histogram"])]
+    for name in COMPONENTS:
+        aggregate["components"][name] += other["components"][name]
+
+def merge_daily(daily, other, first_day=None, last_day=None):
+    # Add {day: {question id: aggregate}} for first_day <= day < last_day into daily
+    for day, rows in other.items():
+        if (first_day is None or day >= first_day) and (last_day is None or day < last_day):
+            for question_id, aggregate in rows.items():
+                merge_aggregate(daily.setdefault(question_id, new_aggregate()), aggregate)
+
+def summarize(aggregate):
+    count = aggregate["count"]
+    if not count:
+        return {"count": 0}
+    mean = aggregate["sum"] / count
+    return {
+        "count": count,
+        "mean": mean,
+        "std": math.sqrt(max(0.0, aggregate["sum_sq"] / count - mean * mean)),
+        "histogram": list(aggregate["histogram"]),
+        "components": {name: value / count for name, value in aggregate["components"].items()}
+    }
+
+
+class StoreLocked(Exception):
+    pass
+
+
+class AnalyticsStore:
+    # Scored answers kept column by column for reporting:
+    #   chunks/NNNNNN/<column>.npy  sealed chunks of `chunk_size` rows, memory-mapped on read
+    #   chunks/NNNNNN/daily.json    aggregates per UTC day and question of that chunk's rows
+    #   tail.jsonl                  rows not sealed yet, appended through AnswerLog
+    #   manifest.json               question ids, chunk time ranges, and running aggregates
+    #                               per question
+    #   lock                        held by the one process writing to the directory
+    # The aggregates are updated on every append, so per-question reports read them
+    # instead of the history; time-range queries add up whole days from the daily
+    # aggregates of the chunks that overlap the range and only scan rows of the partial
+    # days at either end. Sealing writes only the new chunk's files and the manifest,
+    # and daily aggregates are read on demand, so neither grows with the history.
+    # A second process opening the directory gets StoreLocked, or can open it read_only.
+    def __init__(self, directory, chunk_size=4096, flush_interval=1.0, read_only=False):
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.read_only = read_only
+        self._lock_fd = None
+        os.makedirs(os.path.join(directory, CHUNKS_DIR), exist_ok=True)
+        if not read_only:
+            self.acquire_lock()
+        self._lock = threading.RLock()
+        self.manifest = {"questions": [], "chunks": [], "sealed_rows": 0, "totals": {}}
+        if os.path.exists(self.path(MANIFEST_FILE)):
+            with open(self.path(MANIFEST_FILE), "r", encoding="utf-8") as f:
+                self.manifest = json.load(f)
+        # Stores written before daily aggregates moved into the chunks rebuild them from the columns
+        self.manifest.pop("daily", None)
+        self.question_ids = {question: i for i, question in enumerate(self.manifest["questions"])}
+        self.totals = {int(k): v for k, v in self.manifest["totals"].items()}
+        self.tail_daily = {}
+        self.chunk_daily = {}
+        self.tail = []
+        for record in iter_jsonl(self.path(TAIL_FILE)) if os.path.exists(self.path(TAIL_FILE)) else ():
+            # Rows already sealed before a crash cut the tail truncation short are skipped
+            if record["seq"] >= self.manifest["sealed_rows"]:
+                self._add(record)
+        self.log = None if read_only else AnswerLog(self.path(TAIL_FILE), flush_interval=flush_interval)
+
+    def acquire_lock(self):
+        if fcntl is None:
+            return
+        fd = os.open(self.path(LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            raise StoreLocked(f"{self.directory} is being written by another process")
+        self._lock_fd = fd
+
+    def path(self, *names):
+        return os.path.join(self.directory, *names)
+
+    def __len__(self):
+        return self.manifest["sealed_rows"] + len(self.tail)
+
+    def question_id(self, question):
+        question_id = self.question_ids.get(question)
+        if question_id is None:
+            question_id = self.question_ids[question] = len(self.manifest["questions"])
+            self.manifest["questions"].append(question)
+        return question_id
+
+    # Writing
+
+    def append(self, question, total, semantic_score, components, rating=None, timestamp=None):
+        if self.read_only:
+            raise StoreLocked(f"{self.directory} is open read-only")
+        with self._lock:
+            record = {
+                "seq": len(self),
+                "question": self.question_id(question),
+                "timestamp": time.time() if timestamp is None else timestamp,
+                "total": int(total),
+                "semantic_score": float(semantic_score),
+                **{name: int(components[name]) for name in COMPONENTS},
+                "rating": float("nan") if rating is None else float(rating)
+            }
+            # Question texts go into the tail too, so new ids survive a restart before sealing
+            self.log.append({**record, "question_text": question})
+            self._add(record)
+            if len(self.tail) >= self.chunk_size:
+                self.seal()
+        metrics.increment("analytics.rows")
+        return record
+
+    def _add(self, record):
+        if "question_text" in record:
+            self.question_ids.setdefault(record["question_text"], record["question"])
+            if record["question"] == len(self.manifest["questions"]):
+                self.manifest["questions"].append(record["question_text"])
+        question_id = record["question"]
+        day = int(record["timestamp"] // DAY)
+        for aggregate in (
+            self.totals.setdefault(question_id, new_aggregate()),
+            self.tail_daily.setdefault(day, {}).setdefault(question_id, new_aggregate())
+        ):
+            add_row(aggregate, record["total"], record)
+        self.tail.append(record)
+
+    def seal(self):
+        # Write the tail out as a columnar chunk with its daily aggregates, then the
+        # manifest, then empty the tail
+        with self._lock:
+            if self.read_only or not self.tail:
+                return
+            with metrics.timer("analytics.seal"):
+                self.log.flush()
+                name = f"{len(self.manifest['chunks']):06d}"
+                directory = self.path(CHUNKS_DIR, name)
+                shutil.rmtree(directory, ignore_errors=True)
+                os.makedirs(directory)
+                for column, dtype in COLUMNS.items():
+                    np.save(os.path.join(directory, column + ".npy"),
+                            np.array([record[column] for record in self.tail], dtype=dtype))
+                write_json(os.path.join(directory, DAILY_FILE), {
+                    str(day): {str(k): v for k, v in rows.items()} for day, rows in self.tail_daily.items()
+                })
+                timestamps = [record["timestamp"] for record in self.tail]
+                self.manifest["chunks"].append({
+                    "name": name,
+                    "rows": len(self.tail),
+                    "min_timestamp": min(timestamps),
+                    "max_timestamp": max(timestamps),
+                    "sorted": all(a <= b for a, b in zip(timestamps, timestamps[1:]))
+                })
+                self.manifest["sealed_rows"] += len(self.tail)
+                self.write_manifest()
+                self.chunk_daily[name] = self.tail_daily
+                self.tail_daily = {}
+                self.tail = []
+                with open(self.path(TAIL_FILE), "w", encoding="utf-8"):
+                    pass
+
+    def write_manifest(self):
+        self.manifest["totals"] = {str(k): v for k, v in self.totals.items()}
+        write_json(self.path(MANIFEST_FILE), self.manifest)
+
+    def flush(self):
+        if self.log is not None:
+            self.log.flush()
+
+    def close(self):
+        if self.log is not None:
+            self.log.close()
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    # Reading
+
+    def load_chunk(self, chunk):
+        directory = self.path(CHUNKS_DIR, chunk["name"])
+        return {column: np.load(os.path.join(directory, column + ".npy"), mmap_mode="r") for column in COLUMNS}
+
+    def load_daily(self, chunk):
+        # A chunk's {day: {question id: aggregate}}, read once and kept
+        daily = self.chunk_daily.get(chunk["name"])
+        if daily is not None:
+            return daily
+        path = self.path(CHUNKS_DIR, chunk["name"], DAILY_FILE)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                daily = {int(day): {int(k): v for k, v in rows.items()} for day, rows in json.load(f).items()}
+        else:
+            columns = self.load_chunk(chunk)
+            days = (np.asarray(columns["timestamp"]) // DAY).astype(np.int64)
+            daily = {}
+            for day in np.unique(days):
+                for question_id in np.unique(columns["question"][days == day]):
+                    rows = np.nonzero((days == day) & (columns["question"] == question_id))[0]
+                    add_columns(daily.setdefault(int(day), {}).setdefault(int(question_id), new_aggregate()),
+                                columns, rows)
+        self.chunk_daily[chunk["name"]] = daily
+        return daily
+
+    def scan(self, start=None, end=None, question=None):
+        # Columns of the rows with start <= timestamp < end, optionally for one question
+        start = -math.inf if start is None else start
+        end = math.inf if end is None else end
+        with self._lock:
+            chunks = [
+                chunk for chunk in self.manifest["chunks"]
+                if chunk["max_timestamp"] >= start and chunk["min_timestamp"] < end
+            ]
+            tail = {column: np.array([r[column] for r in self.tail], dtype=dtype) for column, dtype in COLUMNS.items()}
+        question_id = None if question is None else self.question_ids.get(question, -1)
+        parts = []
+        for columns, is_sorted in [(self.load_chunk(chunk), chunk["sorted"]) for chunk in chunks] + [(tail, False)]:
+            if is_sorted:
+                lo, hi = np.searchsorted(columns["timestamp"], [start, end])
+                rows = np.arange(lo, hi)
+            else:
+                timestamps = columns["timestamp"]
+                rows = np.nonzero((timestamps >= start) & (timestamps < end))[0]
+            if question_id is not None:
+                rows = rows[columns["question"][rows] == question_id]
+            parts.append({column: np.asarray(columns[column][rows]) for column in COLUMNS})
+        return {column: np.concatenate([part[column] for part in parts]) for column in COLUMNS}
+
+    def summary(self, start=None, end=None):
+        # {question: summarize()} for answers with start <= timestamp < end (Unix seconds)
+        with metrics.timer("analytics.summary"):
+            aggregates = {}
+            if start is None and end is None:
+                with self._lock:
+                    for question_id, aggregate in self.totals.items():
+                        merge_aggregate(aggregates.setdefault(question_id, new_aggregate()), aggregate)
+            else:
+                lo = -math.inf if start is None else start
+                hi = math.inf if end is None else end
+                first_day = None if start is None else math.ceil(start / DAY)
+                last_day = None if end is None else math.floor(end / DAY)
+                # Whole days, from the chunks holding rows of those days and the tail
+                day_start = -math.inf if first_day is None else first_day * DAY
+                day_end = math.inf if last_day is None else last_day * DAY
+                with self._lock:
+                    chunks = [
+                        chunk for chunk in self.manifest["chunks"]
+                        if chunk["max_timestamp"] >= day_start and chunk["min_timestamp"] < day_end
+                    ]
+                    merge_daily(aggregates, self.tail_daily, first_day, last_day)
+                for chunk in chunks:
+                    merge_daily(aggregates, self.load_daily(chunk), first_day, last_day)
+                # Rows of the partial days at either end
+                edges = []
+                if first_day is None or last_day is None or first_day < last_day:
+                    if first_day is not None:
+                        edges.append((lo, min(first_day * DAY, hi)))
+                    if last_day is not None:
+                        edges.append((max(last_day * DAY, lo), hi))
+                else:
+                    edges.append((lo, hi))
+                for edge_start, edge_end in edges:
+                    if edge_start >= edge_end:
+                        continue
+                    columns = self.scan(edge_start, edge_end)
+                    for question_id in np.unique(columns["question"]):
+                        rows = np.nonzero(columns["question"] == question_id)[0]
+                        add_columns(aggregates.setdefault(int(question_id), new_aggregate()), columns, rows)
+            questions = self.manifest["questions"]
+            return {questions[question_id]: summarize(aggregate) for question_id, aggregate in aggregates.items()}
+
+
+def write_json(path, data):
+    # Replace the file atomically, synced before it takes the old one's place
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + ".tmp", path)
+
+def parse_since(text):
+    # "7d", "12h", "30m" or a date like 2024-05-01 -> Unix seconds
+    units = {"d": DAY, "h": 3600, "m": 60}
+    if text[-1:] in units and text[:-1].replace(".", "", 1).isdigit():
+        return time.time() - float(text[:-1]) * units[text[-1]]
+    from datetime import datetime
+    return datetime.fromisoformat(text).timestamp()
+
+def import_log(store, log_file, batch_size=32, chunk_size=1024):
+    # Score the answer log and add every answer with its logged time, e.g. to start
+    # a store for answers given before it existed
+    from datetime import datetime
+    from itertools import islice
+    import interview_ai
+    records = interview_ai.iter_logged_answers(log_file)
+    imported = 0
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            break
+        pairs = [(record.get("soru", ""), record.get("cevap", "")) for record in chunk]
+        analyses = interview_ai.score_batch(pairs, batch_size=batch_size, include_entities=False, resolve_unknown=True)
+        for record, analysis in zip(chunk, analyses):
+            if analysis is None:
+                continue
+            try:
+                timestamp = datetime.fromisoformat(record["timestamp"]).timestamp()
+            except (KeyError, TypeError, ValueError):
+                timestamp = None
+            interview_ai.log_score(analysis, record.get("rating"), timestamp=timestamp, store=store)
+            imported += 1
+    store.seal()
+    return imported
+
+def print_summary(summary, file=sys.stdout):
+    for question, stats in sorted(summary.items(), key=lambda item: -item[1]["count"]):
+        if not stats["count"]:
+            continue
+        histogram = " ".join(str(count) for count in stats["histogram"])
+        print(f"{stats['count']:6d}  mean {stats['mean']:5.1f}  std {stats['std']:5.1f}  [{histogram}]  {question}",
+              file=file)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-question score reports from the analytics store.")
+    parser.add_argument("--store", help="analytics store directory (default: the one interview_ai writes)")
+    parser.add_argument("--since", help="only answers since then: 7d, 12h, 30m or an ISO date")
+    parser.add_argument("--until", help="only answers before then, same format")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--import-log", metavar="LOG", help="score an answer log and add it to the store first")
+    args = parser.parse_args(argv)
+
+    import interview_ai
+    directory = args.store or os.path.join(os.path.dirname(os.path.abspath(interview_ai.__file__)),
+                                           interview_ai.ANALYTICS_DIR)
+    # Reports only read, so they work while the app or the server is writing
+    try:
+        store = AnalyticsStore(directory, read_only=not args.import_log)
+    except StoreLocked as e:
+        print(f"⚠️ Cannot import: {e}. Stop it first.", file=sys.stderr)
+        sys.exit(1)
+    if args.import_log:
+        print(f"Imported {import_log(store, args.import_log)} scored answers.", file=sys.stderr)
+    summary = store.summary(
+        parse_since(args.since) if args.since else None,
+        parse_since(args.until) if args.until else None
+    )
+    if args.json:
+        print(json.dumps(summary, indent=2, ensure_ascii=False))
+    else:
+        print_summary(summary)
+    store.close()
+
+if __name__ == "__main__":
+    main()
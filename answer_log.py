@@ -0,0 +1,145 @@
+import atexit
+import json
+import os
+import threading
+from metrics import metrics
+
+
+class AnswerLog:
+    # Append-only JSONL log. Records are buffered and written with a single
+    # O_APPEND write once the buffer is full or `flush_interval` seconds have
+    # passed, so each write costs the size of the new records only and
+    # concurrent writers never overwrite each other.
+    def __init__(self, path, flush_size=32, flush_interval=1.0, fsync=True):
+        self.path = path
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._timer = None
+        atexit.register(self.close)
+
+    def append(self, record):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._buffer.append(line)
+            if len(self._buffer) >= self.flush_size:
+                self._flush_locked()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.flush_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._buffer:
+            return
+        data = "".join(self._buffer).encode("utf-8")
+        with metrics.timer("answer_log.flush"):
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, data)
+                if self.fsync:
+                    os.fsync(fd)
+            finally:
+                os.close(fd)
+        # Only dropped once on disk; after a failed write the records are retried with the next flush
+        metrics.increment("answer_log.records", len(self._buffer))
+        self._buffer = []
+
+    def close(self):
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"Error flushing answer log: {e}")
+
+    def __iter__(self):
+        self.flush()
+        return iter_records(self.path)
+
+
+def iter_json_array(path, chunk_size=65536):
+    # Stream records out of a JSON array file without loading the whole file
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    eof = False
+    with open(path, "r", encoding="utf-8") as f:
+        while True:
+            while position < len(buffer) and buffer[position] in " \t\r\n[,":
+                position += 1
+            if position < len(buffer) and buffer[position] == "]":
+                return
+            if position < len(buffer):
+                try:
+                    record, position = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                else:
+                    yield record
+                    continue
+            elif eof:
+                return
+            # Record is split across chunks, read more
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+
+def iter_jsonl(path):
+    # A torn last line from a crash mid-write is skipped quietly; a bad line anywhere
+    # else is corruption, so it is skipped with a warning naming the line
+    bad_line = None
+    with open(path, "r", encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            if bad_line is not None:
+                print(f"⚠️ Skipping unreadable line {bad_line} of {path}")
+                metrics.increment("answer_log.corrupt_lines")
+                bad_line = None
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                bad_line = number
+                continue
+            yield record
+
+def iter_records(path):
+    # Read either format, so old JSON array logs can still be streamed
+    if not os.path.exists(path):
+        return iter(())
+    with open(path, "r", encoding="utf-8") as f:
+        head = f.read(64).lstrip()
+    if head.startswith("["):
+        return iter_json_array(path)
+    return iter_jsonl(path)
+
+def migrate_json_array(src, dst):
+    # One-time conversion of the old JSON array log; the original file is kept
+    if os.path.exists(dst) or not os.path.exists(src):
+        return 0
+    count = 0
+    try:
+        with open(dst + ".tmp", "w", encoding="utf-8") as f:
+            for record in iter_records(src):
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                count += 1
+            f.flush()
+            os.fsync(f.fileno())
+    except Exception:
+        # A corrupt or truncated source leaves nothing half-written behind
+        if os.path.exists(dst + ".tmp"):
+            os.remove(dst + ".tmp")
+        raise
+    os.replace(dst + ".tmp", dst)
+    return count
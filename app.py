@@ -1,31 +1,31 @@
+import os
+import time
+from bisect import bisect_left, bisect_right
 import customtkinter as ctk
-import threading
-import random
-import sys
-from io import StringIO
 from datetime import datetime
-import json
-import os
 from interview_ai import (
-    question_set,
-    model,
-    sentiment_analyzer,
-    ner_pipeline,
-    kw_model,
-    keyword_map,
-    score_answer,
-    log_answer
+    question_rating,
+    new_scheduler,
+    AnswerAnalysis,
+    feedback_stages,
+    render_feedback_stage,
+    log_answer,
+    log_score,
+    warm_up_models,
+    configure_models_from_env
 )
-import torch
-from sentence_transformers import util
+from conversation_store import ConversationStore
+from inference_pool import InferencePool
+from metrics import metrics, configure_from_env
 
 # Set appearance mode and default color theme
 ctk.set_appearance_mode("dark")
 ctk.set_default_color_theme("blue")
 
 class HistoryItem(ctk.CTkFrame):
-    def __init__(self, parent, title, timestamp, command):
+    def __init__(self, parent, title="", timestamp="", command=None):
         super().__init__(parent, fg_color="transparent")
+        self.command = command
         
         self.title_label = ctk.CTkLabel(
             self,
@@ -45,13 +45,20 @@ class HistoryItem(ctk.CTkFrame):
         )
         self.timestamp_label.pack(fill="x", padx=10, pady=(0, 5))
         
-        self.bind("<Button-1>", lambda e: command())
-        self.title_label.bind("<Button-1>", lambda e: command())
-        self.timestamp_label.bind("<Button-1>", lambda e: command())
+        for widget in (self, self.title_label, self.timestamp_label):
+            widget.bind("<Button-1>", lambda e: self.command and self.command())
+    
+    def show(self, title, timestamp, command):
+        # Reuse this row for another conversation
+        self.title_label.configure(text=title)
+        self.timestamp_label.configure(text=timestamp)
+        self.command = command
 
 class ChatBubble(ctk.CTkFrame):
-    def __init__(self, parent, sender, message, is_user=False):
+    def __init__(self, parent, sender="", message="", is_user=False):
         super().__init__(parent, fg_color="transparent")
+        self.message = message
+        self.is_user = is_user
         
         # Create container for the bubble
         self.bubble_container = ctk.CTkFrame(
@@ -87,6 +94,187 @@ class ChatBubble(ctk.CTkFrame):
             anchor="w"
         )
         self.message_label.pack(fill="x", padx=15, pady=(0, 10))
+    
+    def set_message(self, message):
+        self.message = message
+        self.message_label.configure(text=message)
+    
+    def show(self, sender, message, is_user=False):
+        # Reuse this bubble for another message
+        if is_user != self.is_user:
+            self.is_user = is_user
+            self.bubble_container.configure(fg_color=("#2b2c2f" if is_user else "#343541"))
+            self.bubble_container.pack_configure(
+                anchor="e" if is_user else "w",
+                padx=(60, 10) if is_user else (10, 60)
+            )
+        self.sender_label.configure(text=sender)
+        self.set_message(message)
+
+class VirtualList(ctk.CTkFrame):
+    # Scrollable list that only has widgets for the rows on screen. Rows come from
+    # make_row(parent) and are filled by bind_row(widget, index); a row scrolled out
+    # of view is reused for the next one scrolled in. Heights start at an estimate
+    # and are corrected once a row has been measured, so rows may differ in height.
+    def __init__(self, parent, make_row, bind_row, estimated_height=60, overscan=2, bg_color="#202123", **kwargs):
+        super().__init__(parent, fg_color=bg_color, **kwargs)
+        self.make_row = make_row
+        self.bind_row = bind_row
+        self.estimated_height = estimated_height
+        self.overscan = overscan
+        self.heights = []
+        self.offsets = [0]
+        self.visible = {}
+        self.pool = []
+        self.windows = {}
+        self._refresh_pending = False
+        self.stick_to_end = False
+        
+        self.canvas = ctk.CTkCanvas(self, highlightthickness=0, bg=bg_color, yscrollincrement=20)
+        self.scrollbar = ctk.CTkScrollbar(self, command=self.yview)
+        self.canvas.configure(yscrollcommand=self.scrollbar.set)
+        self.scrollbar.pack(side="right", fill="y")
+        self.canvas.pack(side="left", fill="both", expand=True)
+        self.canvas.bind("<Configure>", self.on_resize)
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.canvas.bind_all(sequence, self.on_wheel, add="+")
+    
+    def __len__(self):
+        return len(self.heights)
+    
+    # Data
+    
+    def set_count(self, count):
+        # Rows past the old end get estimated heights; measured heights are kept
+        if count < len(self.heights):
+            del self.heights[count:]
+        else:
+            self.heights.extend([self.estimated_height] * (count - len(self.heights)))
+        self.update_offsets()
+        self.refresh()
+    
+    def reset(self, count):
+        # New data: forget measurements and rebind every row on screen
+        self.heights = [self.estimated_height] * count
+        for index in list(self.visible):
+            self.release(index)
+        self.update_offsets()
+        self.stick_to_end = False
+        self.canvas.yview_moveto(0)
+        self.refresh()
+    
+    def refresh_row(self, index):
+        # The data behind one row changed
+        widget = self.visible.get(index)
+        if widget is not None:
+            self.bind_row(widget, index)
+            if self.measure(index, widget):
+                self.update_offsets()
+            self.refresh()
+    
+    # Layout
+    
+    def update_offsets(self):
+        offsets = [0]
+        for height in self.heights:
+            offsets.append(offsets[-1] + height)
+        self.offsets = offsets
+        self.canvas.configure(scrollregion=(0, 0, self.canvas.winfo_width(), offsets[-1]))
+    
+    def refresh(self):
+        if not self._refresh_pending:
+            self._refresh_pending = True
+            self.after_idle(self._refresh)
+    
+    def _refresh(self):
+        self._refresh_pending = False
+        # Measuring new rows can move the end of the list, so pinned lists re-check
+        for _ in range(3):
+            if self.stick_to_end:
+                self.canvas.yview_moveto(1.0)
+            top = self.canvas.canvasy(0)
+            bottom = top + self.canvas.winfo_height()
+            first = max(bisect_right(self.offsets, top) - 1 - self.overscan, 0)
+            last = min(bisect_left(self.offsets, bottom) + self.overscan, len(self.heights))
+            for index in [i for i in self.visible if not first <= i < last]:
+                self.release(index)
+            changed = False
+            for index in range(first, last):
+                if index not in self.visible:
+                    widget = self.pool.pop() if self.pool else self.create_row()
+                    self.visible[index] = widget
+                    self.bind_row(widget, index)
+                    changed = self.measure(index, widget) or changed
+            if changed:
+                self.update_offsets()
+            if not (changed and self.stick_to_end):
+                break
+        self.place_rows()
+    
+    def create_row(self):
+        widget = self.make_row(self.canvas)
+        self.windows[widget] = self.canvas.create_window(0, 0, window=widget, anchor="nw",
+                                                         width=self.canvas.winfo_width())
+        return widget
+    
+    def release(self, index):
+        widget = self.visible.pop(index)
+        self.canvas.itemconfigure(self.windows[widget], state="hidden")
+        self.pool.append(widget)
+    
+    def measure(self, index, widget):
+        widget.update_idletasks()
+        height = widget.winfo_reqheight()
+        if height != self.heights[index]:
+            self.heights[index] = height
+            return True
+        return False
+    
+    def place_rows(self):
+        for index, widget in self.visible.items():
+            window = self.windows[widget]
+            self.canvas.coords(window, 0, self.offsets[index])
+            self.canvas.itemconfigure(window, state="normal")
+    
+    def on_resize(self, event):
+        for window in self.windows.values():
+            self.canvas.itemconfigure(window, width=event.width)
+        self.update_offsets()
+        self.refresh()
+    
+    # Scrolling
+    
+    def yview(self, *args):
+        # Scrolled by the user: stop following the end of the list
+        self.stick_to_end = False
+        self.canvas.yview(*args)
+        self.refresh()
+    
+    def scroll_to_end(self):
+        self.stick_to_end = True
+        self.refresh()
+    
+    def contains(self, widget):
+        while widget is not None:
+            if widget is self:
+                return True
+            widget = widget.master
+        return False
+    
+    def on_wheel(self, event):
+        # Wheel events are bound app-wide; only scroll when the pointer is over this list
+        try:
+            if not self.contains(self.winfo_containing(event.x_root, event.y_root)):
+                return
+        except KeyError:
+            return
+        if event.num == 4:
+            step = -1
+        elif event.num == 5:
+            step = 1
+        else:
+            step = -1 if event.delta > 0 else 1
+        self.yview("scroll", step * 3, "units")
 
 class InterviewApp:
     def __init__(self):
@@ -99,7 +287,12 @@ class InterviewApp:
         self.root.grid_rowconfigure(1, weight=1)
         
         self.current_question = None
+        self.scheduler = new_scheduler()
         self.interview_started = False
+        # Model inference runs on a fixed worker pool; answers sent close together share a batch
+        self.inference = InferencePool(self.stream_feedback_batch)
+        # Entities and key phrases cost two more models per answer; INTERVIEW_AI_INSIGHTS=1 turns them on
+        self.show_insights = os.environ.get("INTERVIEW_AI_INSIGHTS") == "1"
         self.conversations = []
         self.current_conversation = None
         
@@ -125,13 +318,22 @@ class InterviewApp:
         )
         self.new_chat_button.pack(fill="x", padx=15, pady=15)
         
-        # History container
-        self.history_container = ctk.CTkScrollableFrame(
+        # History list; only the rows on screen have widgets
+        self.history_label = ctk.CTkLabel(
             self.sidebar,
-            fg_color="transparent",
-            label_text="History"
+            text="History",
+            font=ctk.CTkFont(size=13, weight="bold"),
+            text_color="#ececf1"
         )
-        self.history_container.pack(fill="both", expand=True, padx=10, pady=(0, 10))
+        self.history_label.pack(fill="x", padx=10)
+        self.history_list = VirtualList(
+            self.sidebar,
+            make_row=HistoryItem,
+            bind_row=self.bind_history_row,
+            estimated_height=50,
+            bg_color="#202123"
+        )
+        self.history_list.pack(fill="both", expand=True, padx=10, pady=(0, 10))
         
         # Header
         self.header = ctk.CTkFrame(
@@ -151,13 +353,16 @@ class InterviewApp:
         )
         self.title.grid(row=0, column=0, pady=20)
         
-        # Chat area
-        self.chat_frame = ctk.CTkScrollableFrame(
+        # Chat area; bubbles are recycled as the conversation scrolls
+        self.chat_list = VirtualList(
             self.root,
-            fg_color="#202123",
+            make_row=ChatBubble,
+            bind_row=self.bind_chat_row,
+            estimated_height=80,
+            bg_color="#202123",
             corner_radius=0
         )
-        self.chat_frame.grid(row=1, column=1, sticky="nsew", padx=20, pady=(0, 20))
+        self.chat_list.grid(row=1, column=1, sticky="nsew", padx=20, pady=(0, 20))
         
         # Input area
         self.input_frame = ctk.CTkFrame(
@@ -206,6 +411,8 @@ class InterviewApp:
         self.send_button.grid(row=0, column=1, padx=(0, 15), pady=15)
         
         # Load conversations
+        self.store = ConversationStore("conversations", legacy_file="conversations.json")
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         self.load_conversations()
         
         # Start new chat if no conversations exist
@@ -213,39 +420,35 @@ class InterviewApp:
             self.start_new_chat()
     
     def start_new_chat(self):
-        # Clear chat area
-        for widget in self.chat_frame.winfo_children():
-            widget.destroy()
-        
         # Create new conversation
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M")
         conversation = {
-            "id": len(self.conversations),
+            "id": self.store.next_id(),
             "title": f"Interview {len(self.conversations) + 1}",
             "timestamp": timestamp,
             "messages": []
         }
         self.conversations.append(conversation)
         self.current_conversation = conversation
+        self.store.create(conversation)
         
-        # Add to history
-        self.add_to_history(conversation)
+        # Add to history and show the empty chat
+        self.history_list.set_count(len(self.conversations))
+        self.chat_list.reset(0)
         
-        # Start interview
+        # Start interview; every chat is its own session of question selection
+        self.scheduler = new_scheduler()
         self.interview_started = True
         self.get_next_question()
-        
-        # Save conversations
-        self.save_conversations()
-    
-    def add_to_history(self, conversation):
-        item = HistoryItem(
-            self.history_container,
-            conversation["title"],
-            conversation["timestamp"],
-            lambda: self.load_conversation(conversation["id"])
-        )
-        item.pack(fill="x", pady=2)
+    
+    def bind_history_row(self, item, index):
+        conversation = self.conversations[index]
+        item.show(conversation["title"], conversation["timestamp"],
+                  lambda: self.load_conversation(conversation["id"]))
+    
+    def bind_chat_row(self, bubble, index):
+        message = self.current_conversation["messages"][index]
+        bubble.show(message["sender"], message["text"], message["is_user"])
     
     def load_conversation(self, conversation_id):
         # Find conversation
@@ -253,141 +456,151 @@ class InterviewApp:
         if not conversation:
             return
         
-        # Clear chat area
-        for widget in self.chat_frame.winfo_children():
-            widget.destroy()
-        
-        # Set current conversation
+        # Messages are read from disk the first time a conversation is opened
+        if conversation.get("messages") is None:
+            conversation["messages"] = self.store.load_messages(conversation_id)
         self.current_conversation = conversation
-        
-        # Load messages
-        for message in conversation["messages"]:
-            self.add_bubble(message["sender"], message["text"], message["is_user"])
-    
-    def add_bubble(self, sender, message, is_user=False):
-        bubble = ChatBubble(self.chat_frame, sender, message, is_user)
-        bubble.pack(fill="x", pady=2)
-        self.root.after(100, self.scroll_to_bottom)
-        
-        # Save to conversation
-        if self.current_conversation:
-            self.current_conversation["messages"].append({
-                "sender": sender,
-                "text": message,
-                "is_user": is_user
-            })
-            self.save_conversations()
+        self.chat_list.reset(len(conversation["messages"]))
+        self.scroll_to_bottom()
+    
+    def add_bubble(self, sender, message, is_user=False, record=True):
+        # Returns the message's index in the current conversation
+        if self.current_conversation is None:
+            return None
+        entry = {
+            "sender": sender,
+            "text": message,
+            "is_user": is_user
+        }
+        messages = self.current_conversation["messages"]
+        messages.append(entry)
+        if record:
+            # Only the new message is queued for writing
+            self.store.append_message(self.current_conversation["id"], entry)
+        self.chat_list.set_count(len(messages))
+        self.scroll_to_bottom()
+        return len(messages) - 1
     
     def scroll_to_bottom(self):
-        self.chat_frame._parent_canvas.yview_moveto(1.0)
+        self.chat_list.scroll_to_end()
     
     def get_next_question(self):
-        available_questions = [(q, data) for q, data in question_set.items() if data["times_asked"] < 10]
-        if not available_questions:
+        self.current_question = self.scheduler.next_question()
+        if self.current_question is None:
             self.add_bubble("AI", "🎉 Congratulations! You've completed all questions!", is_user=False)
-            self.send_button.configure(state="disabled")
-            self.answer_entry.configure(state="disabled")
+            self.set_input_enabled(False)
             return
-        
-        available_questions.sort(key=lambda x: (-x[1]["rating"], x[1]["times_asked"]))
-        top_questions = available_questions[:min(3, len(available_questions))]
-        self.current_question = random.choice(top_questions)[0]
-        question_set[self.current_question]["times_asked"] += 1
         self.add_bubble("AI", self.current_question, is_user=False)
+        self.set_input_enabled(True)
+    
+    def set_input_enabled(self, enabled):
+        state = "normal" if enabled else "disabled"
+        self.send_button.configure(state=state)
+        self.answer_entry.configure(state=state)
     
     def calculate_rating(self, answer):
-        expected_answers = question_set[self.current_question]["answers"]
-        embeddings1 = model.encode(expected_answers, convert_to_tensor=True)
-        embeddings2 = model.encode(answer, convert_to_tensor=True)
-        similarity = util.pytorch_cos_sim(embeddings1, embeddings2)
-        semantic_score = float(similarity[0][0]) * 100
-        sentiment = sentiment_analyzer(answer)[0]
-        sentiment_score = sentiment['score']
-        sentiment_label = sentiment['label']
-        word_count = len(answer.split())
-        matched_keywords = []
-        answer_lower = answer.lower()
-        for topic, keywords in keyword_map.items():
-            if any(topic in q.lower() for q in [self.current_question]):
-                for kw in keywords:
-                    if kw in answer_lower:
-                        matched_keywords.append(kw)
-        total_score = 0
-        if semantic_score >= 80:
-            total_score += 40
-        elif semantic_score >= 60:
-            total_score += 30
-        elif semantic_score >= 40:
-            total_score += 20
-        else:
-            total_score += 10
-        if sentiment_label == 'POSITIVE':
-            if sentiment_score >= 0.9:
-                total_score += 20
-            elif sentiment_score >= 0.7:
-                total_score += 15
-            else:
-                total_score += 10
-        else:
-            total_score += 5
-        keyword_count = len(matched_keywords)
-        if keyword_count >= 3:
-            total_score += 20
-        elif keyword_count == 2:
-            total_score += 15
-        elif keyword_count == 1:
-            total_score += 10
-        else:
-            total_score += 5
-        if word_count >= 50:
-            total_score += 20
-        elif word_count >= 30:
-            total_score += 15
-        elif word_count >= 10:
-            total_score += 10
-        else:
-            total_score += 5
-        return total_score
+        return AnswerAnalysis(self.current_question, answer).total_score
     
     def submit_answer(self):
         answer = self.answer_var.get().strip()
-        if not answer:
+        if not answer or self.current_question is None:
             return
+        question = self.current_question
+        # One answer per question: input stays off until this one has been scored
+        self.current_question = None
+        self.set_input_enabled(False)
         self.add_bubble("You", answer, is_user=True)
         self.answer_var.set("")
-        log_answer(self.current_question, answer, question_set[self.current_question]["rating"])
-        threading.Thread(target=self.process_feedback, args=(answer,), daemon=True).start()
-    
-    def process_feedback(self, answer):
-        total_score = self.calculate_rating(answer)
-        rating_text = f"Overall Rating: {total_score}/100 ({round(total_score/10, 1)}/10)"
-        old_stdout = sys.stdout
-        feedback_output = StringIO()
-        sys.stdout = feedback_output
-        score_answer(self.current_question, answer)
-        feedback_text = feedback_output.getvalue()
-        sys.stdout = old_stdout
-        self.root.after(0, lambda: self.add_bubble("AI", rating_text + "\n" + feedback_text, is_user=False))
-        self.root.after(0, self.get_next_question)
+        submitted = time.perf_counter()
+        log_answer(question, answer, question_rating(question))
+        # One message per answer, filled in stage by stage and saved once complete. Its
+        # place in the saved conversation is reserved now: the next question shows up
+        # before the insights are in, but must not be saved ahead of this message.
+        conversation = self.current_conversation
+        index = self.add_bubble("AI", "⏳ Analyzing your answer...", is_user=False, record=False)
+        answer_state = {"advanced": False, "slot": self.store.reserve_message(conversation["id"])}
+        on_stage = lambda stage, analysis, feedback: self.root.after(
+            0, self.show_feedback_stage, conversation, index, stage, analysis, feedback, submitted, answer_state
+        )
+        future = self.inference.submit((question, answer, on_stage))
+        future.add_done_callback(
+            lambda f: self.root.after(0, self.process_feedback, conversation, index, f, answer_state)
+        )
     
-    def save_conversations(self):
+    def stream_feedback_batch(self, items):
+        # Runs on an inference worker and reports every stage back as soon as it is ready
+        with metrics.profile("feedback_batch"):
+            pairs = [(question, answer) for question, answer, _ in items]
+            feedbacks = [None] * len(items)
+            for stage, analyses, feedbacks in feedback_stages(pairs, include_insights=self.show_insights):
+                for (_, _, on_stage), analysis, feedback in zip(items, analyses, feedbacks):
+                    if analysis is not None:
+                        on_stage(stage, analysis, feedback)
+            return feedbacks
+    
+    def update_message(self, conversation, index, text):
+        # Every stage replaces the text of the same message
+        conversation["messages"][index]["text"] = text
+        if conversation is self.current_conversation:
+            self.chat_list.refresh_row(index)
+            if index == len(conversation["messages"]) - 1:
+                self.scroll_to_bottom()
+    
+    def show_feedback_stage(self, conversation, index, stage, analysis, feedback, submitted, answer_state):
+        # Runs on the Tk loop
+        final_stage = "insights" if self.show_insights else "models"
+        with metrics.timer("app.render_feedback"):
+            self.update_message(conversation, index, render_feedback_stage(stage, analysis, feedback, final_stage))
+        # Submit to each stage on screen, including time queued for a worker
+        metrics.observe(f"app.answer_latency.{stage}", time.perf_counter() - submitted)
+        if stage == "models":
+            # The score is final now; insights, if on, only fill in this message later
+            log_score(feedback.analysis, question_rating(feedback.analysis.question))
+            self.advance(answer_state)
+    
+    def advance(self, answer_state):
+        # Next question, once per answer
+        if not answer_state["advanced"]:
+            answer_state["advanced"] = True
+            self.get_next_question()
+    
+    def process_feedback(self, conversation, index, future, answer_state):
+        # Runs on the Tk loop after the last stage has been shown
         try:
-            with open("conversations.json", "w", encoding="utf-8") as f:
-                json.dump(self.conversations, f, ensure_ascii=False, indent=2)
+            feedback = future.result()
         except Exception as e:
-            print(f"Error saving conversations: {e}")
+            print(f"Error scoring answer: {e}")
+            metrics.increment("app.scoring_errors")
+            feedback = None
+        if feedback is None and not answer_state["advanced"]:
+            self.update_message(conversation, index, "⚠️ Sorry, I couldn't score that answer. Let's try the next one!")
+        self.store.fill_message(conversation["id"], answer_state["slot"], conversation["messages"][index])
+        self.advance(answer_state)
+    
+    def save_conversations(self):
+        self.store.flush()
     
     def load_conversations(self):
+        # Titles and timestamps only; messages are loaded when a conversation is opened
         try:
-            if os.path.exists("conversations.json"):
-                with open("conversations.json", "r", encoding="utf-8") as f:
-                    self.conversations = json.load(f)
-                    for conversation in self.conversations:
-                        self.add_to_history(conversation)
+            self.conversations = self.store.list_conversations()
+            self.history_list.set_count(len(self.conversations))
         except Exception as e:
             print(f"Error loading conversations: {e}")
+    
+    def on_close(self):
+        # Make sure queued messages hit the disk before the window goes away
+        self.inference.shutdown(wait=False)
+        self.store.close()
+        self.root.destroy()
 
 def main():
+    # Opt-in instrumentation, see metrics.configure_from_env()
+    configure_from_env()
+    # Optional memory budget for the models, see interview_ai.configure_models_from_env()
+    configure_models_from_env()
+    # Models load in the background while the window comes up
+    warm_up_models()
     app = InterviewApp()
     app.root.mainloop()
 
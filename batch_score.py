@@ -0,0 +1,117 @@
+import argparse
+import json
+import sys
+from collections import deque
+from concurrent.futures import Future
+from itertools import islice
+import interview_ai
+from interview_ai import LOG_FILE, QUESTION_MATCH_THRESHOLD, iter_logged_answers
+from prefork import PreforkPool, prepare_fork, score_rows
+
+
+def score_log(log_file, output, batch_size=32, chunk_size=1024, include_entities=True,
+              resolve_unknown=True, min_confidence=QUESTION_MATCH_THRESHOLD, prefork=None, tiered=False):
+    # Re-grade the answer log chunk by chunk and write one JSON line per answer.
+    # With a PreforkPool, chunks are scored in parallel and still written in order.
+    options = {
+        "batch_size": batch_size,
+        "include_entities": include_entities,
+        "resolve_unknown": resolve_unknown,
+        "min_confidence": min_confidence,
+        "tiered": tiered
+    }
+    records = iter_logged_answers(log_file)
+    in_flight = deque()
+    max_in_flight = 2 * prefork.processes if prefork is not None else 1
+    scored = skipped = 0
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if chunk:
+            pairs = [(record.get("soru", ""), record.get("cevap", "")) for record in chunk]
+            if prefork is not None:
+                future = prefork.submit("score", pairs, options)
+            else:
+                future = Future()
+                future.set_result(score_rows(pairs, options))
+            in_flight.append((chunk, pairs, future))
+        if not in_flight:
+            break
+        if chunk and len(in_flight) < max_in_flight:
+            continue
+        chunk, pairs, future = in_flight.popleft()
+        for record, (question, answer), row in zip(chunk, pairs, future.result()):
+            if row is None:
+                row = {"question": question, "answer": answer, "error": "unknown question"}
+                skipped += 1
+            else:
+                scored += 1
+            if "timestamp" in record:
+                row["timestamp"] = record["timestamp"]
+            output.write(json.dumps(row, ensure_ascii=False) + "\n")
+    return scored, skipped
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score logged interview answers offline.")
+    parser.add_argument("--log", default=LOG_FILE, help="answer log to read (JSONL or legacy JSON array)")
+    parser.add_argument("--output", default="-", help="JSONL file to write scores to (default: stdout)")
+    parser.add_argument("--batch-size", type=int, default=32, help="answers per model forward pass")
+    parser.add_argument("--chunk-size", type=int, default=1024, help="log records read per chunk")
+    parser.add_argument("--no-entities", action="store_true", help="skip named entity recognition")
+    parser.add_argument("--no-resolve", action="store_true", help="skip questions that are not in the bank verbatim")
+    parser.add_argument("--min-confidence", type=float, default=QUESTION_MATCH_THRESHOLD,
+                        help="similarity needed to map a logged question to a known one")
+    parser.add_argument("--sentences", type=int, nargs="?", const=interview_ai.MAX_SENTENCES, default=None,
+                        metavar="MAX", help="score answers sentence by sentence, at most MAX sentences each (default: %(const)s)")
+    parser.add_argument("--tiered", action="store_true",
+                        help="score clear-cut answers lexically and run the models only on ambiguous ones")
+    parser.add_argument("--tier-policy", help="tier thresholds JSON (default: " + interview_ai.LEXICAL_POLICY_FILE + ")")
+    parser.add_argument("--processes", type=int, default=0, help="forked scoring processes (0: score in-process)")
+    parser.add_argument("--torch-threads", type=int, default=1, help="intra-op threads per scoring process")
+    parser.add_argument("--onnx", metavar="DIR",
+                        help="run the encoder and sentiment models on ONNX Runtime from exports in DIR "
+                             "(see onnx_backend.py export)")
+    parser.add_argument("--onnx-fp32", action="store_true", help="use the unquantized ONNX export")
+    args = parser.parse_args(argv)
+
+    if args.onnx:
+        # Sessions are created before any fork and their thread pools would not survive
+        # it, so forked workers run them on one thread each
+        interview_ai.use_onnx_backend(args.onnx, quantized=not args.onnx_fp32,
+                                      intra_op_threads=1 if args.processes else None)
+    if args.sentences:
+        interview_ai.use_sentence_analysis(args.sentences)
+    if args.tiered:
+        interview_ai.configure_tiers(args.tier_policy)
+    prefork = None
+    if args.processes:
+        # Load everything the workers need before forking so they share it; the
+        # parent runs the encoder here, on one thread so the fork stays safe
+        prepare_fork()
+        interview_ai.preload_models()
+        if not args.no_resolve:
+            interview_ai.get_question_index()
+        if args.tiered:
+            interview_ai.get_lexical_index()
+        prefork = PreforkPool(args.processes, torch_threads=args.torch_threads)
+    output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        scored, skipped = score_log(
+            args.log,
+            output,
+            batch_size=args.batch_size,
+            chunk_size=args.chunk_size,
+            include_entities=not args.no_entities,
+            resolve_unknown=not args.no_resolve,
+            min_confidence=args.min_confidence,
+            prefork=prefork,
+            tiered=args.tiered
+        )
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        if prefork is not None:
+            prefork.shutdown()
+    print(f"Scored {scored} answers, skipped {skipped} with unknown questions.", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
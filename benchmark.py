@@ -0,0 +1,318 @@
+import argparse
+import gc
+import hashlib
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+import interview_ai
+from interview_ai import (
+    AnswerAnalysis,
+    score_answer,
+    score_batch,
+    check_keywords,
+    log_answer,
+    iter_logged_answers
+)
+from conversation_store import ConversationStore
+
+FAKE_VERSION = "fake-1"
+FILLER_WORDS = [
+    "the", "a", "project", "worked", "on", "with", "my", "we", "I", "and", "to", "improve",
+    "during", "internship", "system", "results", "learned", "customer", "deadline", "code",
+    "not", "always", "because", "data", "plan", "month", "solution", "feedback", "Istanbul", "Google"
+]
+NEGATIVE_WORDS = {"not", "never", "bad", "failed", "difficult", "problem", "stress"}
+
+
+# Deterministic stand-ins with the same call signatures as the real models. They
+# do a comparable amount of Python work per word, so relative costs stay realistic,
+# and they need no downloads, so numbers are stable between runs and machines.
+
+def word_hash(word, modulo):
+    return int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=4).digest(), "little") % modulo
+
+class FakeEncoder:
+    def __init__(self, dim=384):
+        self.dim = dim
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True, **kwargs):
+        single = isinstance(texts, str)
+        vectors = np.zeros((1 if single else len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate([texts] if single else texts):
+            for word in text.lower().split():
+                vectors[i, word_hash(word, self.dim)] += 1.0
+        return vectors[0] if single else vectors
+
+class FakeSentimentPipeline:
+    def __call__(self, texts, batch_size=32, **kwargs):
+        results = []
+        for text in texts:
+            words = text.lower().split()
+            negative = sum(word in NEGATIVE_WORDS for word in words)
+            ratio = negative / max(len(words), 1)
+            label = "NEGATIVE" if ratio > 0.1 else "POSITIVE"
+            results.append({"label": label, "score": round(0.6 + min(ratio * 2, 0.39), 4)})
+        return results
+
+class FakeNERPipeline:
+    def __call__(self, texts, batch_size=32, **kwargs):
+        return [
+            [{"entity_group": "ORG", "word": word, "score": 0.9} for word in text.split()[1:] if word[:1].isupper()]
+            for text in texts
+        ]
+
+class FakeKeyBERT:
+    def extract_keywords(self, text, top_n=5, **kwargs):
+        words = sorted(set(text.lower().split()), key=lambda w: (-len(w), w))
+        return [(word, round(1.0 / (i + 1), 4)) for i, word in enumerate(words[:top_n])]
+
+
+def use_fake_models(directory):
+    # Swap every model in interview_ai for a stand-in; versions change so cached
+    # results of the real models are never mixed in
+    from embedding_index import ReferenceIndex
+    for name in interview_ai.model_versions:
+        interview_ai.model_versions[name] = FAKE_VERSION
+    interview_ai.models.register('model', FakeEncoder)
+    interview_ai.models.register('sentiment_analyzer', FakeSentimentPipeline)
+    interview_ai.models.register('ner_pipeline', FakeNERPipeline)
+    interview_ai.models.register('kw_model', FakeKeyBERT)
+    interview_ai.models.register('reference_index', lambda: ReferenceIndex(
+        os.path.join(directory, "reference_embeddings"), FAKE_VERSION
+    ))
+    interview_ai.question_index = None
+
+
+# Synthetic data
+
+def synthetic_answer(rng, words):
+    vocabulary = FILLER_WORDS + [kw for keywords in interview_ai.keyword_map.values() for kw in keywords]
+    return " ".join(rng.choice(vocabulary) for _ in range(words))
+
+def synthetic_pairs(rng, count, words):
+    questions = list(interview_ai.questions)
+    return [(rng.choice(questions), synthetic_answer(rng, words)) for _ in range(count)]
+
+def synthetic_log(rng, path, count, words=30):
+    with open(path, "w", encoding="utf-8") as f:
+        for question, answer in synthetic_pairs(rng, count, words):
+            record = {"soru": question, "cevap": answer, "rating": 0, "timestamp": str(datetime.now())}
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+def synthetic_conversation(rng, number, messages):
+    return {
+        "id": number,
+        "title": f"Interview {number + 1}",
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M"),
+        "messages": [
+            {"sender": "You" if i % 2 else "AI", "text": synthetic_answer(rng, 20),
+             "is_user": bool(i % 2)}
+            for i in range(messages)
+        ]
+    }
+
+
+# Measurement
+
+def percentile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(round(q / 100 * (len(sorted_values) - 1))))]
+
+def measure(fn, inputs, memory_samples=20):
+    # Latency of fn(item) per input, plus peak traced memory. The last few inputs are
+    # run under tracemalloc instead of being timed, since tracing slows calls down;
+    # they are unseen inputs, so cached stages are not flattered.
+    timed, traced = inputs, inputs[:memory_samples]
+    if len(inputs) > 2 * memory_samples:
+        timed, traced = inputs[:-memory_samples], inputs[-memory_samples:]
+    gc.collect()
+    latencies = []
+    started = time.perf_counter()
+    for item in timed:
+        t = time.perf_counter()
+        fn(item)
+        latencies.append(time.perf_counter() - t)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    for item in traced:
+        fn(item)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        "count": len(latencies),
+        "mean_ms": sum(latencies) / len(latencies) * 1000,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "throughput_per_s": len(latencies) / elapsed if elapsed else None,
+        "peak_memory_kb": peak / 1024
+    }
+
+
+# Stages
+
+def bench_scoring(rng, iterations, answer_lengths):
+    results = {}
+    for words in answer_lengths:
+        # Fresh answers every time: the result cache would otherwise hide model cost
+        pairs = synthetic_pairs(rng, iterations, words)
+        results[f"score_answer[words={words}]"] = measure(lambda p: score_answer(*p), pairs)
+        pairs = synthetic_pairs(rng, iterations, words)
+        results[f"calculate_rating[words={words}]"] = measure(lambda p: AnswerAnalysis(*p).total_score, pairs)
+        answers = [answer for _, answer in synthetic_pairs(rng, iterations, words)]
+        results[f"check_keywords[words={words}]"] = measure(check_keywords, answers)
+    pairs = synthetic_pairs(rng, iterations, 30)
+    for pair in pairs:
+        score_answer(*pair)
+    results["score_answer[cached]"] = measure(lambda p: score_answer(*p), pairs)
+    pairs = synthetic_pairs(rng, iterations, 30)
+    chunks = [pairs[i:i + 32] for i in range(0, len(pairs), 32)]
+    stats = measure(lambda chunk: score_batch(chunk), chunks)
+    stats["answers_per_s"] = stats["throughput_per_s"] * len(pairs) / len(chunks)
+    results["score_batch[size=32]"] = stats
+    return results
+
+def bench_answer_log(rng, directory, iterations, log_sizes):
+    results = {}
+    path = os.path.join(directory, "bench_log.jsonl")
+    pairs = synthetic_pairs(rng, iterations, 30)
+    results["log_answer"] = measure(lambda p: log_answer(p[0], p[1], 0, log_file=path), pairs)
+    interview_ai.get_answer_log(path).close()
+    for size in log_sizes:
+        path = os.path.join(directory, f"bench_log_{size}.jsonl")
+        synthetic_log(rng, path, size)
+        results[f"iter_logged_answers[records={size}]"] = measure(
+            lambda p: sum(1 for _ in iter_logged_answers(p)), [path] * 3, memory_samples=1
+        )
+    return results
+
+def bench_conversations(rng, directory, iterations, conversation_counts):
+    results = {}
+    store = ConversationStore(os.path.join(directory, "conversations"), delay=0, max_delay=0)
+    store.create(synthetic_conversation(rng, 0, 0))
+    messages = [{"sender": "You", "text": synthetic_answer(rng, 20), "is_user": True} for _ in range(iterations)]
+    results["save_conversations[append]"] = measure(lambda m: store.append_message(0, m), messages)
+
+    def append_and_flush(message):
+        store.append_message(0, message)
+        store.flush()
+    results["save_conversations[append+flush]"] = measure(append_and_flush, messages)
+    store.close()
+
+    for count in conversation_counts:
+        store = ConversationStore(os.path.join(directory, f"conversations_{count}"))
+        for number in range(count):
+            store.create(synthetic_conversation(rng, number, 10))
+        store.flush()
+        results[f"list_conversations[count={count}]"] = measure(
+            lambda _: store.list_conversations(), [None] * 5, memory_samples=1
+        )
+        store.close()
+    return results
+
+
+def run(args):
+    rng = random.Random(args.seed)
+    directory = tempfile.mkdtemp(prefix="interview_ai_bench_")
+    try:
+        if not args.real_models:
+            use_fake_models(directory)
+        interview_ai.configure_cache()
+        started = time.perf_counter()
+        if args.real_models:
+            interview_ai.preload_models()
+        else:
+            interview_ai.models.preload()
+        load_seconds = time.perf_counter() - started
+
+        results = {}
+        stages = set(args.stages)
+        if "scoring" in stages:
+            results.update(bench_scoring(rng, args.iterations, args.answer_lengths))
+        if "log" in stages:
+            results.update(bench_answer_log(rng, directory, args.iterations, args.log_sizes))
+        if "conversations" in stages:
+            results.update(bench_conversations(rng, directory, args.iterations, args.conversation_counts))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    return {
+        "meta": {
+            "timestamp": str(datetime.now()),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "models": "real" if args.real_models else FAKE_VERSION,
+            "model_versions": dict(interview_ai.model_versions),
+            "model_load_s": load_seconds,
+            "iterations": args.iterations,
+            "seed": args.seed
+        },
+        "results": results
+    }
+
+def print_report(report):
+    print(f"{'stage':<44}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ops/s':>12}{'peak KB':>10}")
+    for name, stats in report["results"].items():
+        print(f"{name:<44}{stats['p50_ms']:>10.3f}{stats['p95_ms']:>10.3f}{stats['p99_ms']:>10.3f}"
+              f"{stats['throughput_per_s'] or 0:>12.1f}{stats['peak_memory_kb']:>10.1f}")
+
+def compare(report, baseline, threshold, metric="p50_ms"):
+    # Stages whose metric got slower than the baseline by more than `threshold`
+    regressions = []
+    print(f"\n{'stage':<44}{'baseline':>10}{'current':>10}{'change':>10}")
+    for name, stats in report["results"].items():
+        before = baseline["results"].get(name)
+        if before is None or not before.get(metric):
+            continue
+        change = stats[metric] / before[metric] - 1
+        flag = " ⚠️" if change > threshold else ""
+        print(f"{name:<44}{before[metric]:>10.3f}{stats[metric]:>10.3f}{change:>+10.1%}{flag}")
+        if change > threshold:
+            regressions.append(name)
+    if baseline["meta"].get("models") != report["meta"]["models"]:
+        print("⚠️ Baseline was recorded with different models; the comparison is not like for like.")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Interview AI scoring hot path.")
+    parser.add_argument("--real-models", action="store_true", help="use the real models instead of stand-ins")
+    parser.add_argument("--iterations", type=int, default=200, help="calls measured per stage")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stages", nargs="+", default=["scoring", "log", "conversations"],
+                        choices=["scoring", "log", "conversations"])
+    parser.add_argument("--answer-lengths", type=int, nargs="+", default=[10, 50, 200], help="words per answer")
+    parser.add_argument("--log-sizes", type=int, nargs="+", default=[1000, 10000], help="records per answer log")
+    parser.add_argument("--conversation-counts", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="baseline JSON from an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="p50 slowdown that counts as a regression")
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"❌ {len(regressions)} stage(s) regressed by more than {args.threshold:.0%}")
+            sys.exit(1)
+        print("✅ No regressions")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+import atexit
+import json
+import os
+import shutil
+import threading
+import time
+from metrics import metrics
+
+
+class ConversationStore:
+    # One JSONL file per conversation: the first line holds the metadata
+    # (id, title, timestamp), every following line is one message. New messages
+    # are appended by a background writer that coalesces bursts of changes, so a
+    # save costs the size of the new messages, not the whole history.
+    def __init__(self, directory, legacy_file=None, delay=0.5, max_delay=2.0):
+        self.directory = directory
+        self.delay = delay
+        self.max_delay = max_delay
+        self._pending = {}
+        self._held = {}
+        self._first_change = None
+        self._last_change = None
+        self._closed = False
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        if legacy_file and not os.path.isdir(directory):
+            self.migrate(legacy_file)
+        os.makedirs(directory, exist_ok=True)
+        self._writer = threading.Thread(target=self._run, daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def path(self, conversation_id):
+        return os.path.join(self.directory, f"{conversation_id}.jsonl")
+
+    def create(self, conversation):
+        # Never replaces a saved conversation; take ids from next_id()
+        if os.path.exists(self.path(conversation["id"])) or conversation["id"] in self._pending:
+            raise ValueError(f"conversation {conversation['id']} already exists")
+        header = {k: v for k, v in conversation.items() if k != "messages"}
+        self._queue(conversation["id"], header=header, messages=conversation.get("messages", []))
+
+    def append_message(self, conversation_id, message):
+        with self._cond:
+            held = self._held.get(conversation_id)
+            if held:
+                held.append([message])
+            else:
+                self._queue(conversation_id, messages=[message])
+
+    def reserve_message(self, conversation_id):
+        # A place for a message that is not final yet, e.g. feedback still streaming in.
+        # Messages appended after it wait until fill_message(), so the file keeps the
+        # order they were shown in.
+        slot = [None]
+        with self._cond:
+            self._held.setdefault(conversation_id, []).append(slot)
+        return slot
+
+    def fill_message(self, conversation_id, slot, message):
+        slot[0] = message
+        with self._cond:
+            held = self._held.get(conversation_id, [])
+            ready = []
+            while held and held[0][0] is not None:
+                ready.append(held.pop(0)[0])
+            if not held:
+                self._held.pop(conversation_id, None)
+            if ready:
+                self._queue(conversation_id, messages=ready)
+
+    def _queue(self, conversation_id, header=None, messages=()):
+        with self._cond:
+            entry = self._pending.setdefault(conversation_id, {"header": None, "messages": []})
+            if header is not None:
+                entry["header"] = header
+            entry["messages"].extend(messages)
+            now = time.monotonic()
+            if self._first_change is None:
+                self._first_change = now
+            self._last_change = now
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                # Wait for a quiet period, but never hold changes longer than max_delay
+                while self._pending and not self._closed:
+                    now = time.monotonic()
+                    deadline = min(self._last_change + self.delay, self._first_change + self.max_delay)
+                    if now >= deadline:
+                        break
+                    self._cond.wait(deadline - now)
+            self.flush()
+
+    def flush(self):
+        with self._write_lock, metrics.timer("conversation_store.flush"):
+            with self._cond:
+                pending = self._pending
+                self._pending = {}
+                self._first_change = self._last_change = None
+            for conversation_id, entry in pending.items():
+                try:
+                    self._write(conversation_id, entry)
+                except Exception as e:
+                    print(f"Error saving conversation {conversation_id}: {e}")
+
+    def _write(self, conversation_id, entry):
+        lines = []
+        if entry["header"] is not None:
+            lines.append(json.dumps(entry["header"], ensure_ascii=False) + "\n")
+        lines.extend(json.dumps(m, ensure_ascii=False) + "\n" for m in entry["messages"])
+        if not lines:
+            return
+        mode = "w" if entry["header"] is not None else "a"
+        with open(self.path(conversation_id), mode, encoding="utf-8") as f:
+            f.writelines(lines)
+
+    def close(self):
+        with self._cond:
+            # Messages held behind one that never got filled are still worth keeping
+            for conversation_id, held in list(self._held.items()):
+                self._queue(conversation_id, messages=[slot[0] for slot in held if slot[0] is not None])
+            self._held = {}
+            self._closed = True
+            self._cond.notify()
+        self.flush()
+
+    def next_id(self):
+        # One past every id in use, counting files list_conversations() could not read
+        ids = [-1]
+        for name in os.listdir(self.directory):
+            stem, extension = os.path.splitext(name)
+            if extension == ".jsonl" and stem.isdigit():
+                ids.append(int(stem))
+        with self._cond:
+            ids.extend(cid for cid in self._pending if isinstance(cid, int))
+        return max(ids) + 1
+
+    def list_conversations(self):
+        # Metadata only: reads the first line of each file, never the messages
+        conversations = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".jsonl"):
+                continue
+            try:
+                with open(os.path.join(self.directory, name), "r", encoding="utf-8") as f:
+                    conversations.append(json.loads(f.readline()))
+            except Exception as e:
+                print(f"Error reading conversation {name}: {e}")
+        with self._cond:
+            known = {c["id"] for c in conversations}
+            conversations.extend(
+                entry["header"] for cid, entry in self._pending.items()
+                if entry["header"] is not None and cid not in known
+            )
+        conversations.sort(key=lambda c: c["id"])
+        return conversations
+
+    def load_messages(self, conversation_id):
+        messages = []
+        path = self.path(conversation_id)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                f.readline()
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        messages.append(json.loads(line))
+        with self._cond:
+            entry = self._pending.get(conversation_id)
+            if entry is not None:
+                if entry["header"] is not None:
+                    messages = []
+                messages.extend(entry["messages"])
+        return messages
+
+    def load_all(self):
+        conversations = self.list_conversations()
+        for conversation in conversations:
+            conversation["messages"] = self.load_messages(conversation["id"])
+        return conversations
+
+    def migrate(self, legacy_file):
+        # One-time split of the old single conversations.json file. A file that cannot
+        # be read is left where it is and the store starts empty.
+        if not os.path.exists(legacy_file):
+            return
+        tmp_directory = self.directory + ".tmp"
+        try:
+            with open(legacy_file, "r", encoding="utf-8") as f:
+                conversations = json.load(f)
+            os.makedirs(tmp_directory, exist_ok=True)
+            for conversation in conversations:
+                header = {k: v for k, v in conversation.items() if k != "messages"}
+                with open(os.path.join(tmp_directory, f"{conversation['id']}.jsonl"), "w", encoding="utf-8") as f:
+                    f.write(json.dumps(header, ensure_ascii=False) + "\n")
+                    for message in conversation.get("messages", []):
+                        f.write(json.dumps(message, ensure_ascii=False) + "\n")
+            os.replace(tmp_directory, self.directory)
+        except Exception as e:
+            print(f"⚠️ Could not migrate {legacy_file} ({e}); starting with no saved conversations, "
+                  f"the file is kept as it is")
+            shutil.rmtree(tmp_directory, ignore_errors=True)
@@ -0,0 +1,177 @@
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+
+
+def answers_hash(answers):
+    digest = hashlib.sha1()
+    for answer in answers:
+        digest.update(answer.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def normalize_rows(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def reduce_similarities(similarities, reduction="max", top_k=3):
+    # Collapse the reference axis (the last one) into one score per answer
+    similarities = np.asarray(similarities)
+    if reduction == "max":
+        return similarities.max(axis=-1)
+    if reduction == "mean":
+        return similarities.mean(axis=-1)
+    if reduction == "topk":
+        k = min(top_k, similarities.shape[-1])
+        return np.partition(similarities, -k, axis=-1)[..., -k:].mean(axis=-1)
+    raise ValueError(f"Unknown similarity reduction: {reduction}")
+
+
+def segment_similarities(matrix, starts, stops, answer_embedding, reduction="max", top_k=3):
+    # One reduced score per [start, stop) row segment of a normalized reference matrix.
+    # Segments must be non-empty, in order and cover the matrix rows they index.
+    similarities = matrix @ normalize_rows(answer_embedding)[0]
+    if reduction == "max":
+        return np.maximum.reduceat(similarities, starts)
+    if reduction == "mean":
+        return np.add.reduceat(similarities, starts) / (stops - starts)
+    return np.array([
+        reduce_similarities(similarities[start:stop], reduction, top_k) for start, stop in zip(starts, stops)
+    ])
+
+
+class ReferenceIndex:
+    # Reference answers of every question, encoded once and kept as one contiguous
+    # float32 matrix. Rows are L2-normalized so cosine similarity is a dot product.
+    # Persisted as <path>.npy plus a <path>.json manifest.
+    # The matrix and its row ranges are swapped together as one (matrix, entries)
+    # tuple, so readers on other threads never pair a new matrix with old ranges;
+    # each reader takes the tuple once.
+    def __init__(self, path, model_name):
+        self.path = path
+        self.model_name = model_name
+        self.state = (np.zeros((0, 0), dtype=np.float32), {})
+        self._build_lock = threading.Lock()
+        self.load()
+
+    @property
+    def matrix(self):
+        return self.state[0]
+
+    @property
+    def entries(self):
+        return self.state[1]
+
+    @property
+    def matrix_path(self):
+        return self.path + ".npy"
+
+    @property
+    def manifest_path(self):
+        return self.path + ".json"
+
+    def load(self):
+        if not (os.path.exists(self.matrix_path) and os.path.exists(self.manifest_path)):
+            return
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            matrix = np.load(self.matrix_path)
+        except Exception as e:
+            print(f"Error loading reference index: {e}")
+            return
+        if manifest.get("model") != self.model_name or matrix.dtype != np.float32:
+            return
+        self.state = (np.ascontiguousarray(matrix), manifest.get("questions", {}))
+
+    def save(self):
+        matrix, entries = self.state
+        manifest = {"model": self.model_name, "questions": entries}
+        # Write to temp files first so a crash never leaves a half-written index
+        with open(self.matrix_path + ".tmp", "wb") as f:
+            np.save(f, matrix)
+        with open(self.manifest_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(self.matrix_path + ".tmp", self.matrix_path)
+        os.replace(self.manifest_path + ".tmp", self.manifest_path)
+
+    def is_current(self, question, answers):
+        entry = self.entries.get(question)
+        return entry is not None and entry["hash"] == answers_hash(answers)
+
+    def build(self, question_set, encoder):
+        with self._build_lock:
+            return self._build(question_set, encoder)
+
+    def _build(self, question_set, encoder):
+        # Reuse rows whose answers are unchanged and encode the rest in one batch
+        matrix, old_entries = self.state
+        kept = []
+        stale = []
+        for question, data in question_set.items():
+            if self.is_current(question, data["answers"]):
+                kept.append(question)
+            else:
+                stale.append(question)
+        if not stale and len(kept) == len(old_entries):
+            return False
+
+        blocks = []
+        entries = {}
+        offset = 0
+        for question in kept:
+            entry = old_entries[question]
+            block = matrix[entry["start"]:entry["stop"]]
+            blocks.append(block)
+            entries[question] = {"hash": entry["hash"], "start": offset, "stop": offset + len(block)}
+            offset += len(block)
+
+        texts = [answer for question in stale for answer in question_set[question]["answers"]]
+        if texts:
+            encoded = normalize_rows(encoder.encode(texts, convert_to_numpy=True))
+            blocks.append(encoded)
+            position = 0
+            for question in stale:
+                answers = question_set[question]["answers"]
+                entries[question] = {
+                    "hash": answers_hash(answers),
+                    "start": offset + position,
+                    "stop": offset + position + len(answers)
+                }
+                position += len(answers)
+
+        self.state = (np.ascontiguousarray(np.concatenate(blocks) if blocks else matrix[:0]), entries)
+        try:
+            self.save()
+        except Exception as e:
+            print(f"Error saving reference index: {e}")
+        return True
+
+    def embeddings(self, question):
+        matrix, entries = self.state
+        entry = entries[question]
+        return matrix[entry["start"]:entry["stop"]]
+
+    def similarities(self, question, answer_embedding):
+        return self.embeddings(question) @ normalize_rows(answer_embedding)[0]
+
+    def question_similarities(self, answer_embedding, reduction="max", top_k=3):
+        # Score one answer against every question's references with a single matrix product
+        matrix, entries = self.state
+        questions = sorted(
+            (q for q, entry in entries.items() if entry["stop"] > entry["start"]),
+            key=lambda q: entries[q]["start"]
+        )
+        starts = np.array([entries[q]["start"] for q in questions], dtype=np.intp)
+        stops = np.array([entries[q]["stop"] for q in questions], dtype=np.intp)
+        scores = segment_similarities(matrix, starts, stops, answer_embedding, reduction, top_k)
+        return dict(zip(questions, scores.tolist()))
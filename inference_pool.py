@@ -0,0 +1,77 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class InferencePool:
+    # Fixed set of worker threads behind a bounded queue. Items that arrive within
+    # `batch_window` seconds of each other are handed to `handler` together as one
+    # micro-batch; `handler(items)` must return one result per item, in order.
+    def __init__(self, handler, workers=1, max_queue=64, max_batch=8, batch_window=0.02):
+        self.handler = handler
+        self.max_batch = max_batch
+        self.batch_window = batch_window
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._shutdown = False
+        self._workers = [
+            threading.Thread(target=self._run, name=f"inference-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, item, timeout=None):
+        # Blocks while the queue is full; raises queue.Full after `timeout` seconds
+        if self._shutdown:
+            raise RuntimeError("inference pool is shut down")
+        future = Future()
+        self._queue.put((item, future), timeout=timeout)
+        return future
+
+    def qsize(self):
+        return self._queue.qsize()
+
+    def _next_batch(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is None:
+                # Hand the stop signal back so this worker exits after the batch
+                self._queue.put(None)
+                break
+            batch.append(entry)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            batch = [(item, future) for item, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                results = self.handler([item for item, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+    def shutdown(self, wait=True):
+        self._shutdown = True
+        for _ in self._workers:
+            self._queue.put(None)
+        if wait:
+            for worker in self._workers:
+                worker.join()
@@ -1,23 +1,207 @@
 import random
-from sentence_transformers import SentenceTransformer, util
-from sklearn.feature_extraction.text import CountVectorizer
-from transformers import pipeline
-from keybert import KeyBERT
-import nltk
-import json
 import os
+import threading
 from datetime import datetime
+from functools import cached_property
+from model_registry import ModelRegistry
+from result_cache import ResultCache
+from keyword_index import KeywordIndex
+from question_scheduler import QuestionRatings, QuestionScheduler
+from metrics import metrics
 
-nltk.download('punkt')
-nltk.download('averaged_perceptron_tagger')
+MODEL_NAME = 'paraphrase-MiniLM-L6-v2'
+# How similarities to a question's reference answers become one score: "max", "mean" or "topk"
+SIMILARITY_REDUCTION = 'max'
+SIMILARITY_TOP_K = 2
+# Sentence-level analysis (see use_sentence_analysis()) looks at this many sentences at most
+MAX_SENTENCES = 12
+# Free-form questions below this similarity to every known question stay unresolved
+QUESTION_MATCH_THRESHOLD = 0.7
+# Thresholds of tiered scoring, written by `python lexical_scorer.py --fit --save ...`
+LEXICAL_POLICY_FILE = "lexical_policy.json"
+# Pinned to the transformers defaults so cached results can be tied to a model version
+SENTIMENT_MODEL_NAME = 'distilbert/distilbert-base-uncased-finetuned-sst-2-english'
+NER_MODEL_NAME = 'dbmdz/bert-large-cased-finetuned-conll03-english'
+# Identifies the weights actually serving each model; changes when the backend does
+model_versions = {
+    'model': MODEL_NAME,
+    'sentiment_analyzer': SENTIMENT_MODEL_NAME,
+    'ner_pipeline': NER_MODEL_NAME
+}
+NLTK_RESOURCES = ['tokenizers/punkt_tab']
+
+
+def model_source(name, repo_id):
+    # The local Hugging Face snapshot when there is one, so a model unloaded by the
+    # memory budget comes back from disk instead of the network
+    try:
+        from huggingface_hub import snapshot_download
+        return snapshot_download(repo_id, local_files_only=True)
+    except Exception:
+        if models.load_count(name):
+            print(f"⚠️ {repo_id} is not in the local model cache; reloading it from the Hub")
+        return repo_id
+
+# Heavy libraries are imported inside the loaders so importing this module stays fast
+def load_sentence_model():
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_source('model', 'sentence-transformers/' + MODEL_NAME))
+
+def load_sentiment_analyzer():
+    from transformers import pipeline
+    return pipeline('sentiment-analysis', model=model_source('sentiment_analyzer', SENTIMENT_MODEL_NAME))
+
+def load_ner_pipeline():
+    from transformers import pipeline
+    return pipeline('ner', model=model_source('ner_pipeline', NER_MODEL_NAME), grouped_entities=True)
+
+def load_kw_model():
+    from keybert import KeyBERT
+    encoder = models.get('model')
+    if model_versions['model'] != MODEL_NAME:
+        from onnx_backend import keybert_backend
+        encoder = keybert_backend(encoder)
+    return KeyBERT(encoder)
+
+def load_reference_index():
+    from embedding_index import ReferenceIndex
+    return ReferenceIndex(os.path.join(os.path.dirname(__file__), "reference_embeddings"), model_versions['model'])
+
+
+models = ModelRegistry()
+models.register('model', load_sentence_model)
+models.register('sentiment_analyzer', load_sentiment_analyzer)
+models.register('ner_pipeline', load_ner_pipeline)
+models.register('kw_model', load_kw_model, depends=('model',))
+models.register('reference_index', load_reference_index)
+metrics.register_gauge("models", models.stats)
+
+
+def configure_models(memory_budget_mb=None, idle_timeout=None, pinned=()):
+    # Keep loaded models within a memory budget and/or unload ones left idle for
+    # `idle_timeout` seconds; evicted models load again on their next use
+    models.memory_budget = memory_budget_mb * 2**20 if memory_budget_mb else None
+    models.idle_timeout = idle_timeout or None
+    models.pin(*pinned)
+    models.start_reaper()
+    return models
+
+def configure_models_from_env():
+    # INTERVIEW_AI_MODEL_BUDGET_MB, INTERVIEW_AI_MODEL_IDLE_TIMEOUT (seconds),
+    # INTERVIEW_AI_PINNED_MODELS (comma-separated names), and INTERVIEW_AI_ONNX_DIR
+    # (ONNX exports to serve the encoder and sentiment models from, with
+    # INTERVIEW_AI_ONNX_FP32=1 for the unquantized ones)
+    if os.environ.get("INTERVIEW_AI_ONNX_DIR"):
+        use_onnx_backend(os.environ["INTERVIEW_AI_ONNX_DIR"], quantized=os.environ.get("INTERVIEW_AI_ONNX_FP32") != "1")
+    budget = os.environ.get("INTERVIEW_AI_MODEL_BUDGET_MB")
+    idle_timeout = os.environ.get("INTERVIEW_AI_MODEL_IDLE_TIMEOUT")
+    pinned = [name.strip() for name in os.environ.get("INTERVIEW_AI_PINNED_MODELS", "").split(",") if name.strip()]
+    if budget or idle_timeout or pinned:
+        configure_models(float(budget) if budget else None, float(idle_timeout) if idle_timeout else None, pinned)
+    return models
+
+
+def use_onnx_backend(model_dir="onnx_models", quantized=True, intra_op_threads=None):
+    # Serve the encoder and sentiment models through ONNX Runtime (see onnx_backend.py
+    # for exporting them). Call before scoring starts; loaded models are replaced.
+    from onnx_backend import OnnxEncoder, OnnxSentimentPipeline
+    suffix = "+onnx-int8" if quantized else "+onnx"
+    model_versions['model'] = MODEL_NAME + suffix
+    model_versions['sentiment_analyzer'] = SENTIMENT_MODEL_NAME + suffix
+    models.register('model', lambda: OnnxEncoder(os.path.join(model_dir, "encoder"), quantized, intra_op_threads))
+    models.register('sentiment_analyzer', lambda: OnnxSentimentPipeline(
+        os.path.join(model_dir, "sentiment"), quantized, intra_op_threads
+    ))
+    # Both depend on the encoder, so they are rebuilt against the new one
+    models.register('kw_model', load_kw_model, depends=('model',))
+    models.register('reference_index', load_reference_index)
+
+# Per-text model outputs, so repeated answers skip the models entirely
+result_cache = ResultCache()
+
+
+def configure_cache(maxsize=4096, ttl=None, disk_path=None):
+    global result_cache
+    result_cache = ResultCache(maxsize=maxsize, ttl=ttl, disk_path=disk_path)
+    return result_cache
+
+def cache_stats():
+    return result_cache.stats()
+
+metrics.register_gauge("result_cache", cache_stats)
+
+
+def run_model(stage, texts, compute):
+    # Model calls for cache misses only; timed per stage when metrics are on
+    metrics.increment(f"{stage}.texts", len(texts))
+    with metrics.timer(stage):
+        return compute(texts)
+
+def encode_answers(texts, batch_size=32):
+    return result_cache.get_or_compute_many(
+        f"encoder:{model_versions['model']}",
+        texts,
+        lambda missing: run_model("encoder", missing, lambda batch: list(
+            models.get('model').encode(batch, batch_size=batch_size, convert_to_numpy=True)
+        ))
+    )
+
+def analyze_sentiment(texts, batch_size=32):
+    return result_cache.get_or_compute_many(
+        f"sentiment:{model_versions['sentiment_analyzer']}",
+        texts,
+        lambda missing: run_model("sentiment", missing, lambda batch: models.get('sentiment_analyzer')(
+            batch, batch_size=batch_size
+        ))
+    )
+
+def extract_entities(texts, batch_size=32):
+    return result_cache.get_or_compute_many(
+        f"ner:{model_versions['ner_pipeline']}",
+        texts,
+        lambda missing: run_model("ner", missing, lambda batch: models.get('ner_pipeline')(
+            batch, batch_size=batch_size
+        ))
+    )
+
+def extract_keybert_keywords(texts, top_n=5):
+    return result_cache.get_or_compute_many(
+        f"keybert:{model_versions['model']}:{top_n}",
+        texts,
+        lambda missing: run_model("keybert", missing, lambda batch: [
+            models.get('kw_model').extract_keywords(text, top_n=top_n) for text in batch
+        ])
+    )
+
+def __getattr__(name):
+    # Keep `interview_ai.model` and friends working; they load on first access
+    if name in models:
+        return models.get(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def check_nltk_data():
+    # Look up NLTK data locally instead of downloading it; returns what is missing
+    import nltk
+    missing = []
+    for resource in NLTK_RESOURCES:
+        try:
+            nltk.data.find(resource)
+        except LookupError:
+            missing.append(resource)
+    if missing:
+        print("⚠️ Missing NLTK data: " + ", ".join(missing)
+              + ". Install it with: python -m nltk.downloader punkt_tab")
+    return missing
+
+def warm_up_models():
+    # Start loading every model in the background
+    return models.warm_up()
 
-# Load sentence transformer model
-model = SentenceTransformer('paraphrase-MiniLM-L6-v2')
-# Load sentiment analysis and NER pipelines
-sentiment_analyzer = pipeline('sentiment-analysis')
-ner_pipeline = pipeline('ner', grouped_entities=True)
-# Load KeyBERT for keyword extraction
-kw_model = KeyBERT(model)
+def preload_models():
+    # Load everything up front, e.g. before a worker starts serving requests
+    check_nltk_data()
+    models.preload()
+    models.get('reference_index').build(question_set, models.get('model'))
 
 # Sample questions and expected answers
 question_set = {
@@ -92,7 +276,9 @@ question_set = {
     }
 }
 
-# Keywords for evaluation (expanded version)
+# Keywords for evaluation (expanded version). Matching uses an index compiled from
+# this map; add topics with add_topic_keywords(), or call refresh_keyword_index()
+# after changing it any other way, or matching keeps using the old keywords.
 keyword_map = {
     "strengths": [
         "detail-oriented", "problem solver", "team player", "creative", "hardworking", "analytical",
@@ -118,43 +304,263 @@ keyword_map = {
         "vision", "decision-making", "responsibility", "supportive", "mentor", "collaborate", "strategic", "goal-setting"]
 }
 
+# Compiled matcher over keyword_map, see get_keyword_index() and refresh_keyword_index()
+keyword_index = None
+# Questions currently served: question_set, or a QuestionBank after use_question_bank()
+questions = question_set
+question_bank = None
+question_topics_cache = {}
+# Nearest-question index over the questions currently served, see get_question_index()
+question_index = None
+# Sentences per answer when sentence-level analysis is on, None while it is off
+sentence_limit = None
+# TF-IDF index over the reference answers and its thresholds, see score_batch(tiered=True)
+lexical_index = None
+lexical_policy = None
+# Question helpfulness ratings shared by every session in this process
+question_ratings = QuestionRatings(question_set)
+# Selection state of the interactive CLI session
+cli_scheduler = None
 
-def log_answer(question, answer, rating, log_file="cevaplar_log.json"):
+
+def use_question_bank(directory):
+    # Serve questions from an external memory-mapped bank (see question_bank.py)
+    # instead of the built-in question_set
+    global questions, question_bank, question_ratings, cli_scheduler, question_index, lexical_index
+    from question_bank import QuestionBank
+    question_bank = QuestionBank(directory)
+    for topic in question_bank.topics:
+        if topic not in keyword_map:
+            add_topic_keywords(topic, question_bank.topic_keywords(topic))
+    questions = question_bank
+    question_ratings = QuestionRatings(question_bank)
+    cli_scheduler = None
+    question_index = None
+    lexical_index = None
+    return question_bank
+
+def use_sentence_analysis(max_sentences=MAX_SENTENCES):
+    # Score answers sentence by sentence instead of as one string, so long answers are
+    # not cut off at the encoder's input limit; None switches back
+    global sentence_limit
+    sentence_limit = max_sentences
+    return sentence_limit
+
+def analyze_sentences(answers, references, batch_size=32):
+    # (similarity per reference answer, sentiment, per-sentence details) for answers to
+    # one question. Every sentence of every answer goes to the models in one call, in
+    # order of length so each forward pass pads to similar lengths. The sentence
+    # encoder sorts its inputs itself; the sentiment pipelines batch in the order given.
+    from embedding_index import normalize_rows
+    from sentence_analysis import split_sentences, cap_sentences, aggregate_sentences
+    limit = sentence_limit or MAX_SENTENCES
+    segmented = [cap_sentences(split_sentences(answer), limit) for answer in answers]
+    flat = [sentence for sentences in segmented for sentence in sentences]
+    metrics.increment("sentences", len(flat))
+    similarities = normalize_rows(encode_answers(flat, batch_size=batch_size)) @ references.T
+    by_length = sorted(range(len(flat)), key=lambda i: len(flat[i]))
+    sentiments = [None] * len(flat)
+    for i, sentiment in zip(by_length, analyze_sentiment([flat[i] for i in by_length], batch_size=batch_size)):
+        sentiments[i] = sentiment
+    results = []
+    start = 0
+    for sentences in segmented:
+        stop = start + len(sentences)
+        results.append(aggregate_sentences(sentences, similarities[start:stop], sentiments[start:stop]))
+        start = stop
+    return results
+
+def question_rating(question):
+    return question_ratings.get(question)
+
+def question_topics(question):
+    # Topics a question belongs to, worked out once per question
+    if question_bank is not None and question in question_bank:
+        return question_bank[question]["topics"]
+    if question not in question_topics_cache:
+        question_lower = question.lower()
+        question_topics_cache[question] = [topic for topic in keyword_map if topic in question_lower]
+    return question_topics_cache[question]
+
+@metrics.timed("reference_embeddings")
+def get_reference_embeddings(question):
+    # Reference answer embeddings, encoded once and cached on disk
+    from embedding_index import normalize_rows
+    if question_bank is not None and question in question_bank:
+        if question_bank.embeddings is not None and question_bank.model_version == model_versions['model']:
+            return question_bank.reference_embeddings(question)
+        return normalize_rows(encode_answers(question_bank[question]["answers"]))
+    reference_index = models.get('reference_index')
+    if not reference_index.is_current(question, question_set[question]["answers"]):
+        reference_index.build(question_set, models.get('model'))
+    return reference_index.embeddings(question)
+
+def answer_similarities(question, answer):
+    # Cosine similarity of the answer against each reference answer of the question
+    from embedding_index import normalize_rows
+    references = get_reference_embeddings(question)
+    return references @ normalize_rows(encode_answers([answer])[0])[0]
+
+def question_similarities(answer, reduction=SIMILARITY_REDUCTION, top_k=SIMILARITY_TOP_K):
+    # Score an answer against the references of every question in one pass
+    from embedding_index import segment_similarities
+    answer_embedding = encode_answers([answer])[0]
+    if question_bank is not None and question_bank.embeddings is not None:
+        offsets = question_bank.answer_offsets
+        starts, stops = offsets[:-1], offsets[1:]
+        non_empty = (stops > starts).nonzero()[0]
+        scores = segment_similarities(
+            question_bank.embeddings, starts[non_empty], stops[non_empty], answer_embedding, reduction, top_k
+        )
+        texts = question_bank.question_texts()
+        return {texts[int(i)]: score for i, score in zip(non_empty, scores.tolist())}
+    reference_index = models.get('reference_index')
+    reference_index.build(question_set, models.get('model'))
+    return reference_index.question_similarities(answer_embedding, reduction, top_k)
+
+
+def load_question_embeddings():
+    # Embeddings of the question texts themselves, for matching free-form questions
+    import numpy as np
+    from embedding_index import ReferenceIndex
+    if question_bank is not None:
+        if question_bank.question_embeddings is not None and question_bank.model_version == model_versions['model']:
+            return question_bank.question_texts(), question_bank.question_embeddings
+        texts = question_bank.question_texts()
+        embeddings = []
+        for start in range(0, len(texts), 256):
+            embeddings.append(encode_answers([texts[i] for i in range(start, min(start + 256, len(texts)))]))
+        return texts, np.concatenate(embeddings)
+    texts = list(question_set)
+    index = ReferenceIndex(os.path.join(os.path.dirname(__file__), "question_embeddings"), model_versions['model'])
+    index.build({question: {"answers": [question]} for question in texts}, models.get('model'))
+    return texts, np.stack([index.embeddings(question)[0] for question in texts])
+
+def get_question_index():
+    global question_index
+    if question_index is None:
+        from question_index import NearestQuestionIndex
+        texts, embeddings = load_question_embeddings()
+        question_index = (texts, NearestQuestionIndex(embeddings))
+    return question_index
+
+@metrics.timed("resolve_questions")
+def resolve_questions(texts, min_confidence=QUESTION_MATCH_THRESHOLD):
+    # Map question texts to the closest known question: [(question or None, confidence)]
+    results = [None] * len(texts)
+    unknown = {}
+    for i, text in enumerate(texts):
+        if text in questions:
+            results[i] = (text, 1.0)
+        else:
+            unknown.setdefault(text, []).append(i)
+    if unknown:
+        known_texts, index = get_question_index()
+        unique = list(unknown)
+        for text, embedding in zip(unique, encode_answers(unique)):
+            matches = index.search(embedding, k=1)
+            question, confidence = None, 0.0
+            if matches:
+                position, confidence = matches[0]
+                if confidence >= min_confidence:
+                    question = known_texts[position]
+            for i in unknown[text]:
+                results[i] = (question, confidence)
+    return results
+
+def resolve_question(text, min_confidence=QUESTION_MATCH_THRESHOLD):
+    return resolve_questions([text], min_confidence)[0]
+
+
+LOG_FILE = "cevaplar_log.jsonl"
+LEGACY_LOG_FILE = "cevaplar_log.json"
+answer_logs = {}
+answer_logs_lock = threading.Lock()
+# Scored answers for per-question reports, see get_analytics_store()
+ANALYTICS_DIR = "analytics"
+analytics_store = None
+
+
+def get_answer_log(log_file=LOG_FILE):
+    from answer_log import AnswerLog, migrate_json_array
     log_path = os.path.join(os.path.dirname(__file__), log_file)
-    # Load existing log or start new
-    if os.path.exists(log_path):
-        with open(log_path, "r", encoding="utf-8") as f:
-            try:
-                data = json.load(f)
-            except Exception:
-                data = []
-    else:
-        data = []
-    # Append new entry
-    data.append({
+    with answer_logs_lock:
+        if log_path not in answer_logs:
+            if log_file == LOG_FILE:
+                legacy_path = os.path.join(os.path.dirname(__file__), LEGACY_LOG_FILE)
+                try:
+                    migrate_json_array(legacy_path, log_path)
+                except (OSError, ValueError) as e:
+                    # Set the unreadable old log aside so it is not retried on every answer
+                    print(f"⚠️ Could not migrate {LEGACY_LOG_FILE} ({e}); moved it to {LEGACY_LOG_FILE}.corrupt")
+                    try:
+                        os.replace(legacy_path, legacy_path + ".corrupt")
+                    except OSError:
+                        pass
+            answer_logs[log_path] = AnswerLog(log_path)
+        return answer_logs[log_path]
+
+@metrics.timed("log_answer")
+def log_answer(question, answer, rating, log_file=LOG_FILE):
+    get_answer_log(log_file).append({
         "soru": question,
         "cevap": answer,
         "rating": rating,
         "timestamp": str(datetime.now())
     })
-    # Save back
-    with open(log_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-
-def get_next_question():
-    # Sort questions by rating and times asked
-    available_questions = [(q, data) for q, data in question_set.items() if data["times_asked"] < 10]
-    if not available_questions:
+
+def get_analytics_store():
+    global analytics_store
+    with answer_logs_lock:
+        if analytics_store is None:
+            from analytics_store import AnalyticsStore, StoreLocked
+            directory = os.path.join(os.path.dirname(__file__), ANALYTICS_DIR)
+            try:
+                analytics_store = AnalyticsStore(directory)
+            except StoreLocked as e:
+                # Another process records the scores; this one can still report on them
+                print(f"⚠️ {e}; scores from this process will not be recorded")
+                analytics_store = AnalyticsStore(directory, read_only=True)
+        return analytics_store
+
+@metrics.timed("log_score")
+def log_score(analysis, rating=None, timestamp=None, store=None):
+    # Add a scored answer to the columnar analytics store, see analytics_store.py
+    from analytics_store import COMPONENTS
+    if store is None:
+        store = get_analytics_store()
+        if store.read_only:
+            return
+    store.append(
+        analysis.question,
+        analysis.total_score,
+        analysis.semantic_score,
+        {name: getattr(analysis, name) for name in COMPONENTS},
+        rating=rating,
+        timestamp=timestamp
+    )
+
+def iter_logged_answers(log_file=LOG_FILE):
+    # Stream logged records; old JSON array logs are read as well
+    from answer_log import iter_records
+    log_path = os.path.join(os.path.dirname(__file__), log_file)
+    if log_file == LOG_FILE or log_path in answer_logs:
+        return iter(get_answer_log(log_file))
+    return iter_records(log_path)
+
+def new_scheduler():
+    # Question selection state for one interview session
+    return QuestionScheduler(question_ratings)
+
+def get_next_question(scheduler=None):
+    global cli_scheduler
+    if scheduler is None:
+        if cli_scheduler is None:
+            cli_scheduler = new_scheduler()
+        scheduler = cli_scheduler
+    selected_question = scheduler.next_question()
+    if selected_question is None:
         print("\n🎉 Congratulations! You've completed all questions!")
-        return None
-    
-    # Sort by rating (descending) and times_asked (ascending)
-    available_questions.sort(key=lambda x: (-x[1]["rating"], x[1]["times_asked"]))
-    
-    # Select from top 3 questions randomly to add some variety
-    top_questions = available_questions[:min(3, len(available_questions))]
-    selected_question = random.choice(top_questions)[0]
-    question_set[selected_question]["times_asked"] += 1
     return selected_question
 
 def ask_question():
@@ -164,112 +570,536 @@ def ask_question():
     
     print("\n📝 Interviewer: " + question)
     user_answer = input("Your answer: ")
-    log_answer(question, user_answer, question_set[question]["rating"])
-    score_answer(question, user_answer)
+    log_answer(question, user_answer, question_rating(question))
+    feedback = score_answer(question, user_answer)
+    log_score(feedback.analysis, question_rating(question))
+    print(render_feedback_cli(feedback))
     
     # Ask for question rating
     while True:
         rating = input("\nDid you find this question helpful? (yes/no): ").lower().strip()
         if rating in ['yes', 'no']:
-            question_set[question]["rating"] += 1 if rating == 'yes' else -1
+            cli_scheduler.rate(question, rating == 'yes')
             break
         print("Please answer with 'yes' or 'no'")
     
     return True
 
-def score_answer(question, answer):
-    expected_answers = question_set[question]["answers"]
-    embeddings1 = model.encode(expected_answers, convert_to_tensor=True)
-    embeddings2 = model.encode(answer, convert_to_tensor=True)
-    similarity = util.pytorch_cos_sim(embeddings1, embeddings2)
-    score = float(similarity[0][0]) * 100
-    
-    # Sentiment analysis
-    sentiment = sentiment_analyzer(answer)[0]
-    sentiment_score = sentiment['score']
-    sentiment_label = sentiment['label']
-    
-    print("\n🎯 AI Feedback:")
+class AnswerAnalysis:
+    # Every feature is computed lazily and at most once per answer, so the rating and
+    # the text feedback share the same model outputs and unused models never run.
+    def __init__(self, question, answer):
+        self.question = question
+        self.answer = answer
+
+    def prime(self, **features):
+        # Fill in features that were already computed elsewhere, e.g. in a batch
+        self.__dict__.update(features)
+        return self
+
+    @cached_property
+    def expected_answers(self):
+        return questions[self.question]["answers"]
+
+    @cached_property
+    def sentence_scores(self):
+        return analyze_sentences([self.answer], get_reference_embeddings(self.question))[0]
+
+    @cached_property
+    def similarities(self):
+        if sentence_limit:
+            return self.sentence_scores[0]
+        return answer_similarities(self.question, self.answer)
+
+    @cached_property
+    def semantic_score(self):
+        from embedding_index import reduce_similarities
+        return float(reduce_similarities(self.similarities, SIMILARITY_REDUCTION, SIMILARITY_TOP_K)) * 100
+
+    @cached_property
+    def best_reference_index(self):
+        return int(self.similarities.argmax())
+
+    @cached_property
+    def best_reference(self):
+        # The reference answer this answer is closest to
+        return self.expected_answers[self.best_reference_index]
+
+    @cached_property
+    def sentiment(self):
+        if sentence_limit:
+            return self.sentence_scores[1]
+        return analyze_sentiment([self.answer])[0]
+
+    @cached_property
+    def sentence_details(self):
+        # [{"text", "similarity", "sentiment"}] per sentence, with sentence-level analysis on
+        return self.sentence_scores[2] if sentence_limit else None
+
+    @property
+    def sentiment_label(self):
+        return self.sentiment['label']
+
+    @property
+    def sentiment_score(self):
+        return self.sentiment['score']
+
+    @cached_property
+    def entities(self):
+        return extract_entities([self.answer])[0]
+
+    @cached_property
+    def keybert_keywords(self):
+        return extract_keybert_keywords([self.answer])[0]
+
+    @cached_property
+    def word_count(self):
+        return len(self.answer.split())
+
+    @cached_property
+    def keyword_matches(self):
+        with metrics.timer("keywords"):
+            return get_keyword_index().matches_by_topic(self.answer)
+
+    @cached_property
+    def matched_keywords(self):
+        return [kw for keywords in self.keyword_matches.values() for kw in keywords]
+
+    @cached_property
+    def relevant_topics(self):
+        return question_topics(self.question)
+
+    @cached_property
+    def relevant_keywords(self):
+        return [kw for topic in self.relevant_topics for kw in keyword_map.get(topic, [])]
+
+    @cached_property
+    def relevant_matched_keywords(self):
+        return [kw for topic in self.relevant_topics for kw in self.keyword_matches.get(topic, [])]
+
+    # The rubric, one part per feature; total_score is their sum out of 100
+
+    @cached_property
+    def semantic_points(self):
+        semantic_score = self.semantic_score
+        if semantic_score >= 80:
+            return 40
+        elif semantic_score >= 60:
+            return 30
+        elif semantic_score >= 40:
+            return 20
+        return 10
+
+    @cached_property
+    def sentiment_points(self):
+        if self.sentiment_label == 'POSITIVE':
+            if self.sentiment_score >= 0.9:
+                return 20
+            elif self.sentiment_score >= 0.7:
+                return 15
+            return 10
+        return 5
+
+    @cached_property
+    def keyword_points(self):
+        keyword_count = len(self.relevant_matched_keywords)
+        if keyword_count >= 3:
+            return 20
+        elif keyword_count == 2:
+            return 15
+        elif keyword_count == 1:
+            return 10
+        return 5
+
+    @cached_property
+    def length_points(self):
+        word_count = self.word_count
+        if word_count >= 50:
+            return 20
+        elif word_count >= 30:
+            return 15
+        elif word_count >= 10:
+            return 10
+        return 5
+
+    @cached_property
+    def total_score(self):
+        return self.semantic_points + self.sentiment_points + self.keyword_points + self.length_points
+
+    def to_dict(self):
+        return {
+            "question": self.question,
+            "answer": self.answer,
+            "total_score": self.total_score,
+            "semantic_score": round(self.semantic_score, 2),
+            "best_reference": self.best_reference_index,
+            "sentiment_label": self.sentiment_label,
+            "sentiment_score": round(self.sentiment_score, 4),
+            "word_count": self.word_count,
+            "matched_keywords": self.relevant_matched_keywords,
+            **({"entities": [
+                {"entity_group": e["entity_group"], "word": e["word"], "score": round(float(e["score"]), 4)}
+                for e in self.entities
+            ]} if "entities" in self.__dict__ else {}),
+            **({
+                "asked_question": self.asked_question,
+                "match_confidence": round(self.match_confidence, 4)
+            } if "asked_question" in self.__dict__ else {}),
+            **({
+                "tier": self.scoring_tier,
+                "escalation": self.escalation
+            } if "scoring_tier" in self.__dict__ else {}),
+            **({"sentences": [
+                {"text": d["text"], "similarity": round(d["similarity"], 4), "sentiment": d["sentiment"]}
+                for d in self.sentence_details
+            ]} if self.__dict__.get("sentence_details") else {})
+        }
+
+def get_lexical_index():
+    # Fitted over every reference answer, so a large question bank takes a while once
+    global lexical_index
+    if lexical_index is None:
+        from lexical_scorer import LexicalIndex
+        lexical_index = LexicalIndex(questions)
+    return lexical_index
+
+def get_lexical_policy():
+    global lexical_policy
+    if lexical_policy is None:
+        from lexical_scorer import TierPolicy
+        path = os.path.join(os.path.dirname(__file__), LEXICAL_POLICY_FILE)
+        lexical_policy = TierPolicy.load(path) if os.path.exists(path) else TierPolicy()
+    return lexical_policy
+
+def configure_tiers(policy_path=None, **thresholds):
+    # Tier policy from a JSON file and/or individual values, e.g. margin=5.0
+    global lexical_policy
+    from lexical_scorer import TierPolicy
+    lexical_policy = TierPolicy.load(policy_path) if policy_path else get_lexical_policy()
+    for name, value in thresholds.items():
+        if value is not None:
+            setattr(lexical_policy, name, value)
+    return lexical_policy
+
+@metrics.timed("lexical")
+def lexical_scores(pairs):
+    # (score, coverage, similarities) per (question, answer) pair of a known question
+    global lexical_index
+    from embedding_index import reduce_similarities
+    index = get_lexical_index()
+    if not all(index.covers(question) for question, _ in pairs):
+        # question_set gained questions since the index was fitted
+        lexical_index = None
+        index = get_lexical_index()
+    results = [None] * len(pairs)
+    by_question = {}
+    for i, (question, answer) in enumerate(pairs):
+        by_question.setdefault(question, []).append(i)
+    for question, indices in by_question.items():
+        similarities, coverage = index.score(question, [pairs[i][1] for i in indices])
+        scores = reduce_similarities(similarities, SIMILARITY_REDUCTION, SIMILARITY_TOP_K)
+        for j, i in enumerate(indices):
+            results[i] = (float(scores[j]), float(coverage[j]), similarities[j])
+    return results
+
+def group_by_question(pairs, resolve_unknown, min_confidence):
+    # ({question: [pair index]}, {pair index: (question, confidence)} for resolved ones)
+    by_question = {}
+    resolved = {}
+    if resolve_unknown:
+        texts = [question for question, answer in pairs]
+        resolved = {
+            i: match for i, match in enumerate(resolve_questions(texts, min_confidence))
+            if match[0] is not None and match[0] != texts[i]
+        }
+    for i, (question, answer) in enumerate(pairs):
+        if i in resolved:
+            by_question.setdefault(resolved[i][0], []).append(i)
+        elif question in questions:
+            by_question.setdefault(question, []).append(i)
+    return by_question, resolved
+
+@metrics.timed("score_batch")
+def score_batch(pairs, batch_size=32, include_entities=True, resolve_unknown=False,
+                min_confidence=QUESTION_MATCH_THRESHOLD, tiered=False, policy=None):
+    # Score (question, answer) pairs with the models run in mini-batches per question.
+    # Returns one AnswerAnalysis per pair in input order, or None for unknown questions.
+    # With resolve_unknown, questions not in the bank are first mapped to the closest
+    # known question and scored against that one. With tiered, see score_tiered().
+    from embedding_index import normalize_rows
+    results = [None] * len(pairs)
+    by_question, resolved = group_by_question(pairs, resolve_unknown, min_confidence)
+    if tiered:
+        score_tiered(pairs, by_question, results, policy or get_lexical_policy(), batch_size, include_entities)
+    else:
+        for question, indices in by_question.items():
+            references = get_reference_embeddings(question)
+            for start in range(0, len(indices), batch_size):
+                batch = indices[start:start + batch_size]
+                answers = [pairs[i][1] for i in batch]
+                if sentence_limit:
+                    scores = analyze_sentences(answers, references, batch_size=batch_size)
+                else:
+                    embeddings = encode_answers(answers, batch_size=batch_size)
+                    similarities = normalize_rows(embeddings) @ references.T
+                    sentiments = analyze_sentiment(answers, batch_size=batch_size)
+                entities = extract_entities(answers, batch_size=batch_size) if include_entities else None
+                for j, i in enumerate(batch):
+                    analysis = AnswerAnalysis(question, answers[j])
+                    if sentence_limit:
+                        analysis.prime(similarities=scores[j][0], sentiment=scores[j][1], sentence_details=scores[j][2])
+                    else:
+                        analysis.prime(similarities=similarities[j], sentiment=sentiments[j])
+                    if entities is not None:
+                        analysis.prime(entities=entities[j])
+                    results[i] = analysis
+    for i, (question, confidence) in resolved.items():
+        results[i].prime(asked_question=pairs[i][0], match_confidence=confidence)
+    return results
+
+def score_tiered(pairs, by_question, results, policy, batch_size, include_entities):
+    # Tier 0 scores every answer lexically: TF-IDF similarity to the reference answers
+    # mapped onto the semantic scale, a fixed positive sentiment, and the usual keyword
+    # and length features. Only answers the policy finds ambiguous (near a rubric
+    # boundary, low vocabulary overlap, short, or with negative wording) go on to the
+    # models, as tier 1; tier 0 answers get no entities. Fills `results` in place.
+    from keyword_index import tokenize
+    grouped = [(question, i) for question, indices in by_question.items() for i in indices]
+    lexical = lexical_scores([(question, pairs[i][1]) for question, i in grouped])
+    estimates = policy.estimate([score for score, _, _ in lexical])
+    escalated = []
+    for (question, i), (_, coverage, similarities), estimate in zip(grouped, lexical, estimates):
+        analysis = AnswerAnalysis(question, pairs[i][1])
+        reason = policy.escalation(estimate, coverage, set(tokenize(analysis.answer)))
+        if reason is None:
+            analysis.prime(
+                similarities=similarities,
+                semantic_score=float(estimate),
+                sentiment={"label": "POSITIVE", "score": policy.positive_score},
+                scoring_tier=0,
+                escalation=None
+            )
+            results[i] = analysis
+        else:
+            escalated.append((question, i, reason))
+    metrics.increment("tiered.lexical", len(grouped) - len(escalated))
+    metrics.increment("tiered.escalated", len(escalated))
+    if escalated:
+        full = score_batch(
+            [(question, pairs[i][1]) for question, i, _ in escalated],
+            batch_size=batch_size,
+            include_entities=include_entities
+        )
+        for (_, i, reason), analysis in zip(escalated, full):
+            results[i] = analysis.prime(scoring_tier=1, escalation=reason)
+
+FEEDBACK_STAGES = ("quick", "models", "insights")
+
+
+def feedback_stages(pairs, include_insights=True, batch_size=32):
+    # Score a batch progressively, cheapest features first, so callers can show
+    # partial feedback while the models are still running. Yields
+    # (stage, analyses, feedbacks) once per stage, always for the same analyses:
+    #   quick     word count and keyword hits, no models involved
+    #   models    semantic similarity and sentiment; feedbacks are now complete
+    #   insights  named entities and KeyBERT key phrases
+    # Unknown questions get None in both lists.
+    analyses = [AnswerAnalysis(question, answer) if question in questions else None for question, answer in pairs]
+    for analysis in analyses:
+        if analysis is not None:
+            analysis.word_count
+            analysis.relevant_matched_keywords
+    yield "quick", analyses, [None] * len(pairs)
+
+    for analysis, scored in zip(analyses, score_batch(pairs, batch_size=batch_size, include_entities=False)):
+        if analysis is not None:
+            analysis.prime(
+                similarities=scored.similarities,
+                sentiment=scored.sentiment,
+                sentence_details=scored.sentence_details
+            )
+    feedbacks = [
+        score_answer(question, answer, analysis) if analysis is not None else None
+        for (question, answer), analysis in zip(pairs, analyses)
+    ]
+    yield "models", analyses, feedbacks
+
+    if include_insights:
+        known = [analysis for analysis in analyses if analysis is not None]
+        answers = [analysis.answer for analysis in known]
+        if answers:
+            entities = extract_entities(answers, batch_size=batch_size)
+            keyphrases = extract_keybert_keywords(answers)
+            for analysis, answer_entities, answer_keyphrases in zip(known, entities, keyphrases):
+                analysis.prime(entities=answer_entities, keybert_keywords=answer_keyphrases)
+        yield "insights", analyses, feedbacks
+
+class Feedback:
+    # Everything the user is told about one answer, with no printing or global state,
+    # so feedback for several answers can be built concurrently and rendered anywhere
+    def __init__(self, analysis, score_message, sentiment_message, length_message,
+                 suggested_keywords, needs_positivity, show_example, example_answer):
+        self.analysis = analysis
+        self.total_score = analysis.total_score
+        self.score_message = score_message
+        self.sentiment_message = sentiment_message
+        self.length_message = length_message
+        self.suggested_keywords = suggested_keywords
+        self.needs_positivity = needs_positivity
+        self.show_example = show_example
+        self.example_answer = example_answer
+
+    def to_dict(self):
+        return {
+            "total_score": self.total_score,
+            "score_message": self.score_message,
+            "sentiment_message": self.sentiment_message,
+            "length_message": self.length_message,
+            "suggested_keywords": self.suggested_keywords,
+            "needs_positivity": self.needs_positivity,
+            "example_answer": self.example_answer if self.show_example else None,
+            "analysis": self.analysis.to_dict()
+        }
+
+@metrics.timed("score_answer")
+def score_answer(question, answer, analysis=None):
+    if analysis is None:
+        analysis = AnswerAnalysis(question, answer)
+    expected_answers = analysis.expected_answers
+    score = analysis.semantic_score
+    sentiment_score = analysis.sentiment_score
+    sentiment_label = analysis.sentiment_label
+
     if score >= 80:
-        print("🌟 Outstanding! Your answer is perfectly aligned with what interviewers look for!")
+        score_message = "🌟 Outstanding! Your answer is perfectly aligned with what interviewers look for!"
     elif score >= 60:
-        print("✨ Great job! You're definitely on the right track!")
+        score_message = "✨ Great job! You're definitely on the right track!"
     elif score >= 40:
-        print("💫 Good effort! Let's add a bit more detail to make it even better!")
+        score_message = "💫 Good effort! Let's add a bit more detail to make it even better!"
     else:
-        print("💡 Keep going! Here are some tips to improve your answer:")
+        score_message = "💡 Keep going! Here are some tips to improve your answer:"
 
-    print(f"\n😊 Sentiment Analysis:")
     if sentiment_label == 'POSITIVE':
         if sentiment_score > 0.9:
-            print("🎉 Amazing enthusiasm! Your positivity really shines through!")
+            sentiment_message = "🎉 Amazing enthusiasm! Your positivity really shines through!"
         elif sentiment_score > 0.7:
-            print("😃 Great confidence! Your positive attitude is clear!")
+            sentiment_message = "😃 Great confidence! Your positive attitude is clear!"
         else:
-            print("🙂 Good tone! A bit more enthusiasm would make it even better!")
+            sentiment_message = "🙂 Good tone! A bit more enthusiasm would make it even better!"
     else:
         if sentiment_score > 0.7:
-            print("🤔 Let's add more positivity to your response!")
+            sentiment_message = "🤔 Let's add more positivity to your response!"
         else:
-            print("😊 Try to be more optimistic in your answer!")
+            sentiment_message = "😊 Try to be more optimistic in your answer!"
 
-    # Named Entity Recognition (hidden from user)
-    entities = ner_pipeline(answer)
-    # KeyBERT keyword extraction (hidden from user)
-    keybert_keywords = kw_model.extract_keywords(answer, top_n=5)
     # Keyword checking (hidden from user)
-    matched_keywords = check_keywords(answer)
-
+    matched_keywords = analysis.matched_keywords
     # Get relevant keywords for the question type
-    relevant_keywords = []
-    for topic, keywords in keyword_map.items():
-        if any(topic in q.lower() for q in [question]):
-            relevant_keywords.extend(keywords)
+    relevant_keywords = analysis.relevant_keywords
 
     # Answer length feedback
-    word_count = len(answer.split())
-    print("\n💫 Suggestions:")
+    word_count = analysis.word_count
     if word_count < 10:
-        print("📝 Your answer is quite brief. Let's add more details to make it shine!")
+        length_message = "📝 Your answer is quite brief. Let's add more details to make it shine!"
     elif word_count < 30:
-        print("📚 Perfect length! You've provided a concise yet informative answer!")
+        length_message = "📚 Perfect length! You've provided a concise yet informative answer!"
     elif word_count < 50:
-        print("📖 Excellent detail! Your answer is comprehensive and well-structured!")
+        length_message = "📖 Excellent detail! Your answer is comprehensive and well-structured!"
     else:
-        print("📋 Your answer is quite detailed. Make sure all points are relevant!")
+        length_message = "📋 Your answer is quite detailed. Make sure all points are relevant!"
 
+    suggested_keywords = []
     if not matched_keywords and relevant_keywords:
-        print("🔑 Try to incorporate these powerful keywords in your answer:")
         # Show up to 5 example keywords
-        example_keywords = random.sample(relevant_keywords, min(5, len(relevant_keywords)))
-        for kw in example_keywords:
-            print(f"  ✨ {kw}")
-    
-    if sentiment_label != 'POSITIVE' or sentiment_score < 0.7:
-        print("😊 Add more positivity and confidence to your response!")
-    
-    if score < 60:
-        print("🎯 Here's an example of how to structure your answer:")
-        # Show an example answer structure
-        if expected_answers:
-            example = random.choice(expected_answers)
+        suggested_keywords = random.sample(relevant_keywords, min(5, len(relevant_keywords)))
+
+    example_answer = None
+    if score < 60 and expected_answers:
+        # Show the example answer closest to what the candidate was going for
+        example_answer = analysis.best_reference
+
+    return Feedback(
+        analysis,
+        score_message,
+        sentiment_message,
+        length_message,
+        suggested_keywords,
+        needs_positivity=sentiment_label != 'POSITIVE' or sentiment_score < 0.7,
+        show_example=score < 60,
+        example_answer=example_answer
+    )
+
+def render_feedback_cli(feedback):
+    lines = ["", "🎯 AI Feedback:", feedback.score_message]
+    lines += ["", "😊 Sentiment Analysis:", feedback.sentiment_message]
+    lines += ["", "💫 Suggestions:", feedback.length_message]
+    if feedback.suggested_keywords:
+        lines.append("🔑 Try to incorporate these powerful keywords in your answer:")
+        lines += [f"  ✨ {kw}" for kw in feedback.suggested_keywords]
+    if feedback.needs_positivity:
+        lines.append("😊 Add more positivity and confidence to your response!")
+    if feedback.show_example:
+        lines.append("🎯 Here's an example of how to structure your answer:")
+        if feedback.example_answer:
             # Show first 100 characters of example
-            print(f"  💡 \"{example[:100]}...\"")
+            lines.append(f"  💡 \"{feedback.example_answer[:100]}...\"")
+    return "\n".join(lines)
+
+def render_feedback_gui(feedback):
+    total_score = feedback.total_score
+    rating_text = f"Overall Rating: {total_score}/100 ({round(total_score/10, 1)}/10)"
+    return rating_text + "\n" + render_feedback_cli(feedback) + "\n"
+
+def render_feedback_stage(stage, analysis, feedback, final_stage="insights"):
+    # GUI text for one step of feedback_stages(); each step replaces the previous one
+    if stage == "quick":
+        lines = ["⏳ Analyzing your answer...", "", f"📝 {analysis.word_count} words"]
+        if analysis.relevant_matched_keywords:
+            lines.append("🔑 Keywords spotted: " + ", ".join(analysis.relevant_matched_keywords))
+        else:
+            lines.append("🔑 No topic keywords spotted yet")
+        return "\n".join(lines)
+    text = render_feedback_gui(feedback)
+    if stage == "insights":
+        insights = []
+        if analysis.keybert_keywords:
+            insights.append("🧩 Key phrases: " + ", ".join(kw for kw, _ in analysis.keybert_keywords))
+        if analysis.entities:
+            insights.append("📌 You mentioned: " + ", ".join(dict.fromkeys(e["word"] for e in analysis.entities)))
+        if insights:
+            text += "\n🔍 Insights:\n" + "\n".join(insights) + "\n"
+    elif stage != final_stage:
+        text += "\n⏳ Looking for more insights..."
+    return text
+
+def get_keyword_index():
+    # Compiled on first use; call refresh_keyword_index() after changing keyword_map
+    global keyword_index
+    if keyword_index is None:
+        keyword_index = KeywordIndex(keyword_map)
+    return keyword_index
+
+def refresh_keyword_index():
+    global keyword_index
+    keyword_index = None
+
+def add_topic_keywords(topic, keywords):
+    # Add to (or replace) a topic's keywords and drop the compiled index
+    keyword_map[topic] = list(keywords)
+    question_topics_cache.clear()
+    refresh_keyword_index()
 
+@metrics.timed("keywords")
 def check_keywords(answer):
-    matched = []
-    answer_lower = answer.lower()
-    for topic, keywords in keyword_map.items():
-        for kw in keywords:
-            if kw in answer_lower:
-                matched.append(kw)
-    return matched
+    matches = get_keyword_index().matches_by_topic(answer)
+    return [kw for keywords in matches.values() for kw in keywords]
 
 def run_interview():
     print("👋 Welcome to AI-Powered Mock Interview Assistant!")
     print("Press Ctrl+C to exit at any time.")
     print("\nEach question will be asked up to 10 times.")
     print("Your feedback helps improve the question selection!")
+    warm_up_models()
     
     try:
         while ask_question():
@@ -0,0 +1,52 @@
+import re
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class KeywordIndex:
+    # Every keyword of every topic compiled once into a table keyed by its first word.
+    # Matching walks the answer's words once and only compares the phrases that can
+    # start at each word, so whole words match ("focus" no longer hits "unfocused")
+    # and the cost grows with the answer, not with the number of keywords.
+    def __init__(self, keyword_map):
+        self.topics = {topic: list(keywords) for topic, keywords in keyword_map.items()}
+        # keyword -> (topic order, position in the topic, topic) for every topic listing it
+        self.keyword_topics = {}
+        self.phrases = {}
+        for order, (topic, keywords) in enumerate(keyword_map.items()):
+            for position, keyword in enumerate(keywords):
+                if keyword in self.keyword_topics:
+                    self.keyword_topics[keyword].append((order, position, topic))
+                    continue
+                self.keyword_topics[keyword] = [(order, position, topic)]
+                tokens = tuple(tokenize(keyword))
+                if tokens:
+                    self.phrases.setdefault(tokens[0], []).append((tokens, keyword))
+        for candidates in self.phrases.values():
+            candidates.sort(key=lambda candidate: -len(candidate[0]))
+
+    def match(self, text):
+        # Set of keywords that occur in the text as whole words
+        tokens = tokenize(text)
+        found = set()
+        for i, token in enumerate(tokens):
+            for phrase, keyword in self.phrases.get(token, ()):
+                if keyword not in found and tuple(tokens[i:i + len(phrase)]) == phrase:
+                    found.add(keyword)
+        return found
+
+    def matches_by_topic(self, text, topics=None):
+        # Matched keywords per topic, in keyword_map order; only topics with a match
+        # are listed, and the work is over the matches rather than every topic's keywords
+        hits = sorted(
+            entry for keyword in self.match(text) for entry in self.keyword_topics[keyword]
+            if topics is None or entry[2] in topics
+        )
+        matches = {}
+        for _, position, topic in hits:
+            matches.setdefault(topic, []).append(self.topics[topic][position])
+        return matches
@@ -0,0 +1,286 @@
+import argparse
+import json
+import math
+import sys
+import time
+from collections import Counter
+
+import numpy as np
+
+from embedding_index import normalize_rows
+from keyword_index import tokenize
+
+# The rubric thresholds on the semantic score, see AnswerAnalysis.total_score
+SEMANTIC_BOUNDARIES = (40, 60, 80)
+# Words that tend to flip the sentiment model; answers containing them are escalated
+NEGATIVE_WORDS = frozenset({
+    "not", "no", "never", "nothing", "cannot", "don", "didn", "doesn", "isn", "wasn", "won", "wouldn",
+    "hate", "dislike", "bad", "worst", "boring", "bored", "fail", "failed", "failure", "mistake",
+    "mistakes", "weak", "weakness", "weaknesses", "struggle", "struggled", "difficult", "hard",
+    "problem", "problems", "stress", "stressed", "angry", "upset", "unfortunately", "impatient",
+    "shy", "insecure", "procrastinate", "disorganized", "worried", "afraid", "fired", "quit"
+})
+# Function words left out of coverage: they occur in every reference answer and say
+# nothing about whether an answer is on topic
+STOP_WORDS = frozenset({
+    "a", "about", "after", "all", "also", "am", "an", "and", "any", "are", "as", "at", "be", "been",
+    "being", "but", "by", "can", "could", "did", "do", "does", "doing", "for", "from", "had", "has",
+    "have", "having", "he", "her", "him", "his", "how", "i", "if", "in", "into", "is", "it", "its",
+    "just", "m", "me", "more", "most", "my", "myself", "of", "on", "or", "other", "our", "ours", "out",
+    "over", "re", "s", "she", "so", "some", "such", "t", "than", "that", "the", "their", "them", "then",
+    "there", "these", "they", "this", "those", "to", "too", "up", "us", "ve", "very", "was", "we",
+    "were", "what", "when", "where", "which", "while", "who", "why", "will", "with", "would", "you",
+    "your", "ll", "d"
+})
+
+
+class LexicalIndex:
+    # TF-IDF vectors of the reference answers (sublinear tf, smoothed idf over all of
+    # them), one small dense matrix per question over just the words its references
+    # use. Scoring an answer is one pass over its words plus a tiny matrix product, a
+    # few microseconds, with no models or vectorizer objects involved.
+    def __init__(self, questions):
+        counts = {}
+        document_frequency = Counter()
+        for question in questions:
+            counts[question] = [Counter(tokenize(answer)) for answer in questions[question]["answers"]]
+            for answer_counts in counts[question]:
+                document_frequency.update(answer_counts.keys())
+        documents = sum(len(answer_counts) for answer_counts in counts.values())
+        self.idf = {
+            term: math.log((1 + documents) / (1 + frequency)) + 1 for term, frequency in document_frequency.items()
+        }
+        self.references = {}
+        for question, question_counts in counts.items():
+            columns = {term: i for i, term in enumerate(sorted(set().union(*question_counts)))}
+            matrix = np.zeros((len(question_counts), len(columns)), dtype=np.float32)
+            for row, answer_counts in enumerate(question_counts):
+                for term, frequency in answer_counts.items():
+                    matrix[row, columns[term]] = (1 + math.log(frequency)) * self.idf[term]
+            self.references[question] = (columns, normalize_rows(matrix))
+
+    def covers(self, question):
+        return question in self.references
+
+    def score(self, question, answers):
+        # (similarities, coverage): TF-IDF cosine of each answer against each reference
+        # answer, and the share of each answer's distinct non-stop words that this
+        # question's references use
+        columns, matrix = self.references[question]
+        vectors = np.zeros((len(answers), len(columns)), dtype=np.float32)
+        coverage = np.zeros(len(answers))
+        for row, answer in enumerate(answers):
+            answer_counts = Counter(tokenize(answer))
+            norm = 0.0
+            content = 0
+            covered = 0
+            for term, frequency in answer_counts.items():
+                column = columns.get(term)
+                if term not in STOP_WORDS:
+                    content += 1
+                    covered += column is not None
+                idf = self.idf.get(term)
+                if idf is None:
+                    continue
+                weight = (1 + math.log(frequency)) * idf
+                norm += weight * weight
+                if column is not None:
+                    vectors[row, column] = weight
+            if norm:
+                vectors[row] /= math.sqrt(norm)
+            coverage[row] = covered / content if content else 0.0
+        return vectors @ matrix.T, coverage
+
+
+class TierPolicy:
+    # When the lexical estimate is trusted and how it maps onto the model scale.
+    #   intercept, slope  semantic score estimate = intercept + slope * 100 * lexical similarity
+    #   positive_score    sentiment score assumed for answers without negative words
+    #   margin            escalate when the estimate is this close to a rubric boundary
+    #   min_coverage      escalate when fewer of the answer's content words occur in the
+    #                     question's references
+    #                     (likely a paraphrase the lexical score cannot see)
+    #   min_words         escalate answers shorter than this
+    # Fit intercept, slope and positive_score with `python lexical_scorer.py --fit`.
+    FIELDS = ("intercept", "slope", "positive_score", "margin", "min_coverage", "min_words")
+
+    def __init__(self, intercept=30.0, slope=1.5, positive_score=0.95, margin=8.0, min_coverage=0.5, min_words=3):
+        self.intercept = intercept
+        self.slope = slope
+        self.positive_score = positive_score
+        self.margin = margin
+        self.min_coverage = min_coverage
+        self.min_words = min_words
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(**{field: data[field] for field in cls.FIELDS if field in data})
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    def estimate(self, lexical_scores):
+        return np.clip(self.intercept + self.slope * 100 * np.asarray(lexical_scores), 0.0, 100.0)
+
+    def escalation(self, estimate, coverage, words):
+        # Why the models are needed for this answer, or None if the estimate stands
+        if len(words) < self.min_words:
+            return "short"
+        if coverage < self.min_coverage:
+            return "coverage"
+        if not NEGATIVE_WORDS.isdisjoint(words):
+            return "tone"
+        if min(abs(estimate - boundary) for boundary in SEMANTIC_BOUNDARIES) < self.margin:
+            return "boundary"
+        return None
+
+
+def semantic_bucket(score):
+    return sum(score >= boundary for boundary in SEMANTIC_BOUNDARIES)
+
+def fit_policy(lexical_scores, semantic_scores, sentiments, words, policy):
+    # Least-squares line from lexical to model semantic scores, and the typical model
+    # score of the answers tier 0 calls positive
+    x = 100 * np.asarray(lexical_scores, dtype=np.float64)
+    y = np.asarray(semantic_scores, dtype=np.float64)
+    if len(x) >= 2 and x.std() > 0:
+        policy.slope, policy.intercept = (float(v) for v in np.polyfit(x, y, 1))
+    positive = [
+        sentiment["score"] for sentiment, answer_words in zip(sentiments, words)
+        if sentiment["label"] == "POSITIVE" and NEGATIVE_WORDS.isdisjoint(answer_words)
+    ]
+    if positive:
+        policy.positive_score = float(np.median(positive))
+    return policy
+
+def agreement_report(pairs, policy, fit=False, batch_size=32):
+    # Score every pair both ways and compare the tiered result with the full pipeline
+    import interview_ai
+    started = time.perf_counter()
+    full = interview_ai.score_batch(pairs, batch_size=batch_size, include_entities=False, resolve_unknown=True)
+    full_seconds = time.perf_counter() - started
+    scored = [(pair, analysis) for pair, analysis in zip(pairs, full) if analysis is not None]
+    if not scored:
+        return None
+    full_pairs = [(analysis.question, analysis.answer) for _, analysis in scored]
+    started = time.perf_counter()
+    lexical = interview_ai.lexical_scores(full_pairs)
+    lexical_seconds = time.perf_counter() - started
+
+    words = [set(tokenize(answer)) for _, answer in full_pairs]
+    if fit:
+        fit_policy(
+            [score for score, _, _ in lexical],
+            [analysis.semantic_score for _, analysis in scored],
+            [analysis.sentiment for _, analysis in scored],
+            words,
+            policy
+        )
+    tiered = interview_ai.score_batch(full_pairs, batch_size=batch_size, include_entities=False,
+                                      tiered=True, policy=policy)
+    reasons = {}
+    accepted = []
+    for (_, analysis), tiered_analysis in zip(scored, tiered):
+        reason = tiered_analysis.escalation
+        if reason is None:
+            accepted.append((analysis, tiered_analysis))
+        else:
+            reasons[reason] = reasons.get(reason, 0) + 1
+
+    def compare(rows):
+        if not rows:
+            return None
+        return {
+            "answers": len(rows),
+            "total_score_exact": sum(a.total_score == t.total_score for a, t in rows) / len(rows),
+            "total_score_mae": sum(abs(a.total_score - t.total_score) for a, t in rows) / len(rows),
+            "semantic_bucket_agreement": sum(
+                semantic_bucket(a.semantic_score) == semantic_bucket(t.semantic_score) for a, t in rows
+            ) / len(rows),
+            "semantic_mae": sum(abs(a.semantic_score - t.semantic_score) for a, t in rows) / len(rows),
+            "sentiment_label_agreement": sum(a.sentiment_label == t.sentiment_label for a, t in rows) / len(rows)
+        }
+
+    count = len(scored)
+    escalation_rate = 1 - len(accepted) / count
+    full_ms = full_seconds / count * 1000
+    lexical_ms = lexical_seconds / count * 1000
+    return {
+        "answers": count,
+        "skipped": len(pairs) - count,
+        "policy": policy.to_dict(),
+        "escalation_rate": escalation_rate,
+        "escalation_reasons": reasons,
+        "lexical_only": compare(accepted),
+        "overall": compare([(analysis, t) for (_, analysis), t in zip(scored, tiered)]),
+        "full_ms_per_answer": full_ms,
+        "lexical_ms_per_answer": lexical_ms,
+        # Cost per answer if the escalated ones still pay for the full pipeline
+        "tiered_ms_per_answer": lexical_ms + escalation_rate * full_ms
+    }
+
+def print_report(report, file=sys.stdout):
+    print(f"Answers compared: {report['answers']} ({report['skipped']} skipped, unknown question)", file=file)
+    print(f"Escalated to the models: {report['escalation_rate']:.1%} "
+          + json.dumps(report["escalation_reasons"], sort_keys=True), file=file)
+    for name in ("lexical_only", "overall"):
+        stats = report[name]
+        if stats is None:
+            continue
+        label = "Answers kept at tier 0" if name == "lexical_only" else "All answers, tiered"
+        print(f"{label} ({stats['answers']}):", file=file)
+        print(f"  total score exact {stats['total_score_exact']:.1%}, mean abs diff {stats['total_score_mae']:.2f}",
+              file=file)
+        print(f"  semantic bucket {stats['semantic_bucket_agreement']:.1%}, mean abs diff {stats['semantic_mae']:.2f}",
+              file=file)
+        print(f"  sentiment label {stats['sentiment_label_agreement']:.1%}", file=file)
+    print(f"Time per answer: full {report['full_ms_per_answer']:.2f} ms, lexical {report['lexical_ms_per_answer']:.3f} ms, "
+          f"tiered {report['tiered_ms_per_answer']:.2f} ms", file=file)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compare tiered lexical scoring with the full model pipeline on logged answers."
+    )
+    import interview_ai
+    parser.add_argument("--log", default=interview_ai.LOG_FILE, help="answer log to read")
+    parser.add_argument("--limit", type=int, default=2000, help="logged answers to compare at most")
+    parser.add_argument("--policy", help="tier policy JSON to start from (default: built-in values)")
+    parser.add_argument("--fit", action="store_true", help="fit the lexical-to-model mapping on these answers")
+    parser.add_argument("--margin", type=float, help="override the boundary margin")
+    parser.add_argument("--min-coverage", type=float, help="override the minimum vocabulary coverage")
+    parser.add_argument("--min-words", type=int, help="override the minimum answer length")
+    parser.add_argument("--save", help="write the resulting policy here, e.g. " + interview_ai.LEXICAL_POLICY_FILE)
+    parser.add_argument("--json", help="also write the report as JSON")
+    args = parser.parse_args(argv)
+
+    policy = TierPolicy.load(args.policy) if args.policy else TierPolicy()
+    for field in ("margin", "min_coverage", "min_words"):
+        if getattr(args, field) is not None:
+            setattr(policy, field, getattr(args, field))
+    pairs = []
+    for record in interview_ai.iter_logged_answers(args.log):
+        pairs.append((record.get("soru", ""), record.get("cevap", "")))
+        if len(pairs) >= args.limit:
+            break
+    report = agreement_report(pairs, policy, fit=args.fit)
+    if report is None:
+        print("No logged answers to known questions to compare.")
+        return
+    if args.fit:
+        print("Note: fitted and evaluated on the same answers; check on another log before trusting it.")
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.save:
+        policy.save(args.save)
+        print(f"Tier policy written to {args.save}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,347 @@
+import atexit
+import cProfile
+import functools
+import json
+import os
+import pstats
+import re
+import threading
+import time
+import tracemalloc
+from bisect import bisect_left
+
+# Histogram bucket bounds in seconds, as in the Prometheus client defaults
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class NullTimer:
+    # Returned while metrics are off: entering and leaving it does nothing
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+NULL_TIMER = NullTimer()
+
+class Timer:
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class Metrics:
+    # Per-stage timers and counters for the scoring pipeline. Everything is off by
+    # default; `timer()` then hands back a shared no-op object and `increment()`
+    # returns straight away, so instrumented code costs one attribute check.
+    def __init__(self):
+        self.enabled = False
+        self.sinks = []
+        self.gauges = {}
+        self.sources = []
+        self.profile_dir = None
+        self.profile_every = 1
+        self.timers = {}
+        self.counters = {}
+        self._requests = 0
+        self._lock = threading.Lock()
+        self._profile_lock = threading.Lock()
+        self._emitter = None
+        self._stop = threading.Event()
+
+    def timer(self, name):
+        if not self.enabled:
+            return NULL_TIMER
+        return Timer(self, name)
+
+    def timed(self, name):
+        # Decorator form of timer()
+        def decorate(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                with Timer(self, name):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def observe(self, name, seconds):
+        if not self.enabled:
+            return
+        with self._lock:
+            stats = self.timers.get(name)
+            if stats is None:
+                stats = self.timers[name] = {"count": 0, "sum": 0.0, "max": 0.0, "buckets": [0] * (len(BUCKETS) + 1)}
+            stats["count"] += 1
+            stats["sum"] += seconds
+            stats["max"] = max(stats["max"], seconds)
+            stats["buckets"][bisect_left(BUCKETS, seconds)] += 1
+
+    def increment(self, name, value=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def register_gauge(self, name, read):
+        # read() -> number or flat dict of numbers, sampled when a snapshot is taken
+        self.gauges[name] = read
+
+    def reset(self):
+        with self._lock:
+            self.timers = {}
+            self.counters = {}
+
+    def snapshot(self):
+        with self._lock:
+            timers = {
+                name: {
+                    "count": s["count"],
+                    "total_s": s["sum"],
+                    "mean_ms": s["sum"] / s["count"] * 1000 if s["count"] else 0.0,
+                    "max_ms": s["max"] * 1000,
+                    "buckets": list(s["buckets"])
+                }
+                for name, s in self.timers.items()
+            }
+            counters = dict(self.counters)
+        gauges = {}
+        for name, read in self.gauges.items():
+            try:
+                gauges[name] = read()
+            except Exception as e:
+                print(f"Error reading gauge {name}: {e}")
+        return {"timestamp": time.time(), "timers": timers, "counters": counters, "gauges": gauges}
+
+    def add_source(self, read):
+        # read() -> list of snapshots from elsewhere, e.g. worker processes
+        self.sources.append(read)
+
+    def collect(self):
+        # This process's snapshot merged with every source
+        snapshots = [self.snapshot()]
+        for read in self.sources:
+            try:
+                snapshots.extend(read())
+            except Exception as e:
+                print(f"Error collecting metrics: {e}")
+        return snapshots[0] if len(snapshots) == 1 else merge_snapshots(snapshots)
+
+    # Sinks
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+
+    def emit(self):
+        if not self.sinks:
+            return
+        snapshot = self.collect()
+        for sink in self.sinks:
+            try:
+                sink.write(snapshot)
+            except Exception as e:
+                print(f"Error writing metrics to {type(sink).__name__}: {e}")
+
+    def start(self, interval=60.0):
+        # Emit to every sink every `interval` seconds and once more at exit
+        if self._emitter is None:
+            self._emitter = threading.Thread(target=self._run, args=(interval,), daemon=True)
+            self._emitter.start()
+            atexit.register(self.stop)
+
+    def _run(self, interval):
+        while not self._stop.wait(interval):
+            self.emit()
+
+    def stop(self):
+        self._stop.set()
+        self.emit()
+
+    # Profiling
+
+    def profile(self, name):
+        # cProfile + tracemalloc capture of one request, when a profile directory is set.
+        # Only every `profile_every`-th request is captured, and one at a time.
+        if self.profile_dir is None:
+            return NULL_TIMER
+        with self._lock:
+            self._requests += 1
+            if self._requests % self.profile_every:
+                return NULL_TIMER
+            number = self._requests
+        if not self._profile_lock.acquire(blocking=False):
+            return NULL_TIMER
+        return Profile(self, f"{name}-{number}")
+
+
+class Profile:
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.started_tracing = not tracemalloc.is_tracing()
+        if self.started_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        self.profiler = cProfile.Profile()
+        self.profiler.enable()
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            self.profiler.disable()
+            memory = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+            if self.started_tracing:
+                tracemalloc.stop()
+            os.makedirs(self.metrics.profile_dir, exist_ok=True)
+            base = os.path.join(self.metrics.profile_dir, f"{self.name}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}")
+            self.profiler.dump_stats(base + ".prof")
+            with open(base + ".txt", "w", encoding="utf-8") as f:
+                f.write(f"Peak traced memory: {peak / 1024:.1f} KB\n\nTop allocations:\n")
+                for stat in memory.statistics("lineno")[:20]:
+                    f.write(f"{stat}\n")
+                f.write("\n")
+                pstats.Stats(self.profiler, stream=f).sort_stats("cumulative").print_stats(30)
+            print(f"📈 Profile of {self.name} written to {base}.prof")
+        except Exception as e:
+            print(f"Error writing profile: {e}")
+        finally:
+            self.metrics._profile_lock.release()
+        return False
+
+
+class LogSink:
+    # One printed line per stage
+    def write(self, snapshot):
+        for name, t in sorted(snapshot["timers"].items()):
+            print(f"⏱️ {name}: {t['count']} calls, mean {t['mean_ms']:.2f} ms, max {t['max_ms']:.2f} ms")
+        for name, value in sorted(snapshot["counters"].items()):
+            print(f"🔢 {name}: {value}")
+        for name, value in sorted(snapshot["gauges"].items()):
+            print(f"📊 {name}: {json.dumps(value)}")
+
+class JsonFileSink:
+    def __init__(self, path):
+        self.path = path
+
+    def write(self, snapshot):
+        with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, indent=2)
+        os.replace(self.path + ".tmp", self.path)
+
+class PrometheusFileSink:
+    # Prometheus text format, e.g. for node_exporter's textfile collector
+    def __init__(self, path):
+        self.path = path
+
+    def write(self, snapshot):
+        with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(prometheus_text(snapshot))
+        os.replace(self.path + ".tmp", self.path)
+
+
+def merge_snapshots(snapshots):
+    # Combine snapshots from several processes into one, e.g. prefork workers
+    merged = {"timestamp": time.time(), "timers": {}, "counters": {}, "gauges": {}}
+    for snapshot in snapshots:
+        for name, t in snapshot["timers"].items():
+            total = merged["timers"].setdefault(
+                name, {"count": 0, "total_s": 0.0, "max_ms": 0.0, "buckets": [0] * (len(BUCKETS) + 1)}
+            )
+            total["count"] += t["count"]
+            total["total_s"] += t["total_s"]
+            total["max_ms"] = max(total["max_ms"], t["max_ms"])
+            total["buckets"] = [a + b for a, b in zip(total["buckets"], t["buckets"])]
+        for name, value in snapshot["counters"].items():
+            merged["counters"][name] = merged["counters"].get(name, 0) + value
+        for name, value in snapshot["gauges"].items():
+            if isinstance(value, dict):
+                total = merged["gauges"].setdefault(name, {})
+                for key, number in value.items():
+                    total[key] = total.get(key, 0) + number
+            else:
+                merged["gauges"][name] = merged["gauges"].get(name, 0) + value
+    for t in merged["timers"].values():
+        t["mean_ms"] = t["total_s"] / t["count"] * 1000 if t["count"] else 0.0
+    for value in merged["gauges"].values():
+        # Rates do not add up; rebuild them from the summed counts
+        if isinstance(value, dict) and "hit_rate" in value:
+            lookups = value.get("hits", 0) + value.get("misses", 0)
+            value["hit_rate"] = value.get("hits", 0) / lookups if lookups else 0.0
+    return merged
+
+def metric_name(name):
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+def prometheus_text(snapshot, prefix="interview_ai"):
+    lines = [f"# TYPE {prefix}_stage_seconds histogram"]
+    for name, t in sorted(snapshot["timers"].items()):
+        cumulative = 0
+        for bound, count in zip(BUCKETS + ("+Inf",), t["buckets"]):
+            cumulative += count
+            lines.append(f'{prefix}_stage_seconds_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+        lines.append(f'{prefix}_stage_seconds_sum{{stage="{name}"}} {t["total_s"]}')
+        lines.append(f'{prefix}_stage_seconds_count{{stage="{name}"}} {t["count"]}')
+    for name, value in sorted(snapshot["counters"].items()):
+        lines.append(f"# TYPE {prefix}_{metric_name(name)}_total counter")
+        lines.append(f"{prefix}_{metric_name(name)}_total {value}")
+    for name, value in sorted(snapshot["gauges"].items()):
+        values = value if isinstance(value, dict) else {"": value}
+        for key, number in values.items():
+            if isinstance(number, (int, float)) and not isinstance(number, bool):
+                full_name = metric_name(f"{prefix}_{name}_{key}" if key else f"{prefix}_{name}")
+                lines.append(f"# TYPE {full_name} gauge")
+                lines.append(f"{full_name} {number}")
+    return "\n".join(lines) + "\n"
+
+def sink_from_spec(spec):
+    # "log", "json:PATH" or "prometheus:PATH"
+    kind, _, path = spec.partition(":")
+    if kind == "log":
+        return LogSink()
+    if kind == "json" and path:
+        return JsonFileSink(path)
+    if kind == "prometheus" and path:
+        return PrometheusFileSink(path)
+    raise ValueError(f"unknown metrics sink {spec!r}, expected log, json:PATH or prometheus:PATH")
+
+
+metrics = Metrics()
+
+
+def configure(enabled=True, sinks=(), interval=60.0, profile_dir=None, profile_every=1):
+    metrics.enabled = enabled
+    for sink in sinks:
+        metrics.add_sink(sink_from_spec(sink) if isinstance(sink, str) else sink)
+    metrics.profile_dir = profile_dir
+    metrics.profile_every = max(1, profile_every)
+    if metrics.sinks and interval:
+        metrics.start(interval)
+    return metrics
+
+def configure_from_env():
+    # INTERVIEW_AI_METRICS: comma-separated sink specs, e.g. "log,json:metrics.json"
+    # INTERVIEW_AI_PROFILE_DIR: directory for per-request cProfile/tracemalloc captures
+    sinks = [s for s in os.environ.get("INTERVIEW_AI_METRICS", "").split(",") if s.strip()]
+    profile_dir = os.environ.get("INTERVIEW_AI_PROFILE_DIR") or None
+    if sinks or profile_dir:
+        configure(
+            sinks=[s.strip() for s in sinks],
+            interval=float(os.environ.get("INTERVIEW_AI_METRICS_INTERVAL", 60)),
+            profile_dir=profile_dir,
+            profile_every=int(os.environ.get("INTERVIEW_AI_PROFILE_EVERY", 1))
+        )
+    return metrics
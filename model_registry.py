@@ -0,0 +1,236 @@
+import gc
+import os
+import threading
+import time
+from collections import deque
+from metrics import metrics
+
+# Attributes wrappers keep their weights under: pipelines, KeyBERT backends, indexes
+WRAPPED_ATTRIBUTES = ("model", "embedding_model", "matrix")
+
+
+def process_rss():
+    # Resident set size of this process in bytes, 0 where /proc is unavailable
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+def estimate_size(model, skip=()):
+    # Bytes of weights a loaded model holds: torch parameters and buffers, numpy
+    # arrays, or whatever a wrapper keeps under WRAPPED_ATTRIBUTES. Objects in `skip`
+    # (other registered models it points at) are not counted again.
+    if model is None or id(model) in skip:
+        return 0
+    if hasattr(model, "parameters") and hasattr(model, "buffers"):
+        tensors = list(model.parameters()) + list(model.buffers())
+        return sum(t.numel() * t.element_size() for t in tensors)
+    if hasattr(model, "nbytes"):
+        return int(model.nbytes)
+    return sum(estimate_size(getattr(model, name, None), skip) for name in WRAPPED_ATTRIBUTES)
+
+def release_memory():
+    # Collect the dropped model and hand freed heap pages back to the OS where glibc allows it
+    gc.collect()
+    try:
+        import ctypes
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+class ModelRegistry:
+    # Models are registered as loader functions and only built the first time
+    # someone asks for them. Loading is guarded so concurrent callers share one load.
+    # With a memory budget, the least recently used models are unloaded whenever the
+    # loaded ones would not fit, and loaded again on their next use; with an idle
+    # timeout, models nobody has used for that long are unloaded in the background.
+    # A model is only dropped from the registry, so a caller still holding it can
+    # finish; the memory comes back once it lets go.
+    def __init__(self, memory_budget=None, idle_timeout=None):
+        self.memory_budget = memory_budget
+        self.idle_timeout = idle_timeout
+        self._loaders = {}
+        self._depends = {}
+        self._pinned = set()
+        self._models = {}
+        self._sizes = {}
+        self._last_used = {}
+        self._loads = {}
+        self._evictions = {}
+        self._events = deque(maxlen=100)
+        self._lock = threading.RLock()
+        self._warm_up_thread = None
+        self._reaper = None
+
+    def register(self, name, loader, depends=()):
+        # Registering again swaps the loader; a model already loaded is dropped.
+        # `depends` names models this one holds on to, e.g. KeyBERT and the encoder:
+        # unloading a dependency unloads this one too.
+        with self._lock:
+            self._loaders[name] = loader
+            self._depends[name] = tuple(depends)
+            self._models.pop(name, None)
+            self._sizes.pop(name, None)
+            self._loads.pop(name, None)
+
+    def pin(self, *names):
+        # Never evict these, e.g. the encoder every answer needs
+        self._pinned.update(names)
+
+    def __contains__(self, name):
+        return name in self._loaders
+
+    def names(self):
+        return list(self._loaders)
+
+    def is_loaded(self, name):
+        return name in self._models
+
+    def load_count(self, name):
+        return self._loads.get(name, 0)
+
+    def get(self, name):
+        model = self._models.get(name)
+        if model is not None:
+            self._last_used[name] = time.monotonic()
+            return model
+        with self._lock:
+            if name not in self._models:
+                for dependency in self._depends.get(name, ()):
+                    self.get(dependency)
+                # Make room up front when the size is known from an earlier load
+                self._fit_budget(self._sizes.get(name, 0), keep=name)
+                self._load(name)
+                self._fit_budget(0, keep=name)
+            self._last_used[name] = time.monotonic()
+            return self._models[name]
+
+    def _load(self, name):
+        reload = name in self._loads
+        started = time.perf_counter()
+        rss = process_rss()
+        with metrics.timer(f"load.{name}"):
+            model = self._loaders[name]()
+        skip = {id(self._models[d]) for d in self._depends.get(name, ()) if d in self._models}
+        size = estimate_size(model, skip) or max(0, process_rss() - rss)
+        self._models[name] = model
+        self._sizes[name] = size
+        self._loads[name] = self._loads.get(name, 0) + 1
+        metrics.increment("models.reloads" if reload else "models.loads")
+        self._event("reload" if reload else "load", name, size, time.perf_counter() - started)
+
+    def unload(self, name, reason="manual"):
+        # Drop a loaded model and everything that depends on it
+        with self._lock:
+            if name not in self._models:
+                return False
+            for dependent, depends in self._depends.items():
+                if name in depends:
+                    self.unload(dependent, reason)
+            self._models.pop(name)
+            self._evictions[name] = self._evictions.get(name, 0) + 1
+            metrics.increment("models.evictions")
+            self._event("evict", name, self._sizes.get(name, 0), reason=reason)
+        release_memory()
+        return True
+
+    def _last_use(self, name):
+        # Dependents use a model without going through get(), so their use counts too
+        return max([self._last_used.get(name, 0)] + [
+            self._last_used.get(dependent, 0) for dependent, depends in self._depends.items()
+            if name in depends and dependent in self._models
+        ])
+
+    def resident_bytes(self):
+        return sum(self._sizes.get(name, 0) for name in list(self._models))
+
+    def _fit_budget(self, incoming, keep):
+        # Evict least recently used models until `incoming` more bytes fit the budget
+        if self.memory_budget is None:
+            return
+        protected = {keep, *self._depends.get(keep, ())} | self._pinned
+        while self.resident_bytes() + incoming > self.memory_budget:
+            candidates = [name for name in self._models if name not in protected]
+            if not candidates:
+                if incoming or self.resident_bytes() > self.memory_budget:
+                    print(f"⚠️ Models need {(self.resident_bytes() + incoming) / 2**20:.0f} MB, "
+                          f"over the {self.memory_budget / 2**20:.0f} MB budget")
+                return
+            self.unload(min(candidates, key=self._last_use), reason="budget")
+
+    def evict_idle(self, max_idle=None):
+        # Unload models unused for `max_idle` seconds (default: the idle timeout)
+        max_idle = self.idle_timeout if max_idle is None else max_idle
+        if max_idle is None:
+            return []
+        now = time.monotonic()
+        with self._lock:
+            idle = [
+                name for name in self._models
+                if name not in self._pinned and now - self._last_use(name) >= max_idle
+            ]
+        return [name for name in idle if self.unload(name, reason="idle")]
+
+    def start_reaper(self):
+        # Background thread running evict_idle() while an idle timeout is set
+        if self.idle_timeout and self._reaper is None:
+            self._reaper = threading.Thread(target=self._reap, name="model-reaper", daemon=True)
+            self._reaper.start()
+
+    def _reap(self):
+        while self.idle_timeout:
+            time.sleep(min(self.idle_timeout / 2, 60))
+            try:
+                self.evict_idle()
+            except Exception as e:
+                print(f"Error unloading idle models: {e}")
+
+    def _event(self, kind, name, size, seconds=None, reason=None):
+        event = {"time": time.time(), "event": kind, "model": name, "bytes": size}
+        if seconds is not None:
+            event["seconds"] = round(seconds, 3)
+        if reason is not None:
+            event["reason"] = reason
+        self._events.append(event)
+        if kind == "evict":
+            print(f"♻️ Unloaded {name} ({size / 2**20:.0f} MB, {reason})")
+        elif kind == "reload":
+            print(f"🔁 Reloaded {name} ({size / 2**20:.0f} MB) in {seconds:.1f}s")
+
+    def events(self):
+        return list(self._events)
+
+    def stats(self):
+        # Flat numbers for the metrics gauge: bytes per loaded model plus totals
+        with self._lock:
+            stats = {f"{name}_bytes": self._sizes.get(name, 0) for name in self._models}
+            stats["resident_bytes"] = self.resident_bytes()
+            stats["loaded"] = len(self._models)
+            stats["evictions"] = sum(self._evictions.values())
+        if self.memory_budget is not None:
+            stats["budget_bytes"] = self.memory_budget
+        stats["process_rss_bytes"] = process_rss()
+        return stats
+
+    def preload(self, names=None):
+        for name in names or self.names():
+            # Loading past the budget would only evict what was just loaded
+            if self.memory_budget is not None and self.resident_bytes() >= self.memory_budget:
+                break
+            self.get(name)
+
+    def warm_up(self, names=None):
+        # Load models on a daemon thread so the caller can keep starting up
+        with self._lock:
+            if self._warm_up_thread is None or not self._warm_up_thread.is_alive():
+                self._warm_up_thread = threading.Thread(target=self._warm_up, args=(names,), daemon=True)
+                self._warm_up_thread.start()
+            return self._warm_up_thread
+
+    def _warm_up(self, names):
+        try:
+            self.preload(names)
+        except Exception as e:
+            print(f"Error warming up models: {e}")
@@ -0,0 +1,205 @@
+import argparse
+import json
+import os
+
+import numpy as np
+
+# ONNX Runtime is optional: it is only needed when this backend is selected.
+# Exporting additionally needs torch (already required by the default backend).
+#   pip install onnxruntime
+
+ENCODER_REPO = "sentence-transformers/paraphrase-MiniLM-L6-v2"
+ENCODER_MAX_LENGTH = 128
+SENTIMENT_MAX_LENGTH = 512
+
+
+def import_onnxruntime():
+    try:
+        import onnxruntime
+    except ImportError:
+        raise ImportError("The ONNX backend needs onnxruntime: pip install onnxruntime") from None
+    return onnxruntime
+
+def session_options(intra_op_threads=None):
+    ort = import_onnxruntime()
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.inter_op_num_threads = 1
+    if intra_op_threads:
+        options.intra_op_num_threads = intra_op_threads
+    return options
+
+def model_file(model_dir, quantized):
+    return os.path.join(model_dir, "model.quant.onnx" if quantized else "model.onnx")
+
+
+def _export(torch_model, tokenizer, output_dir, output_names, quantize):
+    import torch
+    os.makedirs(output_dir, exist_ok=True)
+    torch_model.eval()
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    for name in output_names:
+        dynamic_axes[name] = {0: "batch"}
+    with torch.no_grad():
+        torch.onnx.export(
+            torch_model,
+            tuple(sample[name] for name in input_names),
+            model_file(output_dir, False),
+            input_names=input_names,
+            output_names=output_names,
+            dynamic_axes=dynamic_axes,
+            opset_version=14
+        )
+    tokenizer.save_pretrained(output_dir)
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(model_file(output_dir, False), model_file(output_dir, True), weight_type=QuantType.QInt8)
+
+def export_encoder(output_dir, model_name=ENCODER_REPO, quantize=True):
+    from transformers import AutoModel, AutoTokenizer
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    torch_model = AutoModel.from_pretrained(model_name, torchscript=True)
+    _export(torch_model, tokenizer, output_dir, ["token_embeddings"], quantize)
+
+def export_sentiment(output_dir, model_name, quantize=True):
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    torch_model = AutoModelForSequenceClassification.from_pretrained(model_name, torchscript=True)
+    _export(torch_model, tokenizer, output_dir, ["logits"], quantize)
+    with open(os.path.join(output_dir, "labels.json"), "w", encoding="utf-8") as f:
+        json.dump({int(k): v for k, v in torch_model.config.id2label.items()}, f)
+
+
+class OnnxModel:
+    def __init__(self, model_dir, quantized=True, intra_op_threads=None, max_length=512):
+        from transformers import AutoTokenizer
+        ort = import_onnxruntime()
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.session = ort.InferenceSession(
+            model_file(model_dir, quantized),
+            sess_options=session_options(intra_op_threads),
+            providers=["CPUExecutionProvider"]
+        )
+        self.input_names = [i.name for i in self.session.get_inputs()]
+        self.max_length = max_length
+
+    def run(self, texts):
+        inputs = self.tokenizer(texts, padding=True, truncation=True, max_length=self.max_length, return_tensors="np")
+        feed = {name: inputs[name].astype(np.int64) for name in self.input_names}
+        return self.session.run(None, feed)[0], inputs["attention_mask"]
+
+
+class OnnxEncoder(OnnxModel):
+    # Drop-in for SentenceTransformer.encode with the model's mean pooling
+    def __init__(self, model_dir, quantized=True, intra_op_threads=None):
+        super().__init__(model_dir, quantized, intra_op_threads, ENCODER_MAX_LENGTH)
+
+    def encode(self, sentences, batch_size=32, convert_to_numpy=True, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        # Sort by length so each batch pads as little as possible
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        embeddings = [None] * len(texts)
+        for start in range(0, len(texts), batch_size):
+            batch = order[start:start + batch_size]
+            token_embeddings, mask = self.run([texts[i] for i in batch])
+            mask = mask[..., None].astype(np.float32)
+            pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            for i, vector in zip(batch, pooled):
+                embeddings[i] = vector
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        result = np.stack(embeddings).astype(np.float32)
+        return result[0] if single else result
+
+
+class OnnxSentimentPipeline(OnnxModel):
+    # Drop-in for pipeline('sentiment-analysis'): returns [{'label', 'score'}, ...]
+    def __init__(self, model_dir, quantized=True, intra_op_threads=None):
+        super().__init__(model_dir, quantized, intra_op_threads, SENTIMENT_MAX_LENGTH)
+        with open(os.path.join(model_dir, "labels.json"), "r", encoding="utf-8") as f:
+            self.labels = {int(k): v for k, v in json.load(f).items()}
+
+    def __call__(self, inputs, batch_size=32, **kwargs):
+        texts = [inputs] if isinstance(inputs, str) else list(inputs)
+        results = []
+        for start in range(0, len(texts), batch_size):
+            logits, _ = self.run(texts[start:start + batch_size])
+            logits = logits - logits.max(axis=1, keepdims=True)
+            probabilities = np.exp(logits) / np.exp(logits).sum(axis=1, keepdims=True)
+            for row in probabilities:
+                best = int(row.argmax())
+                results.append({"label": self.labels[best], "score": float(row[best])})
+        return results
+
+
+def keybert_backend(encoder):
+    # KeyBERT only accepts SentenceTransformer or its own BaseEmbedder
+    from keybert.backend import BaseEmbedder
+
+    class EncoderBackend(BaseEmbedder):
+        def embed(self, documents, verbose=False):
+            return encoder.encode(list(documents))
+
+    return EncoderBackend()
+
+
+def check_parity(texts, reference_encoder, onnx_encoder, reference_sentiment, onnx_sentiment):
+    # Compare the ONNX models against the PyTorch ones on the same texts
+    from embedding_index import normalize_rows
+    reference = normalize_rows(reference_encoder.encode(texts, convert_to_numpy=True))
+    candidate = normalize_rows(onnx_encoder.encode(texts))
+    cosines = (reference * candidate).sum(axis=1)
+    reference_labels = reference_sentiment(texts)
+    candidate_labels = onnx_sentiment(texts)
+    agree = [r["label"] == c["label"] for r, c in zip(reference_labels, candidate_labels)]
+    score_diffs = [abs(r["score"] - c["score"]) for r, c in zip(reference_labels, candidate_labels)]
+    return {
+        "texts": len(texts),
+        "embedding_cosine_min": float(cosines.min()),
+        "embedding_cosine_mean": float(cosines.mean()),
+        "sentiment_label_agreement": sum(agree) / len(agree),
+        "sentiment_score_max_diff": max(score_diffs)
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export and check the ONNX inference backend.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export_parser = subparsers.add_parser("export", help="export the encoder and sentiment models to ONNX")
+    export_parser.add_argument("--output", default="onnx_models")
+    export_parser.add_argument("--no-quantize", action="store_true", help="skip int8 dynamic quantization")
+    parity_parser = subparsers.add_parser("parity", help="compare ONNX and PyTorch outputs on logged answers")
+    parity_parser.add_argument("--models", default="onnx_models")
+    parity_parser.add_argument("--limit", type=int, default=200, help="logged answers to compare")
+    parity_parser.add_argument("--no-quantize", action="store_true", help="check the unquantized export")
+    args = parser.parse_args(argv)
+
+    import interview_ai
+    if args.command == "export":
+        export_encoder(os.path.join(args.output, "encoder"), quantize=not args.no_quantize)
+        export_sentiment(
+            os.path.join(args.output, "sentiment"),
+            interview_ai.SENTIMENT_MODEL_NAME,
+            quantize=not args.no_quantize
+        )
+        print(f"Exported ONNX models to {args.output}")
+        return
+
+    from itertools import islice
+    texts = [r.get("cevap", "") for r in islice(interview_ai.iter_logged_answers(), args.limit)]
+    texts = [text for text in texts if text.strip()]
+    quantized = not args.no_quantize
+    report = check_parity(
+        texts,
+        interview_ai.load_sentence_model(),
+        OnnxEncoder(os.path.join(args.models, "encoder"), quantized),
+        interview_ai.load_sentiment_analyzer(),
+        OnnxSentimentPipeline(os.path.join(args.models, "sentiment"), quantized)
+    )
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
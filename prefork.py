@@ -0,0 +1,235 @@
+import gc
+import os
+import signal
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import Future
+from multiprocessing import Pipe
+
+import interview_ai
+from metrics import metrics
+
+
+# Commands a worker understands; each runs in the worker process
+
+def feedback_batch(pairs, tiered=False):
+    with metrics.profile("feedback_batch"):
+        analyses = interview_ai.score_batch(pairs, include_entities=False, tiered=tiered)
+        return [
+            interview_ai.score_answer(question, answer, analysis) if analysis is not None else None
+            for (question, answer), analysis in zip(pairs, analyses)
+        ]
+
+def score_rows(pairs, options):
+    # score_batch() results as plain dicts, None for unknown questions
+    analyses = interview_ai.score_batch(pairs, **options)
+    return [analysis.to_dict() if analysis is not None else None for analysis in analyses]
+
+def metrics_snapshot():
+    return metrics.snapshot()
+
+HANDLERS = {
+    "feedback": feedback_batch,
+    "score": score_rows,
+    "metrics": metrics_snapshot
+}
+
+
+def configure_threads(torch_threads):
+    # Keep processes x threads at or below the core count, or workers fight for CPUs
+    if not torch_threads:
+        return
+    os.environ["OMP_NUM_THREADS"] = str(torch_threads)
+    os.environ["MKL_NUM_THREADS"] = str(torch_threads)
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(torch_threads)
+
+def prepare_fork():
+    # Call before the parent loads models or runs any inference (preload_models()
+    # encodes the reference answers). With one intra-op thread the parent never starts
+    # an OpenMP/MKL thread pool, so the workers do not inherit a pool whose threads
+    # did not survive the fork, which can hang their first parallel region. Each
+    # worker then sets its own thread count.
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+    configure_threads(1)
+
+def worker_main(conn, torch_threads, handlers):
+    # Runs in the forked child and never returns
+    code = 0
+    try:
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        gc.enable()
+        configure_threads(torch_threads)
+        interview_ai.result_cache.after_fork()
+        # The parent reports its own numbers; start counting from zero here
+        metrics.reset()
+        while True:
+            try:
+                request = conn.recv()
+            except EOFError:
+                break
+            if request is None:
+                break
+            request_id, command, args = request
+            try:
+                response = (request_id, True, handlers[command](*args))
+            except Exception as e:
+                response = (request_id, False, e)
+            try:
+                conn.send(response)
+            except Exception as e:
+                # Result or exception could not be pickled
+                conn.send((request_id, False, RuntimeError(f"{command} failed: {e}")))
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    finally:
+        # Skip the parent's atexit handlers; they belong to the parent
+        os._exit(code)
+
+
+class Worker:
+    def __init__(self, index, pid, conn):
+        self.index = index
+        self.pid = pid
+        self.conn = conn
+        self.pending = {}
+        self.completed = 0
+        self.alive = True
+        self.send_lock = threading.Lock()
+
+
+class PreforkPool:
+    # Scoring processes forked from a parent that has already loaded every model.
+    # The weights sit in memory the children only read, so they stay shared
+    # copy-on-write; gc.freeze() keeps the collector from writing to (and so
+    # copying) those pages. Requests go to the worker with the fewest in flight.
+    # Fork before starting any other threads: only the forking thread survives in
+    # the child, and locks held by the others would stay locked forever. For the same
+    # reason the parent should call prepare_fork() before loading anything.
+    def __init__(self, processes=None, torch_threads=1, handlers=None):
+        self.processes = processes or os.cpu_count() or 1
+        self.torch_threads = torch_threads
+        self.handlers = handlers or HANDLERS
+        self.workers = []
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self._start()
+
+    def _start(self):
+        # Hugging Face tokenizers deadlock if their thread pool was used before a fork
+        os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+        sys.stdout.flush()
+        sys.stderr.flush()
+        gc.disable()
+        gc.collect()
+        gc.freeze()
+        try:
+            for index in range(self.processes):
+                parent_conn, child_conn = Pipe()
+                pid = os.fork()
+                if pid == 0:
+                    parent_conn.close()
+                    for worker in self.workers:
+                        worker.conn.close()
+                    worker_main(child_conn, self.torch_threads, self.handlers)
+                child_conn.close()
+                self.workers.append(Worker(index, pid, parent_conn))
+        finally:
+            gc.enable()
+        for worker in self.workers:
+            threading.Thread(target=self._read, args=(worker,), name=f"prefork-{worker.pid}", daemon=True).start()
+
+    def submit(self, command, *args):
+        future = Future()
+        with self._lock:
+            alive = [worker for worker in self.workers if worker.alive]
+            if not alive:
+                raise RuntimeError("no scoring workers left")
+            worker = min(alive, key=lambda w: len(w.pending))
+            request_id = self._next_id
+            self._next_id += 1
+            worker.pending[request_id] = future
+        metrics.increment("prefork.requests")
+        try:
+            with worker.send_lock:
+                worker.conn.send((request_id, command, args))
+        except Exception as e:
+            with self._lock:
+                worker.pending.pop(request_id, None)
+            future.set_exception(e)
+        return future
+
+    def run(self, command, *args):
+        return self.submit(command, *args).result()
+
+    def broadcast(self, command, *args):
+        # Same command on every live worker, e.g. to collect per-process metrics
+        futures = []
+        for worker in [w for w in self.workers if w.alive]:
+            future = Future()
+            with self._lock:
+                request_id = self._next_id
+                self._next_id += 1
+                worker.pending[request_id] = future
+            with worker.send_lock:
+                worker.conn.send((request_id, command, args))
+            futures.append(future)
+        return futures
+
+    def _read(self, worker):
+        while True:
+            try:
+                request_id, ok, result = worker.conn.recv()
+            except (EOFError, OSError):
+                break
+            with self._lock:
+                future = worker.pending.pop(request_id, None)
+                worker.completed += 1
+            if future is None:
+                continue
+            if ok:
+                future.set_result(result)
+            else:
+                future.set_exception(result)
+        with self._lock:
+            worker.alive = False
+            pending = list(worker.pending.values())
+            worker.pending.clear()
+        if pending:
+            print(f"⚠️ Scoring worker {worker.pid} exited with {len(pending)} request(s) in flight")
+        for future in pending:
+            future.set_exception(RuntimeError(f"scoring worker {worker.pid} exited"))
+
+    def stats(self):
+        with self._lock:
+            return [
+                {"pid": w.pid, "alive": w.alive, "in_flight": len(w.pending), "completed": w.completed}
+                for w in self.workers
+            ]
+
+    def shutdown(self, timeout=10.0):
+        for worker in self.workers:
+            try:
+                with worker.send_lock:
+                    worker.conn.send(None)
+            except Exception:
+                pass
+        deadline = time.monotonic() + timeout
+        for worker in self.workers:
+            while True:
+                try:
+                    pid, _ = os.waitpid(worker.pid, os.WNOHANG)
+                except ChildProcessError:
+                    break
+                if pid:
+                    break
+                if time.monotonic() > deadline:
+                    os.kill(worker.pid, signal.SIGTERM)
+                    os.waitpid(worker.pid, 0)
+                    break
+                time.sleep(0.05)
+            worker.conn.close()
@@ -0,0 +1,269 @@
+import argparse
+import hashlib
+import json
+import mmap
+import os
+from collections.abc import Mapping
+from functools import lru_cache
+
+import numpy as np
+
+from embedding_index import normalize_rows
+
+# Files that make up a bank directory
+QUESTIONS_FILE = "questions.jsonl"
+MANIFEST_FILE = "manifest.json"
+
+
+def text_key(text):
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+def derive_topics(question, keyword_map):
+    # The topic association the old code rediscovered on every answer, now done once
+    question_lower = question.lower()
+    return [topic for topic in keyword_map if topic in question_lower]
+
+
+class QuestionBank(Mapping):
+    # Read-only question bank kept on disk:
+    #   questions.jsonl      one {"id", "question", "answers", "topics"} record per line
+    #   embeddings.npy       float32 L2-normalized reference answer embeddings, in record order
+    #   question_embeddings.npy  float32 L2-normalized embedding of each question text
+    #   *.npy                line offsets, answer row offsets and sorted hash indexes
+    #   manifest.json        model version, topic keywords and topic posting ranges
+    # Everything is opened with memory mapping, so worker processes share one
+    # page-cached copy and only the records that are actually read get parsed.
+    # Behaves like question_set: bank[question_text] -> {"answers": [...], ...}.
+    def __init__(self, directory, record_cache_size=4096):
+        self.directory = directory
+        with open(self.path(MANIFEST_FILE), "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        self.model_version = self.manifest.get("model")
+        self.topics = self.manifest["topics"]
+        self._file = open(self.path(QUESTIONS_FILE), "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.offsets = self._load("offsets.npy")
+        self.answer_offsets = self._load("answer_offsets.npy")
+        self.text_keys = self._load("text_keys.npy")
+        self.text_positions = self._load("text_positions.npy")
+        self.id_keys = self._load("id_keys.npy")
+        self.id_positions = self._load("id_positions.npy")
+        self.topic_postings = self._load("topic_postings.npy")
+        self.embeddings = self._load_optional("embeddings.npy")
+        self.question_embeddings = self._load_optional("question_embeddings.npy")
+        self.record = lru_cache(maxsize=record_cache_size)(self._read_record)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _load(self, name):
+        return np.load(self.path(name), mmap_mode="r")
+
+    def _load_optional(self, name):
+        return self._load(name) if os.path.exists(self.path(name)) else None
+
+    def close(self):
+        self._mmap.close()
+        self._file.close()
+
+    def _read_record(self, position):
+        start, stop = int(self.offsets[position]), int(self.offsets[position + 1])
+        return json.loads(self._mmap[start:stop])
+
+    def _lookup(self, keys, positions, key):
+        i = int(np.searchsorted(keys, key))
+        while i < len(keys) and keys[i] == key:
+            yield int(positions[i])
+            i += 1
+
+    # Indexed lookups
+
+    def position(self, question):
+        for position in self._lookup(self.text_keys, self.text_positions, np.uint64(text_key(question))):
+            if self.record(position)["question"] == question:
+                return position
+        raise KeyError(question)
+
+    def by_id(self, question_id):
+        key = np.uint64(text_key(str(question_id)))
+        for position in self._lookup(self.id_keys, self.id_positions, key):
+            record = self.record(position)
+            if str(record["id"]) == str(question_id):
+                return record
+        raise KeyError(question_id)
+
+    def topic_positions(self, topic):
+        entry = self.topics.get(topic)
+        if entry is None:
+            return self.topic_postings[:0]
+        return self.topic_postings[entry["start"]:entry["stop"]]
+
+    def by_topic(self, topic):
+        return [self.record(int(position)) for position in self.topic_positions(topic)]
+
+    def topic_keywords(self, topic):
+        return self.topics.get(topic, {}).get("keywords", [])
+
+    def reference_embeddings(self, question):
+        position = self.position(question)
+        return self.embeddings[int(self.answer_offsets[position]):int(self.answer_offsets[position + 1])]
+
+    def question_texts(self):
+        return QuestionTexts(self)
+
+    # Mapping interface, so the bank can stand in for question_set
+
+    def __getitem__(self, question):
+        return self.record(self.position(question))
+
+    def __contains__(self, question):
+        try:
+            self.position(question)
+        except KeyError:
+            return False
+        return True
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield self.record(position)["question"]
+
+    # Building
+
+    @staticmethod
+    def build(directory, records, keyword_map, encoder=None, model_version=None, batch_size=256):
+        # records: iterable of {"id", "question", "answers", optional "topics"}; streamed to disk
+        os.makedirs(directory, exist_ok=True)
+        offsets = [0]
+        answer_offsets = [0]
+        text_keys = []
+        id_keys = []
+        topic_postings = {topic: [] for topic in keyword_map}
+        with open(os.path.join(directory, QUESTIONS_FILE), "wb") as f:
+            for position, record in enumerate(records):
+                topics = record.get("topics")
+                if topics is None:
+                    topics = derive_topics(record["question"], keyword_map)
+                row = {
+                    "id": record.get("id", position),
+                    "question": record["question"],
+                    "answers": list(record["answers"]),
+                    "topics": topics
+                }
+                line = (json.dumps(row, ensure_ascii=False) + "\n").encode("utf-8")
+                f.write(line)
+                offsets.append(offsets[-1] + len(line))
+                answer_offsets.append(answer_offsets[-1] + len(row["answers"]))
+                text_keys.append(text_key(row["question"]))
+                id_keys.append(text_key(str(row["id"])))
+                for topic in topics:
+                    topic_postings.setdefault(topic, []).append(position)
+
+        def save(name, array):
+            np.save(os.path.join(directory, name), array)
+
+        save("offsets.npy", np.array(offsets, dtype=np.int64))
+        save("answer_offsets.npy", np.array(answer_offsets, dtype=np.int64))
+        for name, keys in (("text", text_keys), ("id", id_keys)):
+            keys = np.array(keys, dtype=np.uint64)
+            order = np.argsort(keys, kind="stable")
+            save(f"{name}_keys.npy", keys[order])
+            save(f"{name}_positions.npy", order.astype(np.int64))
+
+        topics = {}
+        postings = []
+        for topic, positions in topic_postings.items():
+            topics[topic] = {
+                "keywords": list(keyword_map.get(topic, [])),
+                "start": len(postings),
+                "stop": len(postings) + len(positions)
+            }
+            postings.extend(positions)
+        save("topic_postings.npy", np.array(postings, dtype=np.int32))
+
+        if encoder is not None:
+            QuestionBank._encode(directory, "embeddings.npy", answer_offsets[-1], encoder, batch_size,
+                                 lambda record: record["answers"])
+            QuestionBank._encode(directory, "question_embeddings.npy", len(offsets) - 1, encoder, batch_size,
+                                 lambda record: [record["question"]])
+
+        with open(os.path.join(directory, MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump({"count": len(offsets) - 1, "model": model_version, "topics": topics}, f, ensure_ascii=False)
+        return QuestionBank(directory)
+
+    @staticmethod
+    def _encode(directory, name, total, encoder, batch_size, texts_of):
+        # Second pass over the written records, encoding straight into the .npy
+        matrix = None
+        row = 0
+        batch = []
+        with open(os.path.join(directory, QUESTIONS_FILE), "rb") as f:
+            for line in f:
+                batch.extend(texts_of(json.loads(line)))
+                if len(batch) >= batch_size:
+                    matrix, row = QuestionBank._write_rows(directory, name, matrix, row, total, encoder, batch)
+                    batch = []
+        matrix, row = QuestionBank._write_rows(directory, name, matrix, row, total, encoder, batch)
+        if matrix is not None:
+            matrix.flush()
+
+    @staticmethod
+    def _write_rows(directory, name, matrix, row, total, encoder, texts):
+        if not texts:
+            return matrix, row
+        vectors = normalize_rows(encoder.encode(texts, batch_size=len(texts), convert_to_numpy=True))
+        if matrix is None:
+            matrix = np.lib.format.open_memmap(
+                os.path.join(directory, name), mode="w+", dtype=np.float32, shape=(total, vectors.shape[1])
+            )
+        matrix[row:row + len(vectors)] = vectors
+        return matrix, row + len(vectors)
+
+
+class QuestionTexts:
+    # Lazy sequence of question texts, read from the bank only when indexed
+    def __init__(self, bank):
+        self.bank = bank
+
+    def __len__(self):
+        return len(self.bank)
+
+    def __getitem__(self, position):
+        return self.bank.record(position)["question"]
+
+
+def iter_jsonl_records(path):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build a memory-mapped question bank.")
+    parser.add_argument("source", nargs="?", help="JSONL of {id, question, answers, topics}; default: built-in questions")
+    parser.add_argument("--output", default="question_bank")
+    parser.add_argument("--batch-size", type=int, default=256, help="answers encoded per forward pass")
+    args = parser.parse_args(argv)
+
+    import interview_ai
+    if args.source:
+        records = iter_jsonl_records(args.source)
+    else:
+        records = (
+            {"id": i, "question": question, "answers": data["answers"]}
+            for i, (question, data) in enumerate(interview_ai.question_set.items())
+        )
+    bank = QuestionBank.build(
+        args.output,
+        records,
+        interview_ai.keyword_map,
+        encoder=interview_ai.models.get('model'),
+        model_version=interview_ai.model_versions['model'],
+        batch_size=args.batch_size
+    )
+    print(f"Built question bank with {len(bank)} questions in {args.output}")
+
+if __name__ == "__main__":
+    main()
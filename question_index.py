@@ -0,0 +1,80 @@
+import numpy as np
+
+from embedding_index import normalize_rows
+
+# Banks smaller than this are searched by brute force; it is already sub-millisecond
+IVF_MIN_SIZE = 10000
+
+
+def spherical_kmeans(vectors, n_clusters, iterations=10, sample_size=20000, seed=0):
+    # Cosine k-means on normalized vectors, trained on a sample to keep build time flat
+    rng = np.random.default_rng(seed)
+    sample = vectors
+    if len(vectors) > sample_size:
+        sample = vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))]
+    sample = np.asarray(sample, dtype=np.float32)
+    centroids = sample[rng.choice(len(sample), n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = (sample @ centroids.T).argmax(axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, sample)
+        empty = np.bincount(assignment, minlength=n_clusters) == 0
+        sums[empty] = centroids[empty]
+        centroids = normalize_rows(sums)
+    return centroids
+
+
+class NearestQuestionIndex:
+    # Maps free-form question text to the closest question in the bank by cosine
+    # similarity of question embeddings. Small banks use one matrix-vector product;
+    # large ones use an inverted file (IVF): questions are grouped around k-means
+    # centroids, stored contiguously per group, and only the `n_probe` groups closest
+    # to the query are scanned.
+    def __init__(self, embeddings, n_lists=None, n_probe=8):
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if n_lists is None and len(embeddings) >= IVF_MIN_SIZE:
+            n_lists = int(np.sqrt(len(embeddings)))
+        self.n_probe = n_probe
+        self.centroids = None
+        if not n_lists or n_lists >= len(embeddings):
+            self.embeddings = normalize_rows(embeddings) if len(embeddings) else embeddings
+            self.positions = None
+            return
+        embeddings = normalize_rows(embeddings)
+        self.centroids = spherical_kmeans(embeddings, n_lists)
+        assignment = np.empty(len(embeddings), dtype=np.int32)
+        for start in range(0, len(embeddings), 65536):
+            chunk = embeddings[start:start + 65536]
+            assignment[start:start + len(chunk)] = (chunk @ self.centroids.T).argmax(axis=1)
+        order = np.argsort(assignment, kind="stable")
+        self.positions = order.astype(np.int64)
+        self.embeddings = np.ascontiguousarray(embeddings[order])
+        self.list_offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=n_lists))])
+
+    def __len__(self):
+        return len(self.embeddings)
+
+    def search(self, query_embedding, k=1):
+        # Best k (position, cosine similarity) pairs, best first
+        if not len(self.embeddings):
+            return []
+        query = normalize_rows(query_embedding)[0]
+        if self.centroids is None:
+            scores = self.embeddings @ query
+            rows = np.arange(len(scores))
+        else:
+            lists = np.argpartition(-(self.centroids @ query), min(self.n_probe, len(self.centroids)) - 1)
+            lists = lists[:self.n_probe]
+            rows = np.concatenate([
+                np.arange(self.list_offsets[i], self.list_offsets[i + 1]) for i in lists
+            ])
+            scores = np.concatenate([
+                self.embeddings[self.list_offsets[i]:self.list_offsets[i + 1]] @ query for i in lists
+            ])
+        k = min(k, len(scores))
+        if not k:
+            return []
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        positions = rows[best] if self.positions is None else self.positions[rows[best]]
+        return [(int(p), float(s)) for p, s in zip(positions, scores[best])]
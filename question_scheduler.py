@@ -0,0 +1,115 @@
+import heapq
+import random
+import threading
+from array import array
+
+MAX_TIMES_ASKED = 10
+TOP_CHOICES = 3
+
+
+class QuestionRatings:
+    # Process-wide "was this question helpful" ratings. Sessions record into it under
+    # a lock and read consistent snapshots; nothing else touches the counters.
+    def __init__(self, question_set):
+        if hasattr(question_set, "question_texts"):
+            # A QuestionBank: texts and positions are looked up on demand, not copied
+            self.questions = question_set.question_texts()
+            self.position = question_set.position
+            self.ratings = array("i", bytes(4 * len(question_set)))
+        else:
+            self.questions = list(question_set)
+            self.position = {question: i for i, question in enumerate(self.questions)}.__getitem__
+            self.ratings = array("i", (question_set[q].get("rating", 0) for q in self.questions))
+        self.version = 0
+        self._order = None
+        self._lock = threading.Lock()
+
+    def record(self, question, delta):
+        with self._lock:
+            self.ratings[self.position(question)] += delta
+            self.version += 1
+            return self.ratings[self.position(question)]
+
+    def get(self, question):
+        return self.ratings[self.position(question)]
+
+    def snapshot(self):
+        # Ratings plus every question sorted best-first, shared by all sessions that
+        # start before the next rating comes in
+        with self._lock:
+            if self._order is None or self._order[0] != self.version:
+                ratings = array("i", self.ratings)
+                order = array("i", sorted(range(len(ratings)), key=lambda i: (-ratings[i], i)))
+                self._order = (self.version, ratings, order)
+            return self._order[1], self._order[2]
+
+
+class QuestionScheduler:
+    # Question selection for one session: pick randomly among the top few questions by
+    # (rating desc, times asked asc), each at most `max_times_asked` times.
+    # Questions this session has not touched are read from the shared sorted order
+    # with a cursor; only touched questions get per-session state, kept in a heap
+    # with lazy invalidation (an entry is stale once its version is bumped).
+    def __init__(self, ratings, max_times_asked=MAX_TIMES_ASKED, top_choices=TOP_CHOICES, rng=None):
+        self.global_ratings = ratings
+        self.questions = ratings.questions
+        self.base_ratings, self.order = ratings.snapshot()
+        self.max_times_asked = max_times_asked
+        self.top_choices = top_choices
+        self.rng = rng or random
+        self.cursor = 0
+        self.times_asked = {}
+        self.ratings = {}
+        self.versions = {}
+        self.heap = []
+
+    def rating(self, i):
+        return self.ratings.get(i, self.base_ratings[i])
+
+    def _touched(self, i):
+        return i in self.versions
+
+    def _push(self, i):
+        self.versions[i] = self.versions.get(i, 0) + 1
+        if self.times_asked.get(i, 0) < self.max_times_asked:
+            heapq.heappush(self.heap, (-self.rating(i), self.times_asked.get(i, 0), i, self.versions[i]))
+
+    def _pop_touched(self, count):
+        entries = []
+        while self.heap and len(entries) < count:
+            entry = heapq.heappop(self.heap)
+            if entry[3] == self.versions[entry[2]]:
+                entries.append(entry)
+        return entries
+
+    def _peek_untouched(self, count):
+        while self.cursor < len(self.order) and self._touched(self.order[self.cursor]):
+            self.cursor += 1
+        entries = []
+        position = self.cursor
+        while position < len(self.order) and len(entries) < count:
+            i = self.order[position]
+            if not self._touched(i):
+                entries.append((-self.base_ratings[i], 0, i, 0))
+            position += 1
+        return entries
+
+    def next_question(self):
+        touched = self._pop_touched(self.top_choices)
+        candidates = sorted(touched + self._peek_untouched(self.top_choices))[:self.top_choices]
+        for entry in touched:
+            heapq.heappush(self.heap, entry)
+        if not candidates:
+            return None
+        i = self.rng.choice(candidates)[2]
+        self.times_asked[i] = self.times_asked.get(i, 0) + 1
+        self._push(i)
+        return self.questions[i]
+
+    def rate(self, question, helpful):
+        # Updates this session's ordering and the process-wide rating
+        i = self.global_ratings.position(question)
+        delta = 1 if helpful else -1
+        self.ratings[i] = self.rating(i) + delta
+        self._push(i)
+        return self.global_ratings.record(question, delta)
@@ -0,0 +1,139 @@
+import pickle
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+
+def normalize_text(text):
+    # Same answer typed with different spacing maps to the same entry
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class ResultCache:
+    # Bounded LRU cache for per-text model outputs, keyed on (namespace, text) where
+    # the namespace names the model and its version. Entries expire after `ttl`
+    # seconds if set. With `disk_path`, evicted and new entries are also kept in a
+    # SQLite file so they survive restarts.
+    def __init__(self, maxsize=4096, ttl=None, disk_path=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.disk_path = disk_path
+        self._disk = None
+        if disk_path:
+            self._connect()
+
+    def _connect(self):
+        self._disk = sqlite3.connect(self.disk_path, check_same_thread=False)
+        self._disk.execute("PRAGMA journal_mode=WAL")
+        self._disk.execute(
+            "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value BLOB, created REAL)"
+        )
+        self._disk.commit()
+
+    def after_fork(self):
+        # A SQLite connection must not be shared with a forked child; open a new one
+        self._lock = threading.Lock()
+        if self.disk_path:
+            self._connect()
+
+    def _key(self, namespace, text):
+        return namespace + "\0" + text
+
+    def _expired(self, created):
+        return self.ttl is not None and time.time() - created > self.ttl
+
+    def _get_locked(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, created = entry
+            if not self._expired(created):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, value
+            del self._entries[key]
+        if self._disk is not None:
+            row = self._disk.execute("SELECT value, created FROM results WHERE key = ?", (key,)).fetchone()
+            if row is not None and not self._expired(row[1]):
+                value = pickle.loads(row[0])
+                self._set_locked(key, value, row[1], persist=False)
+                self.hits += 1
+                self.disk_hits += 1
+                return True, value
+        self.misses += 1
+        return False, None
+
+    def _set_locked(self, key, value, created, persist=True):
+        self._entries[key] = (value, created)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        if persist and self._disk is not None:
+            self._disk.execute(
+                "INSERT OR REPLACE INTO results (key, value, created) VALUES (?, ?, ?)",
+                (key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), created)
+            )
+
+    def get(self, namespace, text):
+        with self._lock:
+            return self._get_locked(self._key(namespace, normalize_text(text)))
+
+    def put(self, namespace, text, value):
+        with self._lock:
+            self._set_locked(self._key(namespace, normalize_text(text)), value, time.time())
+            if self._disk is not None:
+                self._disk.commit()
+
+    def get_or_compute_many(self, namespace, texts, compute):
+        # Look every text up and run `compute` once on the distinct misses, in order.
+        # Models see the normalized text so the cached value matches its key.
+        normalized = [normalize_text(text) for text in texts]
+        results = [None] * len(texts)
+        missing = {}
+        with self._lock:
+            for i, text in enumerate(normalized):
+                if text in missing:
+                    missing[text].append(i)
+                    continue
+                found, value = self._get_locked(self._key(namespace, text))
+                if found:
+                    results[i] = value
+                else:
+                    missing[text] = [i]
+        if missing:
+            computed = compute(list(missing))
+            now = time.time()
+            with self._lock:
+                for (text, indices), value in zip(missing.items(), computed):
+                    self._set_locked(self._key(namespace, text), value, now)
+                    for i in indices:
+                        results[i] = value
+                if self._disk is not None:
+                    self._disk.commit()
+        return results
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.disk_hits = 0
+            if self._disk is not None:
+                self._disk.execute("DELETE FROM results")
+                self._disk.commit()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
@@ -0,0 +1,54 @@
+import re
+
+import numpy as np
+
+# Fallback sentence boundary when the punkt data is not installed
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+
+punkt_missing = False
+
+
+def split_sentences(text):
+    # punkt sentence boundaries, or a plain punctuation split if the punkt data is missing
+    global punkt_missing
+    if not punkt_missing:
+        try:
+            import nltk
+            sentences = [sentence for sentence in nltk.sent_tokenize(text) if sentence.strip()]
+            return sentences or [text]
+        except LookupError:
+            punkt_missing = True
+            print("⚠️ NLTK punkt data not found; splitting sentences on punctuation. "
+                  "Install it with: python -m nltk.downloader punkt_tab")
+    sentences = [sentence for sentence in SENTENCE_BOUNDARY.split(text.strip()) if sentence.strip()]
+    return sentences or [text]
+
+def cap_sentences(sentences, limit):
+    # At most `limit` segments; longer answers have neighbouring sentences joined
+    # into even groups so no part of the answer is dropped
+    if len(sentences) <= limit:
+        return sentences
+    size = len(sentences) / limit
+    return [" ".join(sentences[round(i * size):round((i + 1) * size)]) for i in range(limit)]
+
+def aggregate_sentences(sentences, similarities, sentiments):
+    # One answer's per-sentence results -> (similarity per reference answer, sentiment, details).
+    # A reference answer's similarity is the mean over the better half of the sentences,
+    # so an answer that covers it across several sentences scores well and filler
+    # sentences do not drag it down. Sentiment is the word-weighted mean probability
+    # of a positive label.
+    similarities = np.asarray(similarities, dtype=np.float32)
+    best = max(1, (len(sentences) + 1) // 2)
+    per_reference = np.sort(similarities, axis=0)[-best:].mean(axis=0)
+    weights = [max(1, len(sentence.split())) for sentence in sentences]
+    positive = [s["score"] if s["label"] == "POSITIVE" else 1 - s["score"] for s in sentiments]
+    probability = float(np.average(positive, weights=weights))
+    if probability >= 0.5:
+        sentiment = {"label": "POSITIVE", "score": probability}
+    else:
+        sentiment = {"label": "NEGATIVE", "score": 1 - probability}
+    details = [
+        {"text": sentence, "similarity": float(row.max()) if row.size else 0.0, "sentiment": s["label"]}
+        for sentence, row, s in zip(sentences, similarities, sentiments)
+    ]
+    return per_reference, sentiment, details
@@ -0,0 +1,408 @@
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from urllib.parse import urlsplit
+import interview_ai
+from interview_ai import (
+    question_rating,
+    new_scheduler,
+    score_answer,
+    score_batch,
+    render_feedback_cli,
+    log_answer,
+    preload_models
+)
+from inference_pool import InferencePool
+from prefork import PreforkPool, prepare_fork, score_rows
+from metrics import metrics, prometheus_text, configure as configure_metrics
+
+MAX_BODY_SIZE = 1024 * 1024
+REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found",
+           405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class Session:
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.scheduler = new_scheduler()
+        self.current_question = None
+        # Ratings are about the question just answered, even once the next one is out
+        self.last_answered = None
+        self.answers = 0
+        self.last_seen = time.monotonic()
+
+
+class ScoringService:
+    # Plain HTTP/1.1 + JSON on asyncio, no web framework. Models are loaded once per
+    # process and every answer goes through one shared InferencePool, so answers
+    # from concurrent sessions are scored together in micro-batches.
+    # With a PreforkPool, scoring runs in worker processes and the pool threads here
+    # only batch answers up and wait for the least busy process.
+    # With tiered, answers the lexical scorer is sure about skip the models.
+    def __init__(self, workers=2, max_batch=16, batch_window=0.01, max_concurrency=64, session_ttl=3600,
+                 prefork=None, tiered=False):
+        self.sessions = {}
+        self.session_ttl = session_ttl
+        self.prefork = prefork
+        self.tiered = tiered
+        self.inference = InferencePool(
+            self.build_feedback_batch if prefork is None else self.build_feedback_batch_remote,
+            workers=workers if prefork is None else max(workers, prefork.processes * 2),
+            max_queue=max_concurrency * 2,
+            max_batch=max_batch,
+            batch_window=batch_window
+        )
+        self.max_concurrency = max_concurrency
+        self.semaphore = None
+        self.routes = [
+            ("GET", ("health",), self.health),
+            ("GET", ("stats",), self.stats),
+            ("GET", ("metrics",), self.metrics_text),
+            ("POST", ("sessions",), self.create_session),
+            ("GET", ("sessions", None, "question"), self.next_question),
+            ("POST", ("sessions", None, "answer"), self.submit_answer),
+            ("POST", ("sessions", None, "rating"), self.rate_question),
+            ("POST", ("score", "batch"), self.batch_score),
+            ("POST", ("analytics", "summary"), self.analytics_summary)
+        ]
+
+    def build_feedback_batch(self, pairs):
+        with metrics.profile("feedback_batch"):
+            analyses = score_batch(pairs, include_entities=False, tiered=self.tiered)
+            return [score_answer(q, a, analysis) for (q, a), analysis in zip(pairs, analyses)]
+
+    def build_feedback_batch_remote(self, pairs):
+        return self.prefork.run("feedback", pairs, self.tiered)
+
+    # Handlers
+
+    async def health(self, body):
+        return 200, {"status": "ok"}
+
+    async def stats(self, body):
+        stats = {
+            "sessions": len(self.sessions),
+            "queued": self.inference.qsize(),
+            "cache": interview_ai.cache_stats(),
+            "models": interview_ai.models.stats(),
+            "model_events": interview_ai.models.events()[-20:]
+        }
+        if self.prefork is not None:
+            stats["workers"] = self.prefork.stats()
+        return 200, stats
+
+    async def metrics_text(self, body):
+        # Prometheus text format; a str payload is sent as text/plain
+        loop = asyncio.get_running_loop()
+        snapshot = await loop.run_in_executor(None, metrics.collect)
+        return 200, prometheus_text(snapshot)
+
+    async def create_session(self, body):
+        self.expire_sessions()
+        session = Session()
+        self.sessions[session.id] = session
+        question = self.select_question(session)
+        return 201, {"session_id": session.id, "question": question}
+
+    async def next_question(self, body, session_id):
+        session = self.get_session(session_id)
+        return 200, {"session_id": session.id, "question": self.select_question(session)}
+
+    async def submit_answer(self, body, session_id):
+        session = self.get_session(session_id)
+        answer = str(body.get("answer", "")).strip()
+        if not answer:
+            raise HTTPError(400, "answer is required")
+        question = session.current_question
+        if question is None:
+            raise HTTPError(400, "no open question, request one first")
+        # The log write can fsync or migrate the old log, so it stays off the event loop
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, log_answer, question, answer, question_rating(question))
+        future = self.inference.submit((question, answer))
+        feedback = await asyncio.wrap_future(future)
+        # Every chunk_size answers this seals a chunk to disk
+        await loop.run_in_executor(None, interview_ai.log_score, feedback.analysis, question_rating(question))
+        session.answers += 1
+        session.last_answered = question
+        result = feedback.to_dict()
+        result["question"] = question
+        result["text"] = render_feedback_cli(feedback).strip()
+        if body.get("next", True):
+            result["next_question"] = self.select_question(session)
+        return 200, result
+
+    async def rate_question(self, body, session_id):
+        # Rates the last answered question, or "question" if given: that one or the open one
+        session = self.get_session(session_id)
+        if "helpful" not in body:
+            raise HTTPError(400, "helpful is required")
+        allowed = [q for q in (session.last_answered, session.current_question) if q is not None]
+        question = body.get("question", allowed[0] if allowed else None)
+        if question is None:
+            raise HTTPError(400, "no question to rate, request one first")
+        if question not in allowed:
+            raise HTTPError(400, "question must be the last answered or the open question")
+        rating = session.scheduler.rate(question, bool(body["helpful"]))
+        return 200, {"question": question, "rating": rating}
+
+    async def batch_score(self, body):
+        pairs = body.get("pairs")
+        if not isinstance(pairs, list) or not all(
+            isinstance(p, list) and len(p) == 2 and all(isinstance(text, str) for text in p) for p in pairs
+        ):
+            raise HTTPError(400, "pairs must be a list of [question, answer]")
+        try:
+            batch_size = max(1, min(int(body.get("batch_size", 32)), 256))
+        except (TypeError, ValueError):
+            raise HTTPError(400, "batch_size must be an integer")
+        pairs = [tuple(p) for p in pairs]
+        # "full": true runs every answer through the models even when the service is tiered
+        options = {"batch_size": batch_size, "include_entities": False, "tiered": self.tiered and not body.get("full")}
+        if self.prefork is not None:
+            rows = await asyncio.wrap_future(self.prefork.submit("score", pairs, options))
+        else:
+            loop = asyncio.get_running_loop()
+            rows = await loop.run_in_executor(None, lambda: score_rows(pairs, options))
+        return 200, {"results": [
+            row if row is not None else {"question": q, "answer": a, "error": "unknown question"}
+            for (q, a), row in zip(pairs, rows)
+        ]}
+
+    async def analytics_summary(self, body):
+        # Per-question score stats; "since"/"until" as in analytics_store.py, e.g. "7d"
+        from analytics_store import parse_since
+        try:
+            start = parse_since(str(body["since"])) if body.get("since") else None
+            end = parse_since(str(body["until"])) if body.get("until") else None
+        except ValueError:
+            raise HTTPError(400, "since and until must look like 7d, 12h, 30m or an ISO date")
+        loop = asyncio.get_running_loop()
+        summary = await loop.run_in_executor(None, interview_ai.get_analytics_store().summary, start, end)
+        return 200, {"questions": summary}
+
+    # Sessions
+
+    def get_session(self, session_id):
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise HTTPError(404, "unknown session")
+        session.last_seen = time.monotonic()
+        return session
+
+    def select_question(self, session):
+        session.current_question = session.scheduler.next_question()
+        return session.current_question
+
+    def expire_sessions(self):
+        cutoff = time.monotonic() - self.session_ttl
+        for session_id in [sid for sid, s in self.sessions.items() if s.last_seen < cutoff]:
+            del self.sessions[session_id]
+
+    # HTTP
+
+    def route(self, method, path):
+        parts = tuple(p for p in path.split("/") if p)
+        allowed = False
+        for route_method, pattern, handler in self.routes:
+            if len(pattern) != len(parts) or any(p is not None and p != part for p, part in zip(pattern, parts)):
+                continue
+            if route_method != method:
+                allowed = True
+                continue
+            return handler, [part for p, part in zip(pattern, parts) if p is None]
+        raise HTTPError(405 if allowed else 404, "method not allowed" if allowed else "not found")
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self.respond(writer, 400, {"error": "malformed request line"}, keep_alive=False)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                try:
+                    length = self.content_length(headers)
+                except HTTPError as e:
+                    # The body is left unread, so the connection cannot carry another request
+                    await self.respond(writer, e.status, {"error": e.message}, keep_alive=False)
+                    break
+                # Always consume the body so the next request on the connection starts clean
+                raw_body = await reader.readexactly(length) if length else b""
+                status, payload = await self.dispatch(method, urlsplit(target).path, raw_body)
+                await self.respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def content_length(self, headers):
+        try:
+            length = int(headers.get("content-length", 0) or 0)
+        except ValueError:
+            raise HTTPError(400, "invalid Content-Length")
+        if length < 0:
+            raise HTTPError(400, "invalid Content-Length")
+        if length > MAX_BODY_SIZE:
+            raise HTTPError(413, "request body too large")
+        return length
+
+    async def dispatch(self, method, path, raw_body):
+        try:
+            handler, params = self.route(method, path)
+            body = {}
+            if raw_body:
+                try:
+                    body = json.loads(raw_body)
+                except json.JSONDecodeError:
+                    raise HTTPError(400, "body must be JSON")
+                if not isinstance(body, dict):
+                    raise HTTPError(400, "body must be a JSON object")
+            async with self.semaphore:
+                with metrics.timer(f"http.{handler.__name__}"):
+                    return await handler(body, *params)
+        except HTTPError as e:
+            return e.status, {"error": e.message}
+        except Exception as e:
+            print(f"Error handling {method} {path}: {e}")
+            return 500, {"error": "internal error"}
+
+    async def respond(self, writer, status, payload, keep_alive=True):
+        if isinstance(payload, str):
+            body = payload.encode("utf-8")
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            content_type = "application/json; charset=utf-8"
+        head = (
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+    async def serve(self, host, port):
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"🚀 Interview AI scoring service on http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless HTTP scoring service for Interview AI.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=2, help="inference worker threads")
+    parser.add_argument("--max-batch", type=int, default=16, help="answers scored together at most")
+    parser.add_argument("--batch-window", type=float, default=0.01, help="seconds to wait for a batch to fill")
+    parser.add_argument("--max-concurrency", type=int, default=64, help="requests handled at once")
+    parser.add_argument("--lazy", action="store_true", help="load models on first request instead of at startup")
+    parser.add_argument("--processes", type=int, default=0,
+                        help="score in this many forked worker processes sharing the loaded models (0: in-process)")
+    parser.add_argument("--torch-threads", type=int, default=1, help="intra-op threads per worker process")
+    parser.add_argument("--onnx", metavar="DIR",
+                        help="run the encoder and sentiment models on ONNX Runtime from exports in DIR "
+                             "(see onnx_backend.py export)")
+    parser.add_argument("--onnx-fp32", action="store_true", help="use the unquantized ONNX export")
+    parser.add_argument("--model-budget-mb", type=float,
+                        help="unload least recently used models to keep loaded ones under this many MB")
+    parser.add_argument("--model-idle-timeout", type=float, help="unload models unused for this many seconds")
+    parser.add_argument("--pin-model", action="append", default=[],
+                        help="never unload this model, e.g. model (the encoder); repeatable")
+    parser.add_argument("--sentences", type=int, nargs="?", const=interview_ai.MAX_SENTENCES, default=None,
+                        metavar="MAX", help="score answers sentence by sentence, at most MAX sentences each (default: %(const)s)")
+    parser.add_argument("--tiered", action="store_true",
+                        help="score clear-cut answers lexically and run the models only on ambiguous ones")
+    parser.add_argument("--tier-policy", help="tier thresholds JSON (default: " + interview_ai.LEXICAL_POLICY_FILE + ")")
+    parser.add_argument("--metrics", action="store_true", help="collect per-stage timings, served at /metrics")
+    parser.add_argument("--metrics-sink", action="append", default=[],
+                        help="also write metrics to log, json:PATH or prometheus:PATH (repeatable)")
+    parser.add_argument("--metrics-interval", type=float, default=60.0, help="seconds between sink writes")
+    parser.add_argument("--profile-dir", help="write cProfile/tracemalloc captures of scoring batches here")
+    parser.add_argument("--profile-every", type=int, default=100, help="profile one in this many batches")
+    args = parser.parse_args(argv)
+
+    if args.metrics or args.metrics_sink or args.profile_dir:
+        # Sinks start writing only after any fork below; workers inherit the rest
+        configure_metrics(
+            enabled=args.metrics or bool(args.metrics_sink),
+            sinks=args.metrics_sink,
+            interval=None,
+            profile_dir=args.profile_dir,
+            profile_every=args.profile_every
+        )
+
+    if args.processes:
+        # Before anything loads or runs a model in this process
+        prepare_fork()
+    if args.onnx:
+        # Sessions are created before any fork and their thread pools would not survive
+        # it, so forked workers run them on one thread each
+        interview_ai.use_onnx_backend(args.onnx, quantized=not args.onnx_fp32,
+                                      intra_op_threads=1 if args.processes else None)
+    if args.sentences:
+        interview_ai.use_sentence_analysis(args.sentences)
+    if args.tiered:
+        interview_ai.configure_tiers(args.tier_policy)
+        interview_ai.get_lexical_index()
+    budgeted = args.model_budget_mb or args.model_idle_timeout
+    if budgeted and args.processes:
+        # Unloading in a worker frees nothing: the weights are shared with the parent
+        print("⚠️ --model-budget-mb and --model-idle-timeout are ignored with --processes")
+    elif budgeted:
+        interview_ai.configure_models(args.model_budget_mb, args.model_idle_timeout, args.pin_model)
+    prefork = None
+    if args.processes:
+        # Workers must share loaded weights, so --lazy does not apply
+        preload_models()
+        prefork = PreforkPool(args.processes, torch_threads=args.torch_threads)
+        metrics.add_source(lambda: [f.result(timeout=5) for f in prefork.broadcast("metrics")])
+        print(f"🧵 Forked {args.processes} scoring workers, {args.torch_threads} torch thread(s) each")
+    elif not args.lazy:
+        preload_models()
+    if metrics.sinks:
+        metrics.start(args.metrics_interval)
+    service = ScoringService(
+        workers=args.workers,
+        max_batch=args.max_batch,
+        batch_window=args.batch_window,
+        max_concurrency=args.max_concurrency,
+        prefork=prefork,
+        tiered=args.tiered
+    )
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.inference.shutdown(wait=False)
+        if prefork is not None:
+            prefork.shutdown()
+
+if __name__ == "__main__":
+    main()
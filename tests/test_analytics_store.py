@@ -0,0 +1,145 @@
+import json
+import os
+import random
+
+import numpy as np
+import pytest
+
+from analytics_store import (
+    AnalyticsStore, StoreLocked, COMPONENTS, CHUNKS_DIR, DAILY_FILE, DAY, MANIFEST_FILE, TAIL_FILE, fcntl
+)
+
+START = 1.7e9
+RANGES = [
+    (None, None),
+    (START + 3.3 * DAY, START + 11.7 * DAY),
+    (None, START + 5 * DAY),
+    (START + 2.1 * DAY, None),
+    (START + 4.2 * DAY, START + 4.6 * DAY),
+    (START + 30 * DAY, None)
+]
+
+
+def fill(store, count, seed=0):
+    # Rows spread over 20 days in random order; returns (timestamp, question, total)
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(count):
+        timestamp = START + rng.uniform(0, 20 * DAY)
+        question = f"question {rng.randint(0, 4)}"
+        total = rng.randint(0, 100)
+        store.append(question, total, total * 0.9, {name: rng.randint(0, 10) for name in COMPONENTS},
+                     timestamp=timestamp)
+        rows.append((timestamp, question, total))
+    return rows
+
+def brute_force(rows, start, end):
+    totals = {}
+    for timestamp, question, total in rows:
+        if (start is None or timestamp >= start) and (end is None or timestamp < end):
+            totals.setdefault(question, []).append(total)
+    return totals
+
+def assert_summaries_match(store, rows):
+    for start, end in RANGES:
+        summary = {q: stats for q, stats in store.summary(start, end).items() if stats["count"]}
+        expected = brute_force(rows, start, end)
+        assert sorted(summary) == sorted(expected), (start, end)
+        for question, totals in expected.items():
+            stats = summary[question]
+            assert stats["count"] == len(totals)
+            assert stats["mean"] == pytest.approx(np.mean(totals))
+            assert stats["std"] == pytest.approx(np.std(totals))
+            assert sum(stats["histogram"]) == len(totals)
+
+@pytest.fixture
+def directory(tmp_path):
+    return str(tmp_path / "analytics")
+
+def test_range_summaries_match_the_rows(directory):
+    store = AnalyticsStore(directory, chunk_size=50)
+    rows = fill(store, 437)
+    assert len(store) == 437
+    assert len(store.manifest["chunks"]) == 8
+    assert_summaries_match(store, rows)
+    store.close()
+
+def test_scan_selects_by_time_and_question(directory):
+    store = AnalyticsStore(directory, chunk_size=50)
+    rows = fill(store, 120)
+    start, end = START + 2 * DAY, START + 9.5 * DAY
+    columns = store.scan(start, end, "question 1")
+    expected = sorted(total for timestamp, question, total in rows
+                      if start <= timestamp < end and question == "question 1")
+    assert sorted(columns["total"].tolist()) == expected
+    assert len(store.scan(question="never asked")["total"]) == 0
+    store.close()
+
+def test_tail_is_replayed_on_open(directory):
+    store = AnalyticsStore(directory, chunk_size=50)
+    rows = fill(store, 130)
+    store.close()
+    with open(os.path.join(directory, TAIL_FILE), "r", encoding="utf-8") as f:
+        assert len(f.readlines()) == 30
+
+    store = AnalyticsStore(directory, chunk_size=50)
+    assert len(store) == 130
+    assert len(store.tail) == 30
+    assert_summaries_match(store, rows)
+    # New question ids written only to the tail survive the restart
+    rows += fill(store, 80, seed=1)
+    store.close()
+    store = AnalyticsStore(directory, chunk_size=50)
+    assert_summaries_match(store, rows)
+    store.close()
+
+def test_rows_sealed_before_a_crash_are_not_counted_twice(directory):
+    store = AnalyticsStore(directory, chunk_size=50)
+    rows = fill(store, 20)
+    store.flush()
+    with open(os.path.join(directory, TAIL_FILE), "r", encoding="utf-8") as f:
+        tail = f.read()
+    store.seal()
+    store.close()
+    # As if the process died between writing the manifest and emptying the tail
+    with open(os.path.join(directory, TAIL_FILE), "w", encoding="utf-8") as f:
+        f.write(tail)
+    store = AnalyticsStore(directory, chunk_size=50)
+    assert len(store) == 20
+    assert_summaries_match(store, rows)
+    store.close()
+
+def test_daily_aggregates_live_in_the_chunks(directory):
+    store = AnalyticsStore(directory, chunk_size=50)
+    fill(store, 100)
+    store.close()
+    with open(os.path.join(directory, MANIFEST_FILE), "r", encoding="utf-8") as f:
+        assert "daily" not in json.load(f)
+    for chunk in store.manifest["chunks"]:
+        assert os.path.exists(os.path.join(directory, CHUNKS_DIR, chunk["name"], DAILY_FILE))
+
+def test_daily_aggregates_are_rebuilt_for_older_stores(directory):
+    store = AnalyticsStore(directory, chunk_size=50)
+    rows = fill(store, 175)
+    store.close()
+    for chunk in store.manifest["chunks"]:
+        os.remove(os.path.join(directory, CHUNKS_DIR, chunk["name"], DAILY_FILE))
+    store = AnalyticsStore(directory, chunk_size=50)
+    assert_summaries_match(store, rows)
+    store.close()
+
+@pytest.mark.skipif(fcntl is None, reason="no advisory locks on this platform")
+def test_one_writer_at_a_time(directory):
+    store = AnalyticsStore(directory, chunk_size=50)
+    rows = fill(store, 60)
+    store.flush()
+    with pytest.raises(StoreLocked):
+        AnalyticsStore(directory)
+    reader = AnalyticsStore(directory, read_only=True)
+    assert_summaries_match(reader, rows)
+    with pytest.raises(StoreLocked):
+        reader.append("question 0", 50, 50.0, {name: 0 for name in COMPONENTS})
+    reader.close()
+    store.close()
+    # Closing releases the lock
+    AnalyticsStore(directory).close()
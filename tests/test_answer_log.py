@@ -0,0 +1,77 @@
+import json
+import os
+
+import pytest
+
+from answer_log import AnswerLog, iter_records, migrate_json_array
+
+
+def test_append_is_buffered_until_flush(tmp_path):
+    path = str(tmp_path / "log.jsonl")
+    log = AnswerLog(path, flush_size=10, flush_interval=60, fsync=False)
+    log.append({"soru": "q", "cevap": "a"})
+    assert not os.path.exists(path)
+    log.flush()
+    assert list(iter_records(path)) == [{"soru": "q", "cevap": "a"}]
+    log.close()
+
+def test_full_buffer_is_written_in_one_go(tmp_path):
+    path = str(tmp_path / "log.jsonl")
+    log = AnswerLog(path, flush_size=3, flush_interval=60, fsync=False)
+    for i in range(3):
+        log.append({"i": i})
+    assert [r["i"] for r in iter_records(path)] == [0, 1, 2]
+    log.close()
+
+def test_failed_write_keeps_the_buffer(tmp_path):
+    log = AnswerLog(str(tmp_path / "missing" / "log.jsonl"), flush_size=10, flush_interval=60, fsync=False)
+    log.append({"i": 1})
+    with pytest.raises(OSError):
+        log.flush()
+    log.path = str(tmp_path / "log.jsonl")
+    log.append({"i": 2})
+    log.flush()
+    assert [r["i"] for r in iter_records(log.path)] == [1, 2]
+    log.close()
+
+def test_iteration_flushes_pending_records(tmp_path):
+    path = str(tmp_path / "log.jsonl")
+    log = AnswerLog(path, flush_size=10, flush_interval=60, fsync=False)
+    log.append({"i": 1})
+    assert [r["i"] for r in log] == [1]
+    log.close()
+
+def test_torn_last_line_is_skipped(tmp_path):
+    path = str(tmp_path / "log.jsonl")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{"i": 0}\n{"i": 1')
+    assert [r["i"] for r in iter_records(path)] == [0]
+
+def test_migrate_json_array(tmp_path):
+    src, dst = str(tmp_path / "old.json"), str(tmp_path / "new.jsonl")
+    records = [{"soru": f"q{i}", "cevap": "ü" * i} for i in range(100)]
+    with open(src, "w", encoding="utf-8") as f:
+        json.dump(records, f, ensure_ascii=False, indent=2)
+    assert list(iter_records(src)) == records
+    assert migrate_json_array(src, dst) == 100
+    assert list(iter_records(dst)) == records
+    # Never runs twice, and the original is kept
+    assert migrate_json_array(src, dst) == 0
+    assert os.path.exists(src)
+
+def test_migrate_corrupt_array_leaves_nothing_behind(tmp_path):
+    src, dst = str(tmp_path / "old.json"), str(tmp_path / "new.jsonl")
+    with open(src, "w", encoding="utf-8") as f:
+        f.write('[{"soru": "q"}, {"soru": ')
+    with pytest.raises(ValueError):
+        migrate_json_array(src, dst)
+    assert sorted(os.listdir(tmp_path)) == ["old.json"]
+
+def test_bad_line_in_the_middle_is_reported(tmp_path, capsys):
+    path = str(tmp_path / "log.jsonl")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{"i": 0}\n{"i": \n{"i": 2}\n\n{"i": 3')
+    assert [r["i"] for r in iter_records(path)] == [0, 2]
+    output = capsys.readouterr().out
+    assert "line 2 " in output
+    assert "line 5" not in output
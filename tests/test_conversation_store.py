@@ -0,0 +1,113 @@
+import json
+import os
+
+import pytest
+
+from conversation_store import ConversationStore
+
+
+def new_store(tmp_path, **kwargs):
+    return ConversationStore(str(tmp_path / "conversations"), delay=60, max_delay=60, **kwargs)
+
+def message(i):
+    return {"sender": "You" if i % 2 else "AI", "text": f"message {i}", "is_user": bool(i % 2)}
+
+def test_round_trip(tmp_path):
+    store = new_store(tmp_path)
+    store.create({"id": 0, "title": "Interview 1", "timestamp": "2024-05-01 10:00", "messages": [message(0)]})
+    store.append_message(0, message(1))
+    # Pending changes are visible before they are written
+    assert [c["title"] for c in store.list_conversations()] == ["Interview 1"]
+    assert store.load_messages(0) == [message(0), message(1)]
+    store.close()
+
+    store = new_store(tmp_path)
+    assert store.list_conversations() == [{"id": 0, "title": "Interview 1", "timestamp": "2024-05-01 10:00"}]
+    assert store.load_messages(0) == [message(0), message(1)]
+    store.close()
+
+def test_appends_only_add_the_new_messages(tmp_path):
+    store = new_store(tmp_path)
+    store.create({"id": 3, "title": "Interview 4", "timestamp": "", "messages": []})
+    store.flush()
+    for i in range(5):
+        store.append_message(3, message(i))
+        store.flush()
+    with open(store.path(3), "r", encoding="utf-8") as f:
+        assert len(f.readlines()) == 6
+    assert store.load_messages(3) == [message(i) for i in range(5)]
+    store.close()
+
+def test_conversations_are_listed_by_id(tmp_path):
+    store = new_store(tmp_path)
+    for i in (2, 0, 1):
+        store.create({"id": i, "title": f"Interview {i + 1}", "timestamp": "", "messages": []})
+    store.flush()
+    assert [c["id"] for c in store.list_conversations()] == [0, 1, 2]
+    store.close()
+
+def test_migrates_the_legacy_file(tmp_path):
+    legacy = tmp_path / "conversations.json"
+    conversations = [
+        {"id": i, "title": f"Interview {i + 1}", "timestamp": "", "messages": [message(j) for j in range(i)]}
+        for i in range(3)
+    ]
+    legacy.write_text(json.dumps(conversations), encoding="utf-8")
+    store = new_store(tmp_path, legacy_file=str(legacy))
+    assert store.load_all() == conversations
+    store.close()
+
+def test_bad_legacy_file_is_kept_and_the_store_starts_empty(tmp_path, capsys):
+    legacy = tmp_path / "conversations.json"
+    legacy.write_text('[{"id": 0, "title": ', encoding="utf-8")
+    store = new_store(tmp_path, legacy_file=str(legacy))
+    assert store.list_conversations() == []
+    assert legacy.read_text(encoding="utf-8") == '[{"id": 0, "title": '
+    assert not os.path.exists(store.directory + ".tmp")
+    assert "Could not migrate" in capsys.readouterr().out
+    store.close()
+
+def test_reserved_message_keeps_its_place(tmp_path):
+    # Feedback is reserved when the answer is sent, the next question and answer are
+    # shown before the feedback is final, and the file still follows the screen
+    store = new_store(tmp_path)
+    store.create({"id": 0, "title": "Interview 1", "timestamp": "", "messages": [message(0), message(1)]})
+    slot = store.reserve_message(0)
+    store.append_message(0, message(3))
+    store.append_message(0, message(4))
+    store.flush()
+    assert store.load_messages(0) == [message(0), message(1)]
+    store.fill_message(0, slot, message(2))
+    store.append_message(0, message(5))
+    store.close()
+
+    store = new_store(tmp_path)
+    assert store.load_messages(0) == [message(i) for i in range(6)]
+    store.close()
+
+def test_messages_behind_an_unfilled_reservation_are_saved_on_close(tmp_path):
+    store = new_store(tmp_path)
+    store.create({"id": 0, "title": "Interview 1", "timestamp": "", "messages": []})
+    store.reserve_message(0)
+    store.append_message(0, message(1))
+    store.close()
+    store = new_store(tmp_path)
+    assert store.load_messages(0) == [message(1)]
+    store.close()
+
+def test_new_ids_skip_every_file_on_disk(tmp_path):
+    store = new_store(tmp_path)
+    assert store.next_id() == 0
+    store.create({"id": 0, "title": "Interview 1", "timestamp": "", "messages": []})
+    assert store.next_id() == 1
+    store.flush()
+    # An unreadable conversation is not listed, but its id stays taken
+    with open(store.path(5), "w", encoding="utf-8") as f:
+        f.write("not json\n")
+    assert [c["id"] for c in store.list_conversations()] == [0]
+    assert store.next_id() == 6
+    with pytest.raises(ValueError):
+        store.create({"id": 5, "title": "Interview 2", "timestamp": "", "messages": []})
+    with open(store.path(5), "r", encoding="utf-8") as f:
+        assert f.read() == "not json\n"
+    store.close()
@@ -0,0 +1,51 @@
+import numpy as np
+
+from embedding_index import ReferenceIndex, normalize_rows
+
+
+class CountingEncoder:
+    # Deterministic stand-in: one row per text, remembering what it was asked to encode
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, texts, convert_to_numpy=True):
+        self.encoded.extend(texts)
+        return np.array([[len(text), text.count("a") + 1, 1.0] for text in texts], dtype=np.float32)
+
+def expected(texts):
+    return normalize_rows(CountingEncoder().encode(texts))
+
+QUESTIONS = {
+    "q1": {"answers": ["a first answer", "another"]},
+    "q2": {"answers": ["b"]}
+}
+
+
+def test_build_encodes_once_and_reloads(tmp_path):
+    path = str(tmp_path / "reference")
+    encoder = CountingEncoder()
+    index = ReferenceIndex(path, "model")
+    assert index.build(QUESTIONS, encoder)
+    assert np.allclose(index.embeddings("q1"), expected(QUESTIONS["q1"]["answers"]))
+    assert not index.build(QUESTIONS, encoder)
+
+    reloaded = ReferenceIndex(path, "model")
+    assert np.allclose(reloaded.embeddings("q2"), expected(["b"]))
+    assert reloaded.is_current("q1", QUESTIONS["q1"]["answers"])
+    # Another model's index is ignored
+    assert ReferenceIndex(path, "other model").entries == {}
+
+def test_rebuild_only_encodes_changed_questions(tmp_path):
+    encoder = CountingEncoder()
+    index = ReferenceIndex(str(tmp_path / "reference"), "model")
+    index.build(QUESTIONS, encoder)
+    encoder.encoded = []
+    changed = {**QUESTIONS, "q2": {"answers": ["b", "c"]}, "q3": {"answers": ["aaa"]}}
+    assert index.build(changed, encoder)
+    assert encoder.encoded == ["b", "c", "aaa"]
+    matrix, entries = index.state
+    assert matrix.shape[0] == sum(entry["stop"] - entry["start"] for entry in entries.values())
+    for question, data in changed.items():
+        assert np.allclose(index.embeddings(question), expected(data["answers"]))
+    scores = index.question_similarities(np.array([[3.0, 2.0, 1.0]]))
+    assert sorted(scores) == ["q1", "q2", "q3"]
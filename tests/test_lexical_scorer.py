@@ -0,0 +1,52 @@
+import pytest
+
+from keyword_index import tokenize
+from lexical_scorer import LexicalIndex, TierPolicy
+
+QUESTIONS = {
+    "Tell me about yourself.": {"answers": [
+        "I am a software engineer who enjoys building reliable systems.",
+        "I studied computer engineering and led several student projects."
+    ]},
+    "What do you cook?": {"answers": ["I cook pasta and bake bread at home."]}
+}
+
+
+def test_similarity_prefers_the_matching_reference():
+    index = LexicalIndex(QUESTIONS)
+    similarities, _ = index.score("Tell me about yourself.", ["I led student projects in computer engineering."])
+    assert similarities.shape == (1, 2)
+    assert similarities[0, 1] > similarities[0, 0]
+    assert 0.0 <= similarities.min() and similarities.max() <= 1.0 + 1e-6
+
+def test_coverage_counts_this_questions_content_words():
+    index = LexicalIndex(QUESTIONS)
+    _, coverage = index.score("Tell me about yourself.", [
+        "software engineer building systems",
+        # Words of another question's references do not count
+        "I cook pasta and bake bread",
+        # Neither do stop words
+        "I am a the and"
+    ])
+    assert coverage.tolist() == [1.0, 0.0, 0.0]
+
+def escalation(policy, estimate, coverage, answer):
+    return policy.escalation(estimate, coverage, set(tokenize(answer)))
+
+def test_escalation_reasons():
+    policy = TierPolicy(margin=5, min_coverage=0.5, min_words=3)
+    assert escalation(policy, 90, 1.0, "too short") == "short"
+    assert escalation(policy, 90, 0.2, "a long enough answer here") == "coverage"
+    assert escalation(policy, 90, 1.0, "I never enjoyed teamwork") == "tone"
+    assert escalation(policy, 62, 1.0, "a long enough answer here") == "boundary"
+    assert escalation(policy, 70, 1.0, "a long enough answer here") is None
+
+def test_estimate_is_clipped_to_the_score_scale():
+    policy = TierPolicy(intercept=30, slope=1.5)
+    assert policy.estimate([0.0, 0.2, 1.0]).tolist() == pytest.approx([30.0, 60.0, 100.0])
+
+def test_policy_round_trip(tmp_path):
+    policy = TierPolicy(intercept=12.5, slope=0.8, margin=3)
+    path = str(tmp_path / "policy.json")
+    policy.save(path)
+    assert TierPolicy.load(path).to_dict() == policy.to_dict()
@@ -0,0 +1,79 @@
+import random
+
+from question_scheduler import QuestionRatings, QuestionScheduler
+
+
+def question_set(count, ratings=None):
+    ratings = ratings or [0] * count
+    return {f"question {i}": {"answers": [], "rating": ratings[i], "times_asked": 0} for i in range(count)}
+
+def reference_next(questions, ratings, times_asked, max_times_asked, top_choices, rng):
+    # The selection rule written out directly: sort everything, pick among the top few
+    candidates = sorted(
+        (-ratings[q], times_asked[q], i) for i, q in enumerate(questions) if times_asked[q] < max_times_asked
+    )[:top_choices]
+    if not candidates:
+        return None
+    question = questions[rng.choice(candidates)[2]]
+    times_asked[question] += 1
+    return question
+
+def test_matches_the_full_sort():
+    rng = random.Random(7)
+    questions = question_set(40, [rng.randint(-3, 3) for _ in range(40)])
+    names = list(questions)
+    scheduler = QuestionScheduler(QuestionRatings(questions), max_times_asked=3, rng=random.Random(1))
+    ratings = {q: questions[q]["rating"] for q in names}
+    times_asked = {q: 0 for q in names}
+    reference_rng = random.Random(1)
+    for step in range(200):
+        if step % 5 == 4:
+            question = rng.choice(names)
+            helpful = rng.random() < 0.5
+            scheduler.rate(question, helpful)
+            ratings[question] += 1 if helpful else -1
+        expected = reference_next(names, ratings, times_asked, 3, 3, reference_rng)
+        assert scheduler.next_question() == expected
+        if expected is None:
+            break
+
+def test_each_question_is_asked_at_most_max_times():
+    questions = question_set(5)
+    scheduler = QuestionScheduler(QuestionRatings(questions), max_times_asked=2, rng=random.Random(0))
+    asked = []
+    while True:
+        question = scheduler.next_question()
+        if question is None:
+            break
+        asked.append(question)
+    assert sorted(asked) == sorted(list(questions) * 2)
+
+def test_best_rated_question_comes_first():
+    questions = question_set(10, [0, 0, 0, 5, 0, 0, 0, 0, 0, 0])
+    scheduler = QuestionScheduler(QuestionRatings(questions), top_choices=1)
+    assert scheduler.next_question() == "question 3"
+
+def test_unhelpful_ratings_move_a_question_down():
+    questions = question_set(3)
+    scheduler = QuestionScheduler(QuestionRatings(questions), top_choices=1)
+    assert scheduler.next_question() == "question 0"
+    scheduler.rate("question 0", False)
+    assert scheduler.next_question() == "question 1"
+
+def test_ratings_are_shared_with_later_sessions():
+    ratings = QuestionRatings(question_set(3))
+    first = QuestionScheduler(ratings, top_choices=1)
+    first.rate("question 2", True)
+    assert ratings.get("question 2") == 1
+    assert QuestionScheduler(ratings, top_choices=1).next_question() == "question 2"
+    # A session that started earlier keeps its own snapshot
+    assert QuestionScheduler(ratings, top_choices=1).base_ratings[2] == 1
+
+def test_sessions_do_not_share_times_asked():
+    ratings = QuestionRatings(question_set(2))
+    first = QuestionScheduler(ratings, max_times_asked=1, top_choices=1)
+    assert [first.next_question(), first.next_question(), first.next_question()] == [
+        "question 0", "question 1", None
+    ]
+    second = QuestionScheduler(ratings, max_times_asked=1, top_choices=1)
+    assert second.next_question() == "question 0"